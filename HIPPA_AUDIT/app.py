@@ -6,401 +6,28 @@ from datetime import date
 from io import StringIO
 import csv
 import json
+import os
+import tempfile
 import matplotlib.pyplot as plt
 
+from column_scanner import MATCH_THRESHOLD, SERVER_ROOTS, allowed_sources, coverage_rows, scan
+from column_scanner import mandatory_flags as scanned_mandatory_flags
+from phi_scanner import CHUNK_MB as PHI_CHUNK_MB, HIT_RATE_THRESHOLD, PHI_WORKERS
+from phi_scanner import encryption_metric_key, phi_columns
+from phi_scanner import scan as scan_phi
+from scoring import compile_schema
+
 st.set_page_config(page_title="HIPAA Risk & Data Readiness Audit", layout="wide")
 
 # =========================
-# Schema (Executive + Domains + Visual)
+# Schema (Executive + Domains + Visual) — hipaa_schema.json, compiled once per process
 # =========================
-SCHEMA = {
-    "current_state_summary": {
-        "assessment_date": "2025-10-15",
-        "organization": "Upperline Health",
-        "data_sources": [
-            {"name": "AthenaHealth EHR", "records": 1850000, "systems": 3},
-            {"name": "Billing Platform", "records": 950000, "systems": 1},
-            {"name": "Lab Interfaces (HL7)", "records": 425000, "systems": 2}
-        ],
-        "total_records": 3225000,
-        "total_systems": 6,
-        "identified_violations": 37,
-        "violations_by_category": {
-            "Administrative": 8,
-            "Technical": 10,
-            "Physical": 4,
-            "Integrity": 5,
-            "Interoperability": 3,
-            "Signatures": 2,
-            "Infonomics": 5
-        },
-        "estimated_total_exposure_usd": 845000,
-        "top_risks": [
-            "Missing Business Associate Agreements (BAAs)",
-            "Unencrypted PHI storage in local cache",
-            "Incomplete audit trail for EHR modifications",
-            "Lack of checksum validation for data integrity"
-        ]
-    },
-
-    "compliance_domains": {
-        "Administrative Safeguards (HIPAA §164.308)": {
-            "weight": 0.15,
-            "description": "Administrative controls covering risk analysis, workforce training, and vendor oversight.",
-            "mandatory_columns": [
-                {"name": "last_modified_by", "description": "Who changed PHI/governance docs (accountability).", "violation_cost_usd": 5000},
-                {"name": "last_modified_date", "description": "When record/document last changed (audit trail).", "violation_cost_usd": 10000},
-                {"name": "record_version", "description": "Version control for SOPs and risk assessments.", "violation_cost_usd": 7500},
-                {"name": "baa_vendor_id", "description": "FK linking PHI/system to vendor for BAA proof.", "violation_cost_usd": 100000},
-                {"name": "training_completion_date", "description": "Workforce HIPAA training date.", "violation_cost_usd": 15000}
-            ],
-            "subdomains": {
-                "Risk Management Program": {
-                    "weight": 0.35,
-                    "metrics": [
-                        {
-                            "name": "Annual Risk Analysis",
-                            "observation": "No HIPAA risk analysis completed within the last 12 months.",
-                            "regulation": "HIPAA §164.308(a)(1)(ii)(A)",
-                            "impact_category": "Legal / Financial",
-                            "estimated_penalty": 50000,
-                            "impact_description": "OCR fines and corrective action plans.",
-                            "recommended_action": "Conduct and document an annual security risk analysis."
-                        }
-                    ]
-                },
-                "Business Associate Oversight": {
-                    "weight": 0.30,
-                    "metrics": [
-                        {
-                            "name": "% of Vendors with Valid BAAs",
-                            "observation": "One or more vendors lack current BAAs.",
-                            "regulation": "HIPAA §164.502(e)",
-                            "impact_category": "Legal / Reputational",
-                            "estimated_penalty": 100000,
-                            "impact_description": "Missing BAAs often result in six-figure settlements.",
-                            "recommended_action": "Execute and upload BAAs; set renewal alerts.",
-                            "upload_config": {
-                                "enabled": True,
-                                "file_types": [".pdf", ".docx", ".png", ".jpg"],
-                                "metadata_fields": {
-                                    "vendor_name": "string",
-                                    "signed_date": "date",
-                                    "expiration_date": "date",
-                                    "contact_person": "string",
-                                    "contact_email": "string"
-                                },
-                                "validation_rules": {
-                                    "require_vendor_name": True,
-                                    "require_expiration_date": True,
-                                    "flag_if_expired": True
-                                }
-                            }
-                        }
-                    ]
-                },
-                "Workforce Security & Training": {
-                    "weight": 0.35,
-                    "metrics": [
-                        {
-                            "name": "Training Completion Rate",
-                            "observation": "Under 90% of staff completed annual HIPAA training.",
-                            "regulation": "HIPAA §164.308(a)(5)(i)",
-                            "impact_category": "Operational / Legal",
-                            "estimated_penalty": 15000,
-                            "impact_description": "Higher breach likelihood and OCR findings.",
-                            "recommended_action": "Automate training tracking; enforce recertification."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Technical Safeguards (HIPAA §164.312 & 21 CFR 11.10)": {
-            "weight": 0.20,
-            "description": "Access control, authentication, encryption, and audit trails for HIPAA and FDA Part 11.",
-            "mandatory_columns": [
-                {"name": "user_id", "description": "Unique authenticated user per transaction.", "violation_cost_usd": 10000},
-                {"name": "access_role", "description": "Role-based access control for least privilege.", "violation_cost_usd": 25000},
-                {"name": "mfa_enabled", "description": "Multi-factor authentication status.", "violation_cost_usd": 25000},
-                {"name": "encryption_status", "description": "AES-256 at rest / TLS in transit applied to ePHI.", "violation_cost_usd": 150000},
-                {"name": "audit_log_id", "description": "Immutable link to audit entry for the event.", "violation_cost_usd": 50000}
-            ],
-            "subdomains": {
-                "Access Control & Authentication": {
-                    "weight": 0.35,
-                    "metrics": [
-                        {
-                            "name": "Unique ID and MFA Enforcement",
-                            "observation": "Shared accounts or missing MFA detected.",
-                            "regulation": "HIPAA §164.312(d); 21 CFR 11.10(d)",
-                            "impact_category": "Security / Operational",
-                            "estimated_penalty": 25000,
-                            "impact_description": "Unauthorized access is a leading breach vector.",
-                            "recommended_action": "Enforce unique IDs and MFA for all users."
-                        }
-                    ]
-                },
-                "Encryption & Transmission Security": {
-                    "weight": 0.35,
-                    "metrics": [
-                        {
-                            "name": "Encryption-at-Rest Compliance",
-                            "observation": "PHI stored unencrypted on local database.",
-                            "regulation": "HIPAA §164.312(a)(2)(iv)",
-                            "impact_category": "Legal / Financial",
-                            "estimated_penalty": 150000,
-                            "impact_description": "Unencrypted breaches regularly incur six-figure penalties.",
-                            "recommended_action": "Enable AES-256 and key rotation."
-                        }
-                    ]
-                },
-                "System Audit Trails": {
-                    "weight": 0.30,
-                    "metrics": [
-                        {
-                            "name": "Immutable Audit Logs",
-                            "observation": "No tamper-evident change logs.",
-                            "regulation": "21 CFR 11.10(e–k); HIPAA §164.312(b)",
-                            "impact_category": "Legal / Operational",
-                            "estimated_penalty": 50000,
-                            "impact_description": "FDA warning letters and OCR findings for missing logs.",
-                            "recommended_action": "Implement append-only audit store with time sync."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Physical & Infrastructure Safeguards (HIPAA §164.310)": {
-            "weight": 0.10,
-            "description": "Facility, hardware, environment; availability and secure disposal of PHI media.",
-            "mandatory_columns": [
-                {"name": "hosting_environment", "description": "Cloud/on-prem; maps to facility access controls.", "violation_cost_usd": 5000},
-                {"name": "backup_frequency_days", "description": "Interval for full backups.", "violation_cost_usd": 10000},
-                {"name": "backup_last_tested_date", "description": "Most recent successful restore test date.", "violation_cost_usd": 15000},
-                {"name": "system_uptime_percent", "description": "Monthly availability to evidence resilience.", "violation_cost_usd": 5000},
-                {"name": "retention_expiration_date", "description": "Data disposal schedule per policy/contract.", "violation_cost_usd": 25000}
-            ],
-            "subdomains": {
-                "Contingency Planning": {
-                    "weight": 0.40,
-                    "metrics": [
-                        {
-                            "name": "Backup Verification",
-                            "observation": "No quarterly restore tests documented.",
-                            "regulation": "HIPAA §164.308(a)(7)",
-                            "impact_category": "Operational / Legal",
-                            "estimated_penalty": 10000,
-                            "impact_description": "Contingency plan non-compliance.",
-                            "recommended_action": "Quarterly restores with logs and sign-off."
-                        }
-                    ]
-                },
-                "Device & Media Control": {
-                    "weight": 0.30,
-                    "metrics": [
-                        {
-                            "name": "Secure Media Disposal",
-                            "observation": "Retired servers not wiped per NIST 800-88.",
-                            "regulation": "HIPAA §164.310(d)(2)(i)",
-                            "impact_category": "Legal / Financial",
-                            "estimated_penalty": 25000,
-                            "impact_description": "PHI exposure on disposed media triggers breach duties.",
-                            "recommended_action": "Certified destruction and chain-of-custody logs."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Data Integrity & Quality (HIPAA §164.312(c)(1); 21 CFR 11.10(b))": {
-            "weight": 0.15,
-            "description": "Assures electronic records are accurate, complete, and protected from improper alteration or destruction.",
-            "mandatory_columns": [
-                {"name": "record_id", "description": "Immutable unique ID for each record.", "violation_cost_usd": 10000},
-                {"name": "record_checksum", "description": "Cryptographic hash (e.g., SHA-256) for tamper detection.", "violation_cost_usd": 25000},
-                {"name": "created_date", "description": "When the record was created (chronology).", "violation_cost_usd": 5000},
-                {"name": "last_modified_date", "description": "When the record last changed (alteration tracking).", "violation_cost_usd": 10000},
-                {"name": "last_modified_by", "description": "Who changed the record (attribution).", "violation_cost_usd": 7500},
-                {"name": "validation_status", "description": "Pass/fail integrity check result.", "violation_cost_usd": 10000},
-                {"name": "validation_timestamp", "description": "Last time integrity validation executed.", "violation_cost_usd": 7500},
-                {"name": "system_signature", "description": "System-generated signature binding record and version.", "violation_cost_usd": 20000}
-            ],
-            "subdomains": {
-                "Completeness & Accuracy Controls": {
-                    "weight": 0.40,
-                    "metrics": [
-                        {
-                            "name": "Required Field Population",
-                            "observation": "10% of patient files missing MRN/diagnosis.",
-                            "regulation": "21 CFR 11.10(b)",
-                            "impact_category": "Financial / Compliance",
-                            "estimated_penalty": 25000,
-                            "impact_description": "Can invalidate electronic submissions; impacts CMS measures.",
-                            "recommended_action": "Hard-stop validations and stewardship review."
-                        }
-                    ]
-                },
-                "Alteration & Destruction Protection": {
-                    "weight": 0.30,
-                    "metrics": [
-                        {
-                            "name": "Hash Verification",
-                            "observation": "No checksum verification for data-at-rest.",
-                            "regulation": "HIPAA §164.312(c)(1)",
-                            "impact_category": "Legal / Security",
-                            "estimated_penalty": 25000,
-                            "impact_description": "No tamper detection for ePHI.",
-                            "recommended_action": "Generate and periodically verify hashes."
-                        }
-                    ]
-                },
-                "Audit & Traceability Controls": {
-                    "weight": 0.30,
-                    "metrics": [
-                        {
-                            "name": "Change Traceability",
-                            "observation": "Modifications not linked to audit entries.",
-                            "regulation": "21 CFR 11.10(e); HIPAA §164.312(b)",
-                            "impact_category": "Legal / Operational",
-                            "estimated_penalty": 30000,
-                            "impact_description": "Cannot verify proper handling of ePHI.",
-                            "recommended_action": "Immutable append-only audit with time sync."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Interoperability & Electronic Exchange (21 CFR 11.30; ONC Cures Act)": {
-            "weight": 0.10,
-            "description": "Standardized, patient-accessible data exchange; API readiness and terminology normalization.",
-            "mandatory_columns": [
-                {"name": "fhir_resource_type", "description": "Mapped FHIR resource.", "violation_cost_usd": 15000},
-                {"name": "standard_mapping_status", "description": "Mapping completeness to LOINC/SNOMED/RxNorm.", "violation_cost_usd": 10000},
-                {"name": "last_sync_timestamp", "description": "Most recent API/interface exchange time.", "violation_cost_usd": 5000},
-                {"name": "external_system_id", "description": "Partner system identifier for lineage.", "violation_cost_usd": 5000}
-            ],
-            "subdomains": {
-                "FHIR / HL7 Readiness": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "API Endpoint Coverage",
-                            "observation": "Observation endpoint not implemented.",
-                            "regulation": "ONC Cures Act; 21 CFR 11.30",
-                            "impact_category": "Operational / Legal",
-                            "estimated_penalty": 15000,
-                            "impact_description": "May affect program eligibility and incentives.",
-                            "recommended_action": "Deploy certified endpoints and monitor uptime/errors."
-                        }
-                    ]
-                },
-                "Terminology Normalization": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "Standard Code Utilization",
-                            "observation": "Labs lack LOINC; diagnoses not mapped to SNOMED.",
-                            "regulation": "USCDI / ONC Interop Guidance",
-                            "impact_category": "Operational / Financial",
-                            "estimated_penalty": 10000,
-                            "impact_description": "Breaks quality reporting and exchange semantics.",
-                            "recommended_action": "Normalize during ETL; maintain code dictionaries."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Electronic Signatures & Attribution (21 CFR 11.100–11.200)": {
-            "weight": 0.10,
-            "description": "Non-repudiation and signer accountability for approvals, authorship, and reviews.",
-            "mandatory_columns": [
-                {"name": "electronic_signature", "description": "Signature token/hash binding signer to record.", "violation_cost_usd": 30000},
-                {"name": "signature_meaning", "description": "Purpose of signature (approval, review, authorship).", "violation_cost_usd": 10000},
-                {"name": "signature_timestamp", "description": "Date/time of signature.", "violation_cost_usd": 5000},
-                {"name": "signature_user_id", "description": "Authenticated signer identity.", "violation_cost_usd": 10000}
-            ],
-            "subdomains": {
-                "Identity Verification": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "Dual-Credential Verification",
-                            "observation": "Single-factor signatures in use.",
-                            "regulation": "21 CFR 11.100(a)",
-                            "impact_category": "Legal / Security",
-                            "estimated_penalty": 20000,
-                            "impact_description": "Signatures may be deemed invalid by FDA.",
-                            "recommended_action": "Require password plus biometric or token; periodic re-auth."
-                        }
-                    ]
-                },
-                "Signature Linkage": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "Signature to Version Binding",
-                            "observation": "Signatures not bound to specific record version.",
-                            "regulation": "21 CFR 11.70",
-                            "impact_category": "Legal / Operational",
-                            "estimated_penalty": 15000,
-                            "impact_description": "Weak linkage undermines record trust.",
-                            "recommended_action": "Bind signature to checksum, version, and user."
-                        }
-                    ]
-                }
-            }
-        },
-
-        "Information Governance & Infonomics (Value of Data)": {
-            "weight": 0.15,
-            "description": "Translates compliance maturity into measurable ROI, reduced denials, and operational gains.",
-            "mandatory_columns": [
-                {"name": "financial_impact_estimate", "description": "Estimated dollar impact per issue/remediation.", "violation_cost_usd": 10000},
-                {"name": "readiness_score", "description": "Computed Data Readiness Index (0–100).", "violation_cost_usd": 5000},
-                {"name": "risk_level", "description": "LOW/MEDIUM/HIGH exposure categorization.", "violation_cost_usd": 5000}
-            ],
-            "subdomains": {
-                "Data ROI Tracking": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "Claim Denial Correlation",
-                            "observation": "No linkage of data errors to denial rates.",
-                            "regulation": "CMS Program Integrity (best practice)",
-                            "impact_category": "Financial",
-                            "estimated_penalty": 50000,
-                            "impact_description": "Five to ten percent margin erosion from preventable denials.",
-                            "recommended_action": "Correlate data quality issues with denials; prioritize fixes."
-                        }
-                    ]
-                },
-                "Portfolio Readiness Benchmarking": {
-                    "weight": 0.50,
-                    "metrics": [
-                        {
-                            "name": "Clinic Readiness Index",
-                            "observation": "No standardized scoring across sites.",
-                            "regulation": "Governance best practice",
-                            "impact_category": "Operational / Strategic",
-                            "estimated_penalty": 10000,
-                            "impact_description": "Hard to prioritize remediation and M&A sequencing.",
-                            "recommended_action": "Adopt uniform scoring and heatmaps across clinics."
-                        }
-                    ]
-                }
-            }
-        }
-    },
+@st.cache_resource
+def get_compiled_schema():
+    return compile_schema()
 
-    "visual_summary": {
-        "diagram_type": "spider_web",
-        "description": "Radar chart illustrating readiness level per compliance domain (0–100)."
-    }
-}
+COMPILED = get_compiled_schema()
+SCHEMA = COMPILED.schema
 
 # =========================
 # State
@@ -428,47 +55,23 @@ def money(n):
     except Exception:
         return "$0"
 
-def calc_domain_score_and_cost(domain_name, domain_obj):
-    # Mandatory coverage
-    mandatory = domain_obj.get("mandatory_columns", [])
-    mandatory_cost = 0
-    if mandatory:
-        flags = []
-        for col in mandatory:
-            key = (domain_name, col["name"])
-            exists = st.session_state.mandatory_flags.get(key, False)
-            flags.append(exists)
-            if not exists:
-                mandatory_cost += int(col.get("violation_cost_usd", 0))
-        mandatory_coverage = (sum(flags) / len(flags)) if flags else 1.0
-    else:
-        mandatory_coverage = 1.0
-
-    # Metrics weighted by subdomain weights
-    subs = domain_obj.get("subdomains", {})
-    total_w = sum([sobj.get("weight", 0) for sobj in subs.values()]) if subs else 0
-    metric_score = 0.0
-    metric_cost = 0
-    for sname, sobj in subs.items():
-        s_weight = sobj.get("weight", 0)
-        metrics = sobj.get("metrics", [])
-        if not metrics:
-            continue
-        satisfied = 0
-        for m in metrics:
-            key = (domain_name, sname, m["name"])
-            ok = st.session_state.metric_flags.get(key, False)
-            if ok:
-                satisfied += 1
-            else:
-                metric_cost += int(m.get("estimated_penalty", 0))
-        sub_pct = (satisfied / len(metrics)) if metrics else 1.0
-        if total_w > 0:
-            metric_score += sub_pct * (s_weight / total_w)
-
-    readiness = metric_score * mandatory_coverage * 100.0
-    total_cost = mandatory_cost + metric_cost
-    return readiness, total_cost
+def flag_widget_key(key):
+    return "flag::" + "::".join(key)
+
+def set_flag(flags, key, value):
+    # Scanners run before the checkboxes render: update the widget too, or a ticked box would win
+    flags[key] = value
+    st.session_state[flag_widget_key(key)] = value
+
+def sync_flags():
+    # Checkbox values are in their widget state before the boxes render, so all domains can be scored up front
+    for flags, keys in ((st.session_state.mandatory_flags, COMPILED.mandatory_keys),
+                        (st.session_state.metric_flags, COMPILED.metric_keys)):
+        for key in keys:
+            wkey = flag_widget_key(key)
+            if wkey not in st.session_state:
+                st.session_state[wkey] = flags.get(key, False)
+            flags[key] = st.session_state[wkey]
 
 def export_summary_csv(domain_scores, domain_costs, overall_score, overall_cost):
     sio = StringIO()
@@ -482,7 +85,7 @@ def export_summary_csv(domain_scores, domain_costs, overall_score, overall_cost)
 
 def export_state_json(schema_obj, domain_scores, domain_costs, overall_score, overall_cost):
     payload = {
-        "schema_version": "1.0",
+        "schema_version": schema_obj.get("schema_version", COMPILED.version),
         "current_state_summary": schema_obj["current_state_summary"],
         "scores": domain_scores,
         "costs": domain_costs,
@@ -555,12 +158,135 @@ for r in css["top_risks"]:
 
 st.markdown("---")
 
+# =========================
+# UI: Automatic Column Detection
+# =========================
+st.header("Automatic Column Detection")
+st.caption("Reads only headers / catalog metadata from CSV, Parquet, SQLite and Postgres sources and ticks the "
+           "mandatory columns it finds (fuzzy name matching).")
+with st.expander("Scan data sources", expanded=False):
+    # Server paths are limited to HIPAA_SERVER_ROOTS; DSNs only to those the operator put in HIPAA_SCAN_SOURCES.
+    configured_sources = os.environ.get("HIPAA_SCAN_SOURCES", "").splitlines()
+    scan_sources = ""
+    if SERVER_ROOTS or configured_sources:
+        scan_sources = st.text_area("Folders, files or Postgres DSNs (one per line)",
+                                    value="\n".join(configured_sources),
+                                    placeholder="/data/exports\n/data/ehr.sqlite\npostgresql://audit@db-host/ehr",
+                                    help="Folders allowed: " + (", ".join(SERVER_ROOTS) or "none")
+                                         + ". Databases: only those set in HIPAA_SCAN_SOURCES.")
+    else:
+        st.caption("Server-side sources are off; set HIPAA_SERVER_ROOTS or HIPAA_SCAN_SOURCES to enable them.")
+    scan_uploads = st.file_uploader("…or upload files (only the header is read)", type=["csv", "tsv", "gz", "parquet"],
+                                    accept_multiple_files=True, key="scan_uploads")
+    sc1, sc2 = st.columns(2)
+    scan_threshold = sc1.slider("Fuzzy match threshold", 0.6, 1.0, MATCH_THRESHOLD, 0.01)
+    keep_manual = sc2.checkbox("Keep manual ticks for columns not found", value=True)
+    if st.button("🔎 Scan", key="scan_columns"):
+        sources, rejected = allowed_sources(scan_sources.splitlines(), configured_sources)
+        if rejected:
+            st.error("❌ Not an allowed source: " + ", ".join(rejected))
+        else:
+            report = scan(sources, [c for _, c in COMPILED.mandatory_keys], scan_threshold,
+                          uploads=[(f.name, f.getvalue()) for f in scan_uploads or []])
+            for key, found in scanned_mandatory_flags(COMPILED, report).items():
+                if found or not keep_manual:
+                    set_flag(st.session_state.mandatory_flags, key, found)
+            st.session_state.column_scan = report
+
+    report = st.session_state.get("column_scan")
+    if report:
+        rows = coverage_rows(COMPILED, report)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Mandatory Columns Found", f"{sum(r['found'] for r in rows)} / {len(rows)}")
+        m2.metric("Tables Read", f"{report['tables']:,}")
+        m3.metric("Columns Seen", f"{report['columns']:,}")
+        m4.metric("Scan Time", f"{report['seconds']:.2f}s")
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        for e in report["errors"][:20]:
+            st.warning(f"⚠️ {e}")
+
+# =========================
+# UI: PHI Detection Scanner
+# =========================
+st.header("PHI Detection Scanner")
+st.caption("Streams CSV / TSV / Parquet files in fixed-size chunks across a process pool and reports, per column, "
+           "how many values look like SSNs, MRNs, dates of birth, phone numbers, emails or names. "
+           "Evidence is masked. PHI found in plain files counts against Encryption-at-Rest Compliance.")
+with st.expander("Scan files for PHI", expanded=False):
+    configured_phi_sources = os.environ.get("HIPAA_PHI_SOURCES", "").splitlines()
+    phi_sources = ""
+    if SERVER_ROOTS or configured_phi_sources:
+        phi_sources = st.text_area("Files or folders (one per line)", value="\n".join(configured_phi_sources),
+                                   placeholder="/data/exports\n/data/claims_2024.parquet", key="phi_sources",
+                                   help="Folders allowed: " + (", ".join(SERVER_ROOTS) or "none")
+                                        + ", plus those set in HIPAA_PHI_SOURCES.")
+    else:
+        st.caption("Server-side files are off; set HIPAA_SERVER_ROOTS or HIPAA_PHI_SOURCES to enable them.")
+    phi_uploads = st.file_uploader("…or upload files", type=["csv", "tsv", "gz", "parquet"],
+                                   accept_multiple_files=True, key="phi_uploads")
+    pc1, pc2, pc3 = st.columns(3)
+    phi_workers = pc1.number_input("Worker processes", 1, 64, PHI_WORKERS)
+    phi_chunk_mb = pc2.number_input("Chunk size (MB)", 1, 512, int(PHI_CHUNK_MB))
+    phi_threshold = pc3.slider("PHI column hit rate", 0.01, 1.0, HIT_RATE_THRESHOLD, 0.01)
+    phi_requested = st.button("🛡️ Scan for PHI", key="scan_phi")
+    sources, rejected = allowed_sources(phi_sources.splitlines(), configured_phi_sources)
+    if phi_requested and rejected:
+        st.error("❌ Not an allowed source: " + ", ".join(rejected))
+    elif phi_requested:
+        bar = st.progress(0.0, text="Scanning…")
+        with tempfile.TemporaryDirectory(prefix="phi_scan_") as upload_dir:
+            uploaded = {}   # temp path -> uploaded name; the index prefix keeps same-named uploads apart
+            for i, f in enumerate(phi_uploads or []):
+                path = os.path.join(upload_dir, f"{i}_{os.path.basename(f.name)}")
+                with open(path, "wb") as out:
+                    out.write(f.getvalue())
+                uploaded[path] = f.name
+            if uploaded:
+                sources.append(upload_dir)
+            phi_report = scan_phi(sources, int(phi_workers), float(phi_chunk_mb),
+                                  on_progress=lambda done, total: bar.progress(done / total, text=f"Chunk {done}/{total}"))
+        for finding in phi_report["findings"]:
+            finding["file"] = uploaded.get(finding["file"], finding["file"])
+        for path, name in uploaded.items():
+            phi_report["errors"] = [e.replace(path, name) for e in phi_report["errors"]]
+        phi_report["phi_columns"] = phi_columns(phi_report, phi_threshold)
+        st.session_state.phi_scan = phi_report
+        enc_key = encryption_metric_key(COMPILED)
+        if phi_report["phi_columns"] and enc_key:
+            set_flag(st.session_state.metric_flags, enc_key, False)
+
+    phi_report = st.session_state.get("phi_scan")
+    if phi_report:
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("PHI Columns", len(phi_report["phi_columns"]))
+        p2.metric("Rows Scanned", f"{phi_report['rows']:,}")
+        p3.metric("Data Scanned", f"{phi_report['bytes'] / (1 << 20):,.0f} MB")
+        p4.metric("Throughput", f"{phi_report['mb_per_s']} MB/s")
+        if phi_report["phi_columns"]:
+            st.error(f"🚨 PHI found in {len({f['file'] for f in phi_report['phi_columns']})} unencrypted file(s).")
+            st.dataframe(pd.DataFrame(phi_report["phi_columns"]), use_container_width=True)
+        elif not phi_report["files"]:
+            st.warning("⚠️ No files were scanned — nothing to clear.")
+        elif phi_report["errors"]:
+            st.warning("⚠️ No PHI column found, but not every source could be scanned — see the errors below.")
+        else:
+            st.success("✅ No column above the PHI hit-rate threshold.")
+        with st.expander("All findings (including incidental matches)"):
+            st.dataframe(pd.DataFrame(phi_report["findings"]), use_container_width=True)
+        for e in phi_report["errors"][:20]:
+            st.warning(f"⚠️ {e}")
+
+st.markdown("---")
+
 # =========================
 # UI: Domains
 # =========================
-overall_cost = 0
-overall_weighted_score = 0
-overall_weight_sum = 0
+# Readiness = weighted subdomain metric coverage x mandatory-column coverage; see scoring.py
+sync_flags()
+domain_scores, domain_costs, overall_score, overall_cost = COMPILED.score_flags(
+    st.session_state.mandatory_flags, st.session_state.metric_flags)
+st.session_state.domain_scores.update(domain_scores)
+st.session_state.domain_costs.update(domain_costs)
 
 for domain_name, domain in SCHEMA["compliance_domains"].items():
     with st.expander(domain_name, expanded=False):
@@ -571,10 +297,9 @@ for domain_name, domain in SCHEMA["compliance_domains"].items():
         if mand:
             st.subheader("Mandatory Columns")
             for col in mand:
-                key = (domain_name, col["name"])
-                st.session_state.mandatory_flags[key] = st.checkbox(
+                st.checkbox(
                     f"{col['name']} — {col['description']} (Violation Cost {money(col['violation_cost_usd'])})",
-                    value=st.session_state.mandatory_flags.get(key, False)
+                    key=flag_widget_key((domain_name, col["name"]))
                 )
 
         # Subdomains and metrics
@@ -585,10 +310,15 @@ for domain_name, domain in SCHEMA["compliance_domains"].items():
                 st.markdown(f"**{sname}** (weight {sobj.get('weight', 0):.2f})")
                 for m in sobj.get("metrics", []):
                     mkey = (domain_name, sname, m["name"])
-                    st.session_state.metric_flags[mkey] = st.checkbox(
+                    st.checkbox(
                         f"{m['name']} — {m['observation']} [{m['regulation']}] (Penalty {money(m.get('estimated_penalty', 0))})",
-                        value=st.session_state.metric_flags.get(mkey, False)
+                        key=flag_widget_key(mkey)
                     )
+                    phi_found = st.session_state.get("phi_scan", {}).get("phi_columns")
+                    if phi_found and mkey == encryption_metric_key(COMPILED):
+                        st.caption("🚨 PHI scanner: " + "; ".join(
+                            f"{os.path.basename(f['file'])}.{f['column']} {f['identifier']} {f['hit_rate']:.0%}"
+                            for f in phi_found[:5]))
 
                     # BAA file upload if configured
                     ucfg = m.get("upload_config", {})
@@ -628,26 +358,15 @@ for domain_name, domain in SCHEMA["compliance_domains"].items():
                             baa_score = (valid / total) * 100 if total else 0
                             st.metric("BAA Compliance Score", f"{baa_score:.0f}%")
 
-        # Compute domain score and cost
-        d_score, d_cost = calc_domain_score_and_cost(domain_name, domain)
-        st.session_state.domain_scores[domain_name] = d_score
-        st.session_state.domain_costs[domain_name] = d_cost
-
         cL, cR = st.columns(2)
-        cL.metric("Domain Readiness Score", f"{d_score:.1f} / 100")
-        cR.metric("Estimated Exposure", money(d_cost))
-
-        overall_weighted_score += d_score * domain.get("weight", 0)
-        overall_weight_sum += domain.get("weight", 0)
-        overall_cost += d_cost
+        cL.metric("Domain Readiness Score", f"{domain_scores[domain_name]:.1f} / 100")
+        cR.metric("Estimated Exposure", money(domain_costs[domain_name]))
 
 st.markdown("---")
 
 # =========================
 # UI: Overall Summary and Export
 # =========================
-overall_score = (overall_weighted_score / overall_weight_sum) if overall_weight_sum else 0.0
-
 oc1, oc2, oc3, oc4 = st.columns(4)
 oc1.metric("Overall Readiness Index", f"{overall_score:.1f} / 100")
 oc2.metric("Aggregate Estimated Exposure", money(overall_cost))
@@ -670,3 +389,35 @@ fig = radar_chart(st.session_state.domain_scores)
 st.pyplot(fig)
 
 st.caption("Scoring = weighted average across subdomain indicators multiplied by mandatory-column coverage. Estimated exposure = penalties for unmet metrics plus violation-costs for missing mandatory columns.")
+
+st.markdown("---")
+
+# =========================
+# UI: Portfolio Batch Scoring
+# =========================
+st.header("Portfolio Batch Scoring")
+st.caption("Score many organizations at once: one row per organization, one 0/1 column per mandatory column "
+           "and per metric (1 / yes / true / x = in place). Missing columns count as not in place.")
+
+template = COMPILED.template([css["organization"]], st.session_state.mandatory_flags, st.session_state.metric_flags)
+st.download_button("Download Batch Template (current answers as first row)", data=template.to_csv(index=False),
+                   file_name="portfolio_template.csv", mime="text/csv")
+
+batch_file = st.file_uploader("Upload portfolio CSV", type=["csv"], key="portfolio_csv")
+if batch_file is not None:
+    try:
+        batch_df = pd.read_csv(batch_file, dtype=str).fillna("")
+    except Exception as e:
+        st.error(f"❌ Could not read CSV: {e}")
+        st.stop()
+    results, missing = COMPILED.batch_score(batch_df)
+    if missing:
+        st.warning(f"⚠️ {len(missing)} of {len(COMPILED.flag_columns())} flag columns not in the upload — scored as not in place.")
+    pc1, pc2, pc3 = st.columns(3)
+    pc1.metric("Organizations", len(results))
+    pc2.metric("Median Readiness", f"{results['overall_readiness'].median():.1f} / 100")
+    pc3.metric("Portfolio Exposure", money(results["total_exposure_usd"].sum()))
+    st.dataframe(results, use_container_width=True)
+    st.bar_chart(results.set_index("organization")["total_exposure_usd"].head(50))
+    st.download_button("Download Portfolio Scores", data=results.to_csv(index=False),
+                       file_name="portfolio_scores.csv", mime="text/csv")
@@ -0,0 +1,305 @@
+"""
+Mandatory-column detection from real datasets.
+
+Points at CSV / TSV / Parquet files (or folders of them), SQLite databases and
+Postgres DSNs and reads only what describes the columns: the first line of a
+text file, the Parquet footer schema, sqlite_master / pragma_table_info, or
+Postgres information_schema.columns in one catalog query. No rows are read.
+Sources are read by a thread pool, so hundreds of files or several databases
+are listed in parallel.
+
+Column names are matched to the schema's mandatory columns after
+normalisation (camelCase, separators, common abbreviations), then by token
+set, then by difflib similarity above a threshold. Each distinct name is
+matched once however many tables carry it.
+
+    python HIPPA_AUDIT/column_scanner.py /data/exports clinic.sqlite postgresql://audit@db/ehr
+"""
+import argparse
+import csv
+import difflib
+import gzip
+import io
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SCAN_WORKERS = int(os.environ.get("HIPAA_SCAN_WORKERS", "16"))
+MATCH_THRESHOLD = float(os.environ.get("HIPAA_SCAN_THRESHOLD", "0.85"))
+
+TEXT_SUFFIXES = (".csv", ".tsv", ".csv.gz", ".tsv.gz")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+# Folders the app lets a browser user scan (os.pathsep-separated); none = only the configured sources
+SERVER_ROOTS = [r for r in os.environ.get("HIPAA_SERVER_ROOTS", "").split(os.pathsep) if r.strip()]
+
+# abbreviation -> token of the schema's spelling
+ABBREVIATIONS = {
+    "dt": "date", "ts": "timestamp", "tstamp": "timestamp", "datetime": "timestamp", "time": "timestamp",
+    "usr": "user", "uid": "user_id", "userid": "user_id", "mod": "modified", "upd": "modified",
+    "updated": "modified", "chk": "checksum", "hash": "checksum", "crc": "checksum", "ver": "version",
+    "rev": "version", "sig": "signature", "esig": "electronic_signature", "enc": "encryption",
+    "encrypted": "encryption", "auditid": "audit_log_id", "mfa": "mfa", "2fa": "mfa", "tfa": "mfa",
+    "ext": "external", "sys": "system", "pct": "percent", "exp": "expiration", "crt": "created",
+    "fhir": "fhir", "std": "standard", "val": "validation", "valid": "validation", "freq": "frequency",
+    "rec": "record", "flag": "", "ind": "", "yn": "",   # boolean-column suffixes carry no meaning here
+}
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name):
+    """'LastModifiedDt' / 'last-modified dt' / 'LAST_MOD_DATE' -> 'last_modified_date'."""
+    tokens = _SEPARATORS.split(_CAMEL.sub("_", str(name).strip()).lower())
+    return "_".join(t for t in (ABBREVIATIONS.get(t, t) for t in tokens if t) if t)
+
+
+class ColumnMatcher:
+    """Matches arbitrary column names to a fixed list of required names."""
+
+    def __init__(self, targets, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.targets = sorted(set(targets))
+        self._norm = {t: normalize(t) for t in self.targets}
+        self._by_norm = {n: t for t, n in self._norm.items()}
+        self._by_tokens = {frozenset(n.split("_")): t for t, n in self._norm.items()}
+        self._compact = {t: n.replace("_", "") for t, n in self._norm.items()}
+        self._memo = {}
+
+    def match(self, column):
+        """(target, score) for the best target at or above the threshold, else (None, best score)."""
+        if column in self._memo:
+            return self._memo[column]
+        norm = normalize(column)
+        if norm in self._by_norm:
+            result = (self._by_norm[norm], 1.0)
+        elif frozenset(norm.split("_")) in self._by_tokens:
+            result = (self._by_tokens[frozenset(norm.split("_"))], 0.95)
+        else:
+            compact = norm.replace("_", "")
+            best, score = None, 0.0
+            for target, t_compact in self._compact.items():
+                sm = difflib.SequenceMatcher(None, compact, t_compact)
+                if sm.real_quick_ratio() < max(score, self.threshold) or sm.quick_ratio() < max(score, self.threshold):
+                    continue
+                ratio = sm.ratio()
+                if ratio > score:
+                    best, score = target, ratio
+            result = (best, round(score, 3)) if score >= self.threshold else (None, round(score, 3))
+        self._memo[column] = result
+        return result
+
+
+# ---------- metadata readers: each returns [(table, [columns])] ----------
+def text_headers(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", errors="replace", newline="") as f:
+        line = f.readline()
+    return [(path, _split_header(line, sniff_delimiter(line, path)))]
+
+
+def sniff_delimiter(line, name=""):
+    """Tab for .tsv files, otherwise whichever of , ; | tab is most frequent in the header line."""
+    return "\t" if ".tsv" in name.lower() else max(",;|\t", key=line.count)
+
+
+def _split_header(line, delimiter):
+    return [c.strip() for c in next(csv.reader([line], delimiter=delimiter), []) if c.strip()]
+
+
+def parquet_headers(path):
+    import pyarrow.parquet as pq   # optional: only needed when Parquet files are scanned
+    return [(path, list(pq.read_schema(path).names))]
+
+
+def sqlite_headers(path):
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = con.execute(
+            "SELECT m.name, p.name FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+            "WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%' ORDER BY m.name, p.cid"
+        ).fetchall()
+    finally:
+        con.close()
+    return _grouped((f"{os.path.basename(path)}:{t}", c) for t, c in rows)
+
+
+def postgres_headers(dsn):
+    import psycopg2   # optional: only needed when a Postgres DSN is scanned
+    con = psycopg2.connect(dsn)
+    try:
+        with con.cursor() as cur:
+            cur.execute(
+                "SELECT table_schema || '.' || table_name, column_name FROM information_schema.columns "
+                "WHERE table_schema NOT IN ('pg_catalog', 'information_schema') "
+                "ORDER BY table_schema, table_name, ordinal_position"
+            )
+            rows = cur.fetchall()
+    finally:
+        con.close()
+    return _grouped(rows)
+
+
+def _grouped(pairs):
+    tables = {}
+    for table, column in pairs:
+        tables.setdefault(table, []).append(column)
+    return list(tables.items())
+
+
+def upload_headers(name, data):
+    """Headers of an uploaded file's bytes (CSV/TSV by first line, Parquet by footer)."""
+    lower = name.lower()
+    if lower.endswith(PARQUET_SUFFIXES):
+        import pyarrow.parquet as pq
+        return [(name, list(pq.read_schema(io.BytesIO(data)).names))]
+    if lower.endswith(".gz"):
+        data = gzip.decompress(data)
+    line = data.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace")
+    return [(name, _split_header(line, sniff_delimiter(line, lower)))]
+
+
+def is_dsn(location):
+    lower = location.lower()
+    return lower.startswith(("postgres://", "postgresql://")) or lower.startswith("host=") or " dbname=" in lower
+
+
+def reader_for(location):
+    lower = location.lower()
+    if is_dsn(location):
+        return postgres_headers
+    if lower.endswith(PARQUET_SUFFIXES):
+        return parquet_headers
+    if lower.endswith(SQLITE_SUFFIXES):
+        return sqlite_headers
+    if lower.endswith(TEXT_SUFFIXES):
+        return text_headers
+    return None
+
+
+def allowed_sources(sources, trusted=(), roots=None):
+    """
+    Split user-entered sources into (allowed, rejected). Allowed: the operator's
+    `trusted` sources as written, and files or folders that resolve under one of
+    `roots`. A DSN is never allowed unless it is trusted.
+    """
+    trusted = {t.strip() for t in trusted}
+    roots = [os.path.realpath(r) for r in (SERVER_ROOTS if roots is None else roots)]
+    allowed, rejected = [], []
+    for source in (s.strip() for s in sources):
+        if not source:
+            continue
+        real = None if is_dsn(source) else os.path.realpath(source)
+        ok = source in trusted or (real is not None and any(os.path.commonpath([real, r]) == r for r in roots))
+        (allowed if ok else rejected).append(source)
+    return allowed, rejected
+
+
+def expand(sources):
+    """Sources (files, folders, DSNs) -> readable (reader, location) jobs; folders are walked."""
+    jobs = []
+    for source in sources:
+        source = source.strip()
+        if not source:
+            continue
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if reader_for(path):
+                        jobs.append((reader_for(path), path))
+        elif reader_for(source):
+            jobs.append((reader_for(source), source))
+    return jobs
+
+
+# ---------- scan ----------
+def scan(sources, targets, threshold=MATCH_THRESHOLD, workers=SCAN_WORKERS, uploads=()):
+    """
+    `targets`: required column names. `uploads`: (name, bytes) pairs read in-process.
+    Returns a report: tables read, per-target matches [(table, column, score)], errors and timing.
+    """
+    t0 = time.perf_counter()
+    jobs = expand(sources)
+    tables, errors = [], []
+
+    def run(job):
+        reader, location = job
+        try:
+            return reader(location), None
+        except Exception as e:
+            return [], f"{location}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs) or 1))) as pool:
+        for found, error in pool.map(run, jobs):
+            tables.extend(found)
+            if error:
+                errors.append(error)
+    for name, data in uploads:
+        try:
+            tables.extend(upload_headers(name, data))
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+
+    matcher = ColumnMatcher(targets, threshold)
+    matches = {t: [] for t in matcher.targets}
+    for table, columns in tables:
+        for column in columns:
+            target, score = matcher.match(column)
+            if target:
+                matches[target].append((table, column, score))
+    return {
+        "sources": len(jobs) + len(uploads), "tables": len(tables),
+        "columns": sum(len(c) for _, c in tables), "distinct_columns": len(matcher._memo),
+        "matches": matches, "errors": errors, "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def mandatory_flags(compiled, report):
+    """(domain, column) -> found, for every mandatory column of the compiled schema."""
+    return {key: bool(report["matches"].get(key[1])) for key in compiled.mandatory_keys}
+
+
+def coverage_rows(compiled, report):
+    rows = []
+    for domain, column in compiled.mandatory_keys:
+        hits = sorted(report["matches"].get(column, []), key=lambda h: -h[2])
+        rows.append({
+            "domain": domain.split(" (")[0], "mandatory_column": column, "found": bool(hits),
+            "best_match": f"{hits[0][0]} → {hits[0][1]}" if hits else "",
+            "score": hits[0][2] if hits else None, "tables": len({h[0] for h in hits}),
+        })
+    return rows
+
+
+def main():
+    from scoring import compile_schema
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sources", nargs="+", help="CSV/Parquet files or folders, SQLite files, Postgres DSNs")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    args = parser.parse_args()
+
+    compiled = compile_schema()
+    report = scan(args.sources, [c for _, c in compiled.mandatory_keys], args.threshold, args.workers)
+    rows = coverage_rows(compiled, report)
+    print(f"{'domain':<40} {'mandatory column':<28} {'found':<6} best match")
+    for r in rows:
+        score = "" if r["score"] is None else f"({r['score']})"
+        print(f"{r['domain']:<40} {r['mandatory_column']:<28} {'yes' if r['found'] else 'no':<6} {r['best_match']} {score}")
+    found = sum(r["found"] for r in rows)
+    print(f"\n{found}/{len(rows)} mandatory columns found across {report['tables']} tables "
+          f"({report['columns']:,} columns, {report['distinct_columns']:,} distinct) from {report['sources']} sources "
+          f"in {report['seconds']}s")
+    for e in report["errors"]:
+        print(f"  error: {e}")
+
+
+if __name__ == "__main__":
+    main()
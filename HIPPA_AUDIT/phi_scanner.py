@@ -0,0 +1,339 @@
+"""
+Streaming PHI detection over CSV / TSV / Parquet data.
+
+Files are never loaded whole. Plain-text files are cut into byte ranges of
+about CHUNK_MB, aligned to line boundaries by the worker that reads them (a
+range owns every line that starts inside it). Parquet files are cut by row
+group. Gzip files cannot be seeked, and a byte range could split a quoted
+multi-line cell, so gzip files and text files whose first QUOTE_SAMPLE_BYTES
+hold a quoted newline are streamed by one worker in row chunks instead. Each
+chunk is parsed as strings by pandas in a process pool; malformed lines the
+parser skips are counted and reported as errors, never dropped silently.
+The module-level patterns, compiled once per worker process, run once over
+each column's distinct values (see scan_frame).
+
+Per (file, column, identifier) the scan reports rows scanned, rows hit, the hit
+rate and a few masked evidence values. Columns holding PHI in a plain-text or
+Parquet file are evidence against the Technical Safeguards
+"Encryption-at-Rest Compliance" control.
+
+    python HIPPA_AUDIT/phi_scanner.py /data/exports --workers 8
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from column_scanner import PARQUET_SUFFIXES, TEXT_SUFFIXES, sniff_delimiter   # noqa: E402
+
+CHUNK_MB = float(os.environ.get("HIPAA_PHI_CHUNK_MB", "32"))
+PHI_WORKERS = int(os.environ.get("HIPAA_PHI_WORKERS", str(os.cpu_count() or 2)))
+EVIDENCE_SAMPLES = int(os.environ.get("HIPAA_PHI_SAMPLES", "3"))
+HIT_RATE_THRESHOLD = float(os.environ.get("HIPAA_PHI_HIT_RATE", "0.05"))
+NAME_DICT_PATH = os.environ.get("HIPAA_NAME_DICT", "")   # optional extra names, one per line
+STREAM_CHUNK_ROWS = 200_000
+QUOTE_SAMPLE_BYTES = 1 << 20
+
+# HIPAA Safe Harbor identifiers detectable from cell values. A column's distinct
+# cells are joined with newlines and scanned once by the alternation of all
+# patterns (MULTILINE, so ^/$ are cell bounds; [ \t] rather than \s so no match
+# spans two cells). One combined pass is 2-4x faster than one pass per pattern.
+PATTERNS = {
+    "SSN": r"\b(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}\b",
+    "DOB / date": r"\b(?:(?:19|20)\d{2}[-/.](?:0?[1-9]|1[0-2])[-/.](?:0?[1-9]|[12]\d|3[01])"
+                  r"|(?:0?[1-9]|1[0-2])[-/.](?:0?[1-9]|[12]\d|3[01])[-/.](?:19|20)\d{2})\b",
+    "Phone": r"(?<!\d)(?:\+?1[ .-]?)?\(?[2-9]\d{2}\)?[ .-]?[2-9]\d{2}[ .-]\d{4}(?!\d)",
+    "Email": r"\b[\w.%+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b",
+    "MRN": r"^[ \t]*(?:[Mm][Rr][Nn][ \t:#-]*)?[A-Za-z]{0,3}\d{6,10}[ \t]*$",
+}
+IDENTIFIERS = list(PATTERNS)
+COMBINED = re.compile("|".join(f"({p})" for p in PATTERNS.values()), re.MULTILINE)   # group i+1 = IDENTIFIERS[i]
+# Short all-alphabetic cells ("Mary Smith", "SMITH, MARY J."): first and last token looked up in NAMES.
+NAME_CELL = re.compile(r"^[ \t]*([A-Za-z][A-Za-z'-]*)\.?(?:[ \t,]+[A-Za-z][A-Za-z'-]*\.?){0,2}?"
+                       r"(?:[ \t,]+([A-Za-z][A-Za-z'-]*)\.?)?[ \t]*$", re.MULTILINE)
+
+FIRST_NAMES = {
+    "james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "william", "elizabeth",
+    "david", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah", "charles", "karen",
+    "christopher", "nancy", "daniel", "lisa", "matthew", "betty", "anthony", "margaret", "mark", "sandra",
+    "donald", "ashley", "steven", "kimberly", "paul", "emily", "andrew", "donna", "joshua", "michelle",
+    "kenneth", "dorothy", "kevin", "carol", "brian", "amanda", "george", "melissa", "edward", "deborah",
+    "maria", "jose", "juan", "carlos", "luis", "ana", "rosa", "wei", "li", "mohammed", "fatima", "aisha",
+}
+LAST_NAMES = {
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+    "hernandez", "lopez", "gonzalez", "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin",
+    "lee", "perez", "thompson", "white", "harris", "sanchez", "clark", "ramirez", "lewis", "robinson",
+    "walker", "young", "allen", "king", "wright", "scott", "torres", "nguyen", "hill", "flores", "green",
+    "adams", "nelson", "baker", "hall", "rivera", "campbell", "mitchell", "carter", "roberts", "patel",
+    "kim", "chen", "wang", "singh", "khan", "ali", "cohen", "murphy", "kelly", "cooper", "reed", "cook",
+}
+
+
+def _load_names():
+    names = FIRST_NAMES | LAST_NAMES
+    if NAME_DICT_PATH and os.path.exists(NAME_DICT_PATH):
+        with open(NAME_DICT_PATH, encoding="utf-8") as f:
+            names |= {line.strip().lower() for line in f if line.strip()}
+    return frozenset(names)
+
+
+NAMES = _load_names()
+
+
+def mask(value, keep=4):
+    """Evidence is stored masked: every letter/digit except the last `keep` characters becomes •."""
+    value = str(value).strip()[:80]
+    return re.sub(r"[A-Za-z0-9]", "•", value[:-keep]) + value[-keep:] if len(value) > keep else "•" * len(value)
+
+
+def _cell_hits(offsets, starts):
+    """Boolean per cell from match offsets into the joined text."""
+    hit = np.zeros(len(starts), bool)
+    if len(offsets):
+        hit[np.searchsorted(starts, offsets, side="right") - 1] = True
+    return hit
+
+
+def scan_frame(df, samples=EVIDENCE_SAMPLES):
+    """{column: [non-empty cells, {identifier: [hits, [masked evidence]]}]} for one chunk of string columns."""
+    out = {}
+    for column in df.columns:
+        s = df[column]
+        s = s[s != ""]
+        if s.empty:
+            continue
+        # Identical cells (status codes, templated notes, repeated names) are matched once and weighted by count.
+        codes, uniques = pd.factorize(s)
+        counts = np.bincount(codes, minlength=len(uniques))
+        cells = uniques.tolist()   # iterating the Index itself is ~30x slower
+        text = "\n".join(cells)
+        lengths = np.fromiter(map(len, cells), dtype=np.int64, count=len(cells))
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+
+        matches = np.array([(m.start(), m.lastindex) for m in COMBINED.finditer(text)], dtype=np.int64).reshape(-1, 2)
+        hits = {name: _cell_hits(matches[matches[:, 1] == i + 1, 0], starts) for i, name in enumerate(IDENTIFIERS)}
+        hits["Name"] = _cell_hits(np.array([m.start() for m in NAME_CELL.finditer(text)
+                                            if m.group(1).lower() in NAMES or (m.group(2) or "").lower() in NAMES],
+                                           dtype=np.int64), starts)
+        found = {}
+        for name, hit in hits.items():
+            count = int(counts[hit].sum())
+            if count:
+                found[name] = [count, [mask(v) for v in uniques[hit][:samples]]]
+        out[column] = [len(s), found]
+    return out
+
+
+def merge(acc, part, samples=EVIDENCE_SAMPLES):
+    """Add one chunk's scan_frame result into `acc` (same shape)."""
+    for column, (n, found) in part.items():
+        cur = acc.setdefault(column, [0, {}])
+        cur[0] += n
+        for name, (hits, evidence) in found.items():
+            f = cur[1].setdefault(name, [0, []])
+            f[0] += hits
+            f[1] = (f[1] + evidence)[:samples]
+    return acc
+
+
+# ---------- chunk jobs (run in worker processes) ----------
+def _read_text_range(path, start, end, header, sep):
+    """The lines that start inside [start, end): a partial first line belongs to the previous range."""
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        begin = f.tell()
+        if begin >= end:
+            return pd.DataFrame(columns=header)
+        f.seek(end - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        stop = f.tell()
+        f.seek(begin)
+        data = f.read(stop - begin)
+    return pd.read_csv(io.BytesIO(data), sep=sep, header=None, names=header, dtype=str, keep_default_na=False,
+                       on_bad_lines="warn", engine="c", encoding_errors="replace", index_col=False)
+
+
+def _scan_job(job):
+    kind, path = job[0], job[1]
+    found, rows = {}, 0
+    # on_bad_lines="warn" reports each skipped line as a ParserWarning; they are counted, not printed
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.ParserWarning)
+        try:
+            if kind == "text":
+                frames = [_read_text_range(path, *job[2:])]
+            elif kind == "parquet":
+                import pyarrow.parquet as pq
+                df = pq.ParquetFile(path).read_row_group(job[2]).to_pandas()
+                frames = [df.astype(str).mask(df.isna(), "")]
+            else:   # gzip or quoted multi-line cells: one worker streams the file in row chunks
+                frames = pd.read_csv(path, sep=job[2], dtype=str, keep_default_na=False, chunksize=STREAM_CHUNK_ROWS,
+                                     on_bad_lines="warn", encoding_errors="replace", index_col=False)
+            for df in frames:
+                merge(found, scan_frame(df))
+                rows += len(df)
+            error = None
+        except Exception as e:
+            error = f"{path}: {e}"
+    bad = sum(str(w.message).count("Skipping line") for w in caught)
+    return {"path": path, "found": found, "rows": rows, "bad_lines": bad, "error": error}
+
+
+# ---------- planning ----------
+def plan(sources, chunk_mb=CHUNK_MB):
+    """
+    Files / folders -> chunk jobs, the size of every file planned and one error per source that
+    cannot be scanned (missing, unsupported type or unreadable header), so nothing is skipped silently.
+    """
+    paths, errors = [], []
+    for source in sources:
+        source = source.strip()
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths += [os.path.join(root, f) for f in sorted(files)]
+        elif os.path.isfile(source):
+            paths.append(source)
+        elif source:
+            errors.append(f"{source}: no such file or folder")
+
+    chunk = max(1 << 16, int(chunk_mb * (1 << 20)))
+    jobs, sizes = [], {}
+    for path in paths:
+        try:
+            file_jobs = _plan_file(path, chunk)
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+            continue
+        if file_jobs is None:
+            errors.append(f"{path}: not a CSV/TSV/Parquet file, skipped")
+            continue
+        jobs += file_jobs
+        sizes[path] = os.path.getsize(path)
+    return jobs, sizes, errors
+
+
+def has_quoted_newline(sample, sep):
+    """True when a quoted cell in `sample` (bytes after the header) spans lines; a trailing partial line is ignored."""
+    if b'"' not in sample:
+        return False
+    if len(sample) == QUOTE_SAMPLE_BYTES:
+        sample = sample[:sample.rfind(b"\n") + 1]
+    reader = csv.reader(io.StringIO(sample.decode("utf-8", errors="replace"), newline=""), delimiter=sep)
+    try:
+        return any("\n" in cell or "\r" in cell for row in reader for cell in row)
+    except csv.Error:
+        return True   # unbalanced quotes: let the sequential reader deal with it
+
+
+def _plan_file(path, chunk):
+    """Chunk jobs for one file; None when the type is not scanned."""
+    lower = path.lower()
+    if lower.endswith(PARQUET_SUFFIXES):
+        import pyarrow.parquet as pq
+        return [("parquet", path, i) for i in range(pq.ParquetFile(path).num_row_groups)]
+    if lower.endswith(".gz") and lower.endswith(TEXT_SUFFIXES):
+        with gzip.open(path, "rt", encoding="utf-8-sig", errors="replace") as f:
+            return [("stream", path, sniff_delimiter(f.readline(), lower))]
+    if lower.endswith(TEXT_SUFFIXES):
+        with open(path, "rb") as f:
+            line = f.readline()
+            body = f.tell()
+            sample = f.read(QUOTE_SAMPLE_BYTES)
+        text = line.decode("utf-8-sig", errors="replace")
+        sep = sniff_delimiter(text, lower)
+        if has_quoted_newline(sample, sep):
+            return [("stream", path, sep)]
+        header = list(pd.read_csv(io.StringIO(text), sep=sep, nrows=0).columns)
+        size = os.path.getsize(path)
+        return [("text", path, start, min(start + chunk, size), header, sep) for start in range(body, size, chunk)]
+    return None
+
+
+def scan(sources, workers=PHI_WORKERS, chunk_mb=CHUNK_MB, on_progress=None):
+    """
+    Scan every CSV/TSV/Parquet file under `sources`. Returns a report with one finding row per
+    (file, column, identifier) hit, file-level errors and throughput.
+    """
+    t0 = time.perf_counter()
+    jobs, sizes, errors = plan(sources, chunk_mb)
+    per_file, rows, bad_lines = {}, {}, {}
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_scan_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result["error"]:
+                errors.append(result["error"])
+            merge(per_file.setdefault(result["path"], {}), result["found"])
+            rows[result["path"]] = rows.get(result["path"], 0) + result["rows"]
+            if result["bad_lines"]:
+                bad_lines[result["path"]] = bad_lines.get(result["path"], 0) + result["bad_lines"]
+            if on_progress:
+                on_progress(done, len(jobs))
+
+    findings = []
+    for path, columns in per_file.items():
+        for column, (n, found) in columns.items():
+            for identifier, (hits, evidence) in found.items():
+                findings.append({
+                    "file": path, "column": column, "identifier": identifier, "rows_scanned": n, "hits": hits,
+                    "hit_rate": round(hits / n, 4), "evidence": " | ".join(evidence),
+                })
+    findings.sort(key=lambda f: (-f["hit_rate"], f["file"], str(f["column"])))
+    errors += [f"{path}: {n:,} malformed lines skipped, not counted in rows scanned"
+               for path, n in sorted(bad_lines.items())]
+    seconds = time.perf_counter() - t0
+    total_bytes = sum(sizes.values())
+    return {
+        "files": len(sizes), "chunks": len(jobs), "bytes": total_bytes, "rows": sum(rows.values()),
+        "findings": findings, "errors": errors, "seconds": round(seconds, 2),
+        "mb_per_s": round(total_bytes / (1 << 20) / seconds, 1) if seconds else 0.0,
+    }
+
+
+def phi_columns(report, threshold=HIT_RATE_THRESHOLD):
+    """Findings whose hit rate makes the column a PHI column rather than an incidental match."""
+    return [f for f in report["findings"] if f["hit_rate"] >= threshold]
+
+
+def encryption_metric_key(compiled):
+    """Metric key of the Technical Safeguards control that plaintext PHI contradicts."""
+    return next((k for k in compiled.metric_keys
+                 if k[0].startswith("Technical Safeguards") and k[2] == "Encryption-at-Rest Compliance"), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sources", nargs="+", help="CSV/TSV/Parquet files or folders")
+    parser.add_argument("--workers", type=int, default=PHI_WORKERS)
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB)
+    parser.add_argument("--threshold", type=float, default=HIT_RATE_THRESHOLD)
+    args = parser.parse_args()
+
+    report = scan(args.sources, args.workers, args.chunk_mb)
+    print(f"{'file':<40} {'column':<24} {'identifier':<12} {'hit rate':>9} {'hits':>10}  evidence")
+    for f in phi_columns(report, args.threshold):
+        print(f"{os.path.basename(f['file'])[:40]:<40} {str(f['column'])[:24]:<24} {f['identifier']:<12} "
+              f"{f['hit_rate']:>9.2%} {f['hits']:>10,}  {f['evidence']}")
+    print(f"\n{report['files']} files, {report['bytes'] / (1 << 20):,.0f} MB, {report['rows']:,} rows in "
+          f"{report['chunks']} chunks: {report['seconds']}s ({report['mb_per_s']} MB/s, {args.workers} workers)")
+    for e in report["errors"]:
+        print(f"  error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Compiled HIPAA readiness scoring.
+
+The audit schema lives in hipaa_schema.json (versioned). At load it is compiled
+once into flat arrays: one entry per mandatory column (owning domain,
+violation cost), per metric (owning subdomain, penalty) and per subdomain
+(owning domain, weight normalised within its domain), plus 0/1 membership
+matrices. Scoring any number of organizations is then a handful of matrix
+products over an (orgs x flags) boolean table:
+
+    coverage[d]  = satisfied mandatory columns / mandatory columns   (1 when none)
+    metric[d]    = sum over subdomains of (satisfied metrics / metrics) * normalised weight
+    readiness[d] = 100 * metric[d] * coverage[d]
+    exposure[d]  = violation costs of missing columns + penalties of unmet metrics
+
+which is the calculation the app has always shown, for one clinic or a
+portfolio of them at once.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hipaa_schema.json")
+SUPPORTED_VERSIONS = ("1.0",)
+TRUE_VALUES = np.array(["1", "1.0", "true", "yes", "y", "x", "✓", "pass", "met"])
+
+
+def load_schema(path=SCHEMA_PATH):
+    with open(path, encoding="utf-8") as f:
+        schema = json.load(f)
+    version = str(schema.get("schema_version", ""))
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported schema_version {version!r} in {path} (supported: {', '.join(SUPPORTED_VERSIONS)})")
+    return schema
+
+
+def short_domain(domain_name):
+    """'Technical Safeguards (HIPAA §164.312 ...)' -> 'Technical Safeguards'."""
+    return domain_name.split(" (")[0]
+
+
+def _membership(owner, n):
+    """(len(owner) x n) 0/1 matrix with a 1 at [i, owner[i]]."""
+    m = np.zeros((len(owner), n))
+    m[np.arange(len(owner)), owner] = 1.0
+    return m
+
+
+class CompiledSchema:
+    def __init__(self, schema):
+        self.schema = schema
+        self.version = schema["schema_version"]
+        domains = schema["compliance_domains"]
+        self.domains = list(domains)
+        self.domain_weight = np.array([d.get("weight", 0) for d in domains.values()], dtype=float)
+
+        self.mandatory_keys, mand_domain, mand_cost = [], [], []
+        self.metric_keys, metric_sub, metric_penalty = [], [], []
+        sub_domain, sub_weight, sub_metrics = [], [], []
+        for di, (dname, dobj) in enumerate(domains.items()):
+            for col in dobj.get("mandatory_columns", []):
+                self.mandatory_keys.append((dname, col["name"]))
+                mand_domain.append(di)
+                mand_cost.append(col.get("violation_cost_usd", 0))
+            subs = dobj.get("subdomains", {})
+            total_w = sum(s.get("weight", 0) for s in subs.values())
+            for sname, sobj in subs.items():
+                si = len(sub_domain)
+                sub_domain.append(di)
+                sub_weight.append(sobj.get("weight", 0) / total_w if total_w > 0 else 0.0)
+                sub_metrics.append(len(sobj.get("metrics", [])))
+                for m in sobj.get("metrics", []):
+                    self.metric_keys.append((dname, sname, m["name"]))
+                    metric_sub.append(si)
+                    metric_penalty.append(m.get("estimated_penalty", 0))
+
+        n_domains = len(self.domains)
+        self.mand_cost = np.array(mand_cost, dtype=float)
+        self.metric_penalty = np.array(metric_penalty, dtype=float)
+        self.sub_weight = np.array(sub_weight, dtype=float)
+        self.sub_metrics = np.array(sub_metrics, dtype=float)
+        self.mand_by_domain = _membership(mand_domain, n_domains)       # columns x domains
+        self.metric_by_sub = _membership(metric_sub, len(sub_domain))   # metrics x subdomains
+        self.sub_by_domain = _membership(sub_domain, n_domains)         # subdomains x domains
+        self.metric_by_domain = self.metric_by_sub @ self.sub_by_domain
+        self.mand_per_domain = self.mand_by_domain.sum(axis=0)
+        self.mandatory_index = {k: i for i, k in enumerate(self.mandatory_keys)}
+        self.metric_index = {k: i for i, k in enumerate(self.metric_keys)}
+
+    # ---------- scoring ----------
+    def score(self, mandatory, metrics):
+        """
+        `mandatory` (orgs x mandatory columns) and `metrics` (orgs x metrics) boolean arrays.
+        Returns readiness and exposure (orgs x domains), overall readiness and total exposure (orgs).
+        """
+        mandatory = np.atleast_2d(np.asarray(mandatory, dtype=float))
+        metrics = np.atleast_2d(np.asarray(metrics, dtype=float))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            coverage = np.where(self.mand_per_domain > 0,
+                                (mandatory @ self.mand_by_domain) / self.mand_per_domain, 1.0)
+            sub_pct = np.where(self.sub_metrics > 0, (metrics @ self.metric_by_sub) / self.sub_metrics, 0.0)
+        readiness = 100.0 * ((sub_pct * self.sub_weight) @ self.sub_by_domain) * coverage
+        exposure = ((1.0 - mandatory) * self.mand_cost) @ self.mand_by_domain \
+            + ((1.0 - metrics) * self.metric_penalty) @ self.metric_by_domain
+        weight_sum = self.domain_weight.sum()
+        overall = readiness @ self.domain_weight / weight_sum if weight_sum else np.zeros(len(readiness))
+        return readiness, exposure, overall, exposure.sum(axis=1)
+
+    def flag_vectors(self, mandatory_flags, metric_flags):
+        """Session-state flag dicts ((domain, column) / (domain, subdomain, metric) -> bool) as row vectors."""
+        mandatory = np.array([bool(mandatory_flags.get(k, False)) for k in self.mandatory_keys])
+        metrics = np.array([bool(metric_flags.get(k, False)) for k in self.metric_keys])
+        return mandatory, metrics
+
+    def score_flags(self, mandatory_flags, metric_flags):
+        """One organization: {domain: readiness}, {domain: exposure}, overall readiness, total exposure."""
+        readiness, exposure, overall, total = self.score(*self.flag_vectors(mandatory_flags, metric_flags))
+        return (dict(zip(self.domains, readiness[0])), dict(zip(self.domains, exposure[0])),
+                float(overall[0]), float(total[0]))
+
+    # ---------- portfolio tables ----------
+    def flag_columns(self):
+        """Column names of the batch table: one per mandatory column, then one per metric."""
+        return ([f"col: {short_domain(d)} / {c}" for d, c in self.mandatory_keys]
+                + [f"metric: {short_domain(d)} / {s} / {m}" for d, s, m in self.metric_keys])
+
+    def template(self, organizations=("Clinic A",), mandatory_flags=None, metric_flags=None):
+        """Empty (or pre-filled from one org's flag dicts) batch table to fill in per organization."""
+        mandatory, metrics = self.flag_vectors(mandatory_flags or {}, metric_flags or {})
+        row = np.concatenate([mandatory, metrics]).astype(int)
+        df = pd.DataFrame(np.tile(row, (len(organizations), 1)), columns=self.flag_columns())
+        df.insert(0, "organization", list(organizations))
+        return df
+
+    def batch_flags(self, df):
+        """Boolean (orgs x flags) array from a batch table; absent columns count as unmet."""
+        cols = self.flag_columns()
+        present = [c for c in cols if c in df.columns]
+        values = np.zeros((len(df), len(cols)), dtype=bool)
+        if present:
+            raw = df[present].astype(str).apply(lambda s: s.str.strip().str.lower()).to_numpy()
+            values[:, [cols.index(c) for c in present]] = np.isin(raw, TRUE_VALUES)
+        n = len(self.mandatory_keys)
+        return values[:, :n], values[:, n:], [c for c in cols if c not in df.columns]
+
+    def batch_score(self, df):
+        """
+        Readiness and exposure for every organization (row) of a batch table, best first.
+        Returns (results DataFrame, list of flag columns missing from the input).
+        """
+        mandatory, metrics, missing = self.batch_flags(df)
+        readiness, exposure, overall, total = self.score(mandatory, metrics)
+        names = df["organization"].astype(str).to_numpy() if "organization" in df else \
+            np.array([f"Org {i + 1}" for i in range(len(df))])
+        out = pd.DataFrame({"organization": names, "overall_readiness": overall.round(1),
+                            "total_exposure_usd": total.round(0)})
+        for i, d in enumerate(self.domains):
+            out[f"readiness: {short_domain(d)}"] = readiness[:, i].round(1)
+        for i, d in enumerate(self.domains):
+            out[f"exposure: {short_domain(d)}"] = exposure[:, i].round(0)
+        out = out.sort_values(["overall_readiness", "total_exposure_usd"], ascending=[False, True])
+        out.insert(0, "rank", np.arange(1, len(out) + 1))
+        return out.reset_index(drop=True), missing
+
+
+def compile_schema(path=SCHEMA_PATH):
+    return CompiledSchema(load_schema(path))
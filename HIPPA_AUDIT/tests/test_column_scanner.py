@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+from column_scanner import ColumnMatcher, allowed_sources, normalize, scan
+
+TARGETS = ["last_modified_date", "user_id", "encryption_status", "audit_log_id", "record_version",
+           "mfa_enabled", "created_date", "record_checksum"]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("LastModifiedDt", "last_modified_date"),
+    ("last-modified dt", "last_modified_date"),
+    ("LAST_MOD_DATE", "last_modified_date"),
+    ("  AuditLogID ", "audit_log_id"),
+    ("usr_id", "user_id"),
+    ("RecVer", "record_version"),
+    ("mfa_enabled_flag", "mfa_enabled"),
+    ("event_ts", "event_timestamp"),
+])
+def test_normalize(name, expected):
+    assert normalize(name) == expected
+
+
+@pytest.mark.parametrize("column, target, score", [
+    ("LastModifiedDt", "last_modified_date", 1.0),     # camelCase + abbreviation
+    ("UserId", "user_id", 1.0),
+    ("enc_status", "encryption_status", 1.0),
+    ("status_encryption", "encryption_status", 0.95),  # same tokens, other order
+    ("encryption_stauts", "encryption_status", None),  # typo, fuzzy
+    ("created_at", "created_date", None),
+    ("audit_id", None, None),
+    ("patient_id", None, None),
+    ("checksum_value", None, None),
+    ("timestamp", None, None),
+    ("notes", None, None),
+])
+def test_column_matcher(column, target, score):
+    matcher = ColumnMatcher(TARGETS)
+
+    found, found_score = matcher.match(column)
+
+    assert found == target
+    if target and score:
+        assert found_score == score
+    elif target:
+        assert matcher.threshold <= found_score < 0.95
+    else:
+        assert found_score < matcher.threshold
+
+
+def test_sqlite_catalog_and_csv_headers_are_scanned_without_reading_rows(tmp_path):
+    db = tmp_path / "clinic.sqlite"
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE audit (AuditLogID INTEGER, usr_id TEXT, LastModifiedDt TEXT)")
+    con.execute("CREATE TABLE records (record_id INTEGER, RecVer INTEGER, notes TEXT)")
+    con.execute("CREATE VIEW recent AS SELECT AuditLogID, LastModifiedDt FROM audit")
+    con.commit()
+    con.close()
+    (tmp_path / "users.csv").write_text("user_id;mfa_enabled_flag;enc_status\n1;y;aes\n")
+    (tmp_path / "readme.txt").write_text("not a table")
+    (tmp_path / "broken.db").write_bytes(b"definitely not sqlite" * 10)
+
+    report = scan([str(tmp_path)], TARGETS, workers=4)
+
+    assert report["sources"] == 3
+    users = str(tmp_path / "users.csv")
+    assert {t: sorted(table for table, _, _ in m) for t, m in report["matches"].items()} == {
+        "audit_log_id": ["clinic.sqlite:audit", "clinic.sqlite:recent"],
+        "last_modified_date": ["clinic.sqlite:audit", "clinic.sqlite:recent"],
+        "user_id": sorted(["clinic.sqlite:audit", users]),
+        "record_version": ["clinic.sqlite:records"],
+        "mfa_enabled": [users],
+        "encryption_status": [users],
+        "created_date": [],
+        "record_checksum": [],
+    }
+    assert report["tables"] == 4
+    assert report["columns"] == 3 + 3 + 2 + 3
+    assert len(report["errors"]) == 1 and report["errors"][0].startswith(str(tmp_path / "broken.db"))
+
+
+def test_only_configured_sources_and_paths_under_the_roots_are_allowed(tmp_path):
+    root = tmp_path / "exports"
+    (root / "2024").mkdir(parents=True)
+    (root / "escape").symlink_to(tmp_path)
+    dsn = "postgresql://audit@db-host/ehr"
+
+    allowed, rejected = allowed_sources(
+        [str(root / "2024"), "", f"  {dsn}  ", "postgresql://audit@other/ehr", "/etc",
+         str(root / ".." / "secrets.csv"), str(root / "escape"), str(tmp_path / "exports2")],
+        trusted=[dsn], roots=[str(root)])
+
+    assert allowed == [str(root / "2024"), dsn]
+    assert rejected == ["postgresql://audit@other/ehr", "/etc", str(root / ".." / "secrets.csv"),
+                        str(root / "escape"), str(tmp_path / "exports2")]
+
+
+def test_without_roots_nothing_typed_is_allowed(tmp_path):
+    assert allowed_sources([str(tmp_path)], roots=[]) == ([], [str(tmp_path)])
@@ -0,0 +1,90 @@
+import gzip
+import random
+
+import pytest
+
+from phi_scanner import phi_columns, plan, scan
+
+FIRST = ["John", "Mary", "James", "Linda", "Robert", "Patricia"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Miller"]
+
+
+def export_csv(rows=4000, seed=50):
+    """A plain-text export with an SSN column, a name column, a phone column hit on some rows and noise."""
+    rng = random.Random(seed)
+    lines = ["id,patient,ssn,contact,note"]
+    for i in range(rows):
+        contact = f"({rng.randrange(200, 999)}) 555-{rng.randrange(10000):04d}" if i % 4 == 0 else "front desk"
+        lines.append(f"{i},{rng.choice(FIRST)} {rng.choice(LAST)},{rng.randrange(100, 999)}-{rng.randrange(10, 99)}-"
+                     f"{rng.randrange(1000, 9999)},{contact},follow-up {rng.randrange(50)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def counts(report):
+    """Findings without the path or the evidence, whose order depends on which chunk finishes first."""
+    return sorted((f["column"], f["identifier"], f["rows_scanned"], f["hits"]) for f in report["findings"])
+
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    path = tmp_path_factory.mktemp("phi") / "export.csv"
+    path.write_bytes(export_csv())
+    return path
+
+
+def test_multi_chunk_scan_matches_a_single_chunk_scan(export):
+    whole = scan([str(export)], workers=1, chunk_mb=64)
+    chunked = scan([str(export)], workers=3, chunk_mb=0.01)   # clamped to 64 KiB ranges
+
+    assert whole["chunks"] == 1 and chunked["chunks"] > 2
+    assert whole["rows"] == chunked["rows"] == 4000
+    assert counts(chunked) == counts(whole)
+    assert not chunked["errors"]
+    assert {(f["column"], f["identifier"]) for f in phi_columns(chunked)} >= {("ssn", "SSN"), ("patient", "Name")}
+
+
+def test_gzip_export_is_streamed_with_the_same_counts(export, tmp_path):
+    packed = tmp_path / "export.csv.gz"
+    packed.write_bytes(gzip.compress(export.read_bytes()))
+
+    jobs, _, _ = plan([str(packed)], chunk_mb=0.01)
+    report = scan([str(packed)], workers=2, chunk_mb=0.01)
+
+    assert [job[0] for job in jobs] == ["stream"]
+    assert report["rows"] == 4000
+    assert counts(report) == counts(scan([str(export)], workers=1, chunk_mb=64))
+
+
+def test_unsupported_and_missing_sources_are_reported(tmp_path):
+    (tmp_path / "notes.txt").write_text("John Smith 123-45-6789\n")
+    (tmp_path / "ok.csv").write_text("ssn\n123-45-6789\n")
+
+    report = scan([str(tmp_path), str(tmp_path / "gone.csv")], workers=1)
+
+    assert report["files"] == 1 and report["rows"] == 1
+    assert sorted(report["errors"]) == sorted([f"{tmp_path / 'gone.csv'}: no such file or folder",
+                                               f"{tmp_path / 'notes.txt'}: not a CSV/TSV/Parquet file, skipped"])
+
+
+def test_quoted_newlines_are_streamed_instead_of_cut_into_ranges(tmp_path):
+    path = tmp_path / "notes.csv"
+    rows = [f'{i},"Seen by Dr Jones\nSSN 123-45-{i:04d}\nfollow up",ok' for i in range(1, 3001)]
+    path.write_text("id,note,status\n" + "\n".join(rows) + "\n")
+
+    jobs, _, _ = plan([str(path)], chunk_mb=0.01)
+    report = scan([str(path)], workers=2, chunk_mb=0.01)
+
+    assert [job[0] for job in jobs] == ["stream"]
+    assert report["rows"] == 3000 and not report["errors"]
+    assert ("note", "SSN", 3000, 3000) in counts(report)
+
+
+def test_malformed_lines_are_counted_as_errors(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("id,ssn\n" + "".join(f"{i},123-45-{i:04d}\n" if i % 10 else f"{i},1,extra,fields\n"
+                                        for i in range(1, 201)))
+
+    report = scan([str(path)], workers=1)
+
+    assert report["rows"] == 180
+    assert report["errors"] == [f"{path}: 20 malformed lines skipped, not counted in rows scanned"]
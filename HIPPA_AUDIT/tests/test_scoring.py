@@ -0,0 +1,111 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scoring import compile_schema
+
+COMPILED = compile_schema()
+
+
+def reference_scores(schema, mandatory_flags, metric_flags):
+    """The per-domain loop the app ran before the schema was compiled (calc_domain_score_and_cost)."""
+    scores, costs, weighted, weight_sum = {}, {}, 0.0, 0.0
+    for domain_name, domain_obj in schema["compliance_domains"].items():
+        mandatory = domain_obj.get("mandatory_columns", [])
+        mandatory_cost = 0
+        flags = []
+        for col in mandatory:
+            exists = mandatory_flags.get((domain_name, col["name"]), False)
+            flags.append(exists)
+            if not exists:
+                mandatory_cost += int(col.get("violation_cost_usd", 0))
+        mandatory_coverage = (sum(flags) / len(flags)) if flags else 1.0
+
+        subs = domain_obj.get("subdomains", {})
+        total_w = sum(s.get("weight", 0) for s in subs.values())
+        metric_score, metric_cost = 0.0, 0
+        for sname, sobj in subs.items():
+            metrics = sobj.get("metrics", [])
+            if not metrics:
+                continue
+            satisfied = 0
+            for m in metrics:
+                if metric_flags.get((domain_name, sname, m["name"]), False):
+                    satisfied += 1
+                else:
+                    metric_cost += int(m.get("estimated_penalty", 0))
+            if total_w > 0:
+                metric_score += satisfied / len(metrics) * (sobj.get("weight", 0) / total_w)
+
+        scores[domain_name] = metric_score * mandatory_coverage * 100.0
+        costs[domain_name] = mandatory_cost + metric_cost
+        weighted += scores[domain_name] * domain_obj.get("weight", 0)
+        weight_sum += domain_obj.get("weight", 0)
+    return scores, costs, weighted / weight_sum if weight_sum else 0.0, sum(costs.values())
+
+
+def random_flags(rng):
+    p = rng.random()   # vary the density so all-met and all-unmet domains both come up
+    return ({k: rng.random() < p for k in COMPILED.mandatory_keys},
+            {k: rng.random() < p for k in COMPILED.metric_keys})
+
+
+def test_score_flags_matches_the_per_domain_loop():
+    rng = random.Random(48)
+    for _ in range(200):
+        mandatory_flags, metric_flags = random_flags(rng)
+
+        scores, costs, overall, total = COMPILED.score_flags(mandatory_flags, metric_flags)
+        ref_scores, ref_costs, ref_overall, ref_total = reference_scores(COMPILED.schema, mandatory_flags, metric_flags)
+
+        assert scores == pytest.approx(ref_scores)
+        assert costs == pytest.approx(ref_costs)
+        assert overall == pytest.approx(ref_overall)
+        assert total == pytest.approx(ref_total)
+
+
+def test_batch_score_ranks_rows_like_score_flags():
+    rng = random.Random(7)
+    orgs = [random_flags(rng) for _ in range(20)]
+    df = pd.concat([COMPILED.template([f"Org {i}"], *flags) for i, flags in enumerate(orgs)], ignore_index=True)
+
+    results, missing = COMPILED.batch_score(df)
+
+    assert missing == []
+    assert list(results["rank"]) == list(range(1, 21))
+    by_org = results.set_index("organization")
+    for i, (mandatory_flags, metric_flags) in enumerate(orgs):
+        _, _, overall, total = COMPILED.score_flags(mandatory_flags, metric_flags)
+        assert by_org.loc[f"Org {i}", "overall_readiness"] == round(overall, 1)
+        assert by_org.loc[f"Org {i}", "total_exposure_usd"] == round(total)
+
+
+def test_batch_flags_parse_truthy_strings_and_treat_missing_columns_as_unmet():
+    cols = COMPILED.flag_columns()
+    n = len(COMPILED.mandatory_keys)
+    truthy = ["1", "1.0", " TRUE ", "Yes", "y", "X", "✓", "Pass", "met", 1, True]
+    falsy = ["0", "false", "no", "", "n/a", "maybe", 0, False, None, np.nan, "2"]
+    values = truthy + falsy
+    df = pd.DataFrame({"organization": [f"Org {i}" for i in range(len(values))], cols[0]: values,
+                       cols[n]: values[::-1]})
+
+    mandatory, metrics, missing = COMPILED.batch_flags(df)
+
+    assert list(mandatory[:, 0]) == [True] * len(truthy) + [False] * len(falsy)
+    assert list(metrics[:, 0]) == [False] * len(falsy) + [True] * len(truthy)
+    assert not mandatory[:, 1:].any() and not metrics[:, 1:].any()
+    assert missing == cols[1:n] + cols[n + 1:]
+
+    results, missing_cols = COMPILED.batch_score(df)
+    assert missing_cols == missing
+    assert len(results) == len(values)
+
+
+def test_batch_score_names_rows_without_an_organization_column():
+    df = COMPILED.template(["A", "B"]).drop(columns="organization")
+
+    results, _ = COMPILED.batch_score(df)
+
+    assert sorted(results["organization"]) == ["Org 1", "Org 2"]
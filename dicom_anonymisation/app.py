@@ -3,12 +3,35 @@ import requests
 from requests.auth import HTTPBasicAuth
 import pydicom
 import io
-import numpy as np
+import os
+import sys
 import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from imaging_common.orthanc_client import OrthancClient
+from orthanc_changes import CleanedInstanceCursor
+from batch import zip_items, folder_items, run_batch, clean_locally, server_path, SERVER_ROOTS
+import deid
+from pixel_diff import diff_instance, diff_series, summarize, draw_regions, working_set_bytes
+from preview import PreviewService, content_hash
+from retrieval import (MemoryBudget, MemoryBudgetExceeded, check_session_cap, fetch_instance,
+                       resident_bytes, SESSION_MAX_BYTES)
+from header_index import HeaderIndex
+from text_filter import score_instance, skip_report, SCORE_THRESHOLD, GPU_SECONDS_PER_FRAME
 
 # ===== CONFIG =====
-ORTHANC_URL = "https://pyr3wouqpxxey9-8042.proxy.runpod.net"  # remote Orthanc
+ORTHANC_URL = os.environ.get("ORTHANC_URL", "https://pyr3wouqpxxey9-8042.proxy.runpod.net")  # remote Orthanc
 AUTH = HTTPBasicAuth("orthanc", "orthanc")
+DEID_SALT = deid.load_salt()   # UID hashing salt for header-only cleans: DEID_SALT, else kept in DEID_SALT_PATH
+
+
+@st.cache_resource
+def get_orthanc():
+    """One pooled keep-alive client per server process, shared across reruns and sessions."""
+    return OrthancClient(ORTHANC_URL, auth=AUTH)
 
 st.set_page_config(page_title="🩻 DICOM Cleaner", layout="wide")
 
@@ -19,57 +42,321 @@ st.write(
 )
 
 # ---------- Helper: render DICOM as image ----------
-def render_dicom(dicom_bytes):
-    ds = pydicom.dcmread(io.BytesIO(dicom_bytes))
-    arr = ds.pixel_array.astype(np.float32)
-    if getattr(ds, "PhotometricInterpretation", "") == "MONOCHROME1":
-        arr = np.max(arr) - arr
-    arr -= arr.min()
-    if arr.max() > 0:
-        arr /= arr.max()
-    arr = (arr * 255).astype(np.uint8)
-    arr = np.squeeze(arr)
-    if arr.ndim == 2:
-        arr = np.stack([arr] * 3, axis=-1)
-    elif arr.ndim == 3 and arr.shape[-1] != 3:
-        arr = arr[..., :3]
-    return arr
-
-
-# ---------- Helper: find cleaned DICOM via metadata ----------
-def orthanc_find_cleaned(original_instance_id, max_wait_seconds=120, poll_every=5):
+@st.cache_resource
+def get_previews():
+    """Header and rendered-frame cache keyed by content hash, shared across reruns."""
+    return PreviewService()
+
+
+@st.cache_resource
+def get_index():
+    """Local SQLite index of uploads and their cleaned copies (DICOM_INDEX_PATH)."""
+    return HeaderIndex()
+
+
+@st.cache_resource
+def get_memory_budget():
+    """Bytes all sessions together may hold while comparing original and cleaned files."""
+    return MemoryBudget()
+
+
+def session_key():
+    """Per-browser-session key for the memory budget's running totals."""
+    return st.session_state.setdefault("memory_session", uuid.uuid4().hex)
+
+
+def render_dicom(dicom_bytes, frame=None, digest=None):
+    """Windowed, display-sized uint8 preview of one frame (middle frame by default)."""
+    return get_previews().render(dicom_bytes, frame=frame, digest=digest)
+
+
+# ---------- Helper: find cleaned DICOM via the changes feed ----------
+def orthanc_find_cleaned(cursor, original_instance_id, max_wait_seconds=120, poll_every=0.5):
     """
-    Poll Orthanc for the cleaned instance using metadata linkage.
-    The cleaner sets Metadata[1000] = <original_instance_id>.
+    Follow Orthanc's /changes feed for the cleaned instance.
+    The cleaner sets Metadata[1000] = <original_instance_id>; only instances
+    created after the cursor was opened are inspected.
     """
-    deadline = time.time() + max_wait_seconds
-    st.write("🕵️ Looking for cleaned instance via Metadata[1000] linkage...")
+    st.write("🕵️ Watching Orthanc changes feed for Metadata[1000] linkage...")
+    links = cursor.wait_for(
+        [original_instance_id],
+        max_wait_seconds=max_wait_seconds,
+        poll_every=poll_every,
+        on_error=lambda e: st.warning(f"⚠️ Changes feed error: {e}")
+    )
+    inst_id = links.get(original_instance_id)
+    if inst_id:
+        st.info(f"🔗 Found cleaned instance via metadata: {inst_id}")
+    return inst_id
+
+
+# ---------- Pixel-diff QA summary ----------
+def show_diff_summary(summary):
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Frames changed", f"{summary['frames_changed']}/{summary['frames']}")
+    k2.metric("Mean redacted area", f"{summary['mean_redacted_pct']:.2f}%")
+    k3.metric("Masked regions", f"{summary['masked_regions']}/{summary['regions']}")
+    k4.metric("Misaligned frames", summary["misaligned_frames"])
+    if summary["frames_changed"] == 0:
+        st.warning("⚠️ No pixel changes detected — nothing was masked.")
+    elif summary["unmasked_regions"]:
+        st.warning(f"⚠️ {summary['unmasked_regions']} changed regions are not solidly masked; review them.")
+    else:
+        st.success("✅ Every changed region is solidly masked.")
+
 
-    while time.time() < deadline:
+# ---------- Series / study batch mode ----------
+def batch_mode():
+    st.markdown("Upload a **ZIP** of a series/study, or point at a folder of DICOMs on this server.")
+    zip_upload = st.file_uploader("Choose a ZIP of DICOM files", type=["zip"])
+    folder = ""
+    if SERVER_ROOTS:
+        folder = st.text_input("…or a folder path on the server", value="",
+                               help="Allowed under: " + ", ".join(SERVER_ROOTS))
+    workers = st.slider("Concurrent uploads", 1, 32, 8)
+    run_qa = st.checkbox("Run pixel-diff QA on the cleaned series", value=True)
+    skip_ocr = st.checkbox("Skip OCR for images without burned-in text (header-only clean)", value=False,
+                           help="The text pre-filter can miss faint or small annotations; "
+                                "only opt in when the series is known to carry no burned-in PHI.")
+
+    if not (zip_upload or folder):
+        st.info("📥 Provide a ZIP or a folder to begin." if SERVER_ROOTS else "📥 Upload a ZIP to begin.")
+        return
+    if not zip_upload and not server_path(folder):
+        st.error("❌ That folder is outside the server folders this app may read (DICOM_SERVER_ROOTS).")
+        return
+
+    # The archive stays open until the QA diff below has re-read the originals.
+    with ExitStack() as stack:
         try:
-            r = requests.get(f"{ORTHANC_URL}/instances", auth=AUTH, verify=False)
-            if r.status_code == 200:
-                instance_ids = r.json()
-                for inst_id in instance_ids[-30:]:  # check only last 30 for performance
-                    meta = requests.get(f"{ORTHANC_URL}/instances/{inst_id}/metadata", auth=AUTH, verify=False)
-                    if meta.status_code == 200:
-                        meta_keys = meta.json()
-                        if "1000" in meta_keys:
-                            val_resp = requests.get(
-                                f"{ORTHANC_URL}/instances/{inst_id}/metadata/1000",
-                                auth=AUTH, verify=False
-                            )
-                            if val_resp.status_code == 200:
-                                val = val_resp.text.strip().strip('"')
-                                if val == original_instance_id:
-                                    st.info(f"🔗 Found cleaned instance via metadata: {inst_id}")
-                                    return inst_id
+            items = stack.enter_context(zip_items(zip_upload)) if zip_upload else folder_items(folder)
         except Exception as e:
-            st.warning(f"⚠️ Metadata lookup error: {e}")
+            st.error(f"⚠️ Couldn't read input: {e}")
+            return
+        clean_series(items, workers, run_qa, skip_ocr)
+
+
+def clean_series(items, workers, run_qa, skip_ocr):
+    st.write(f"Found **{len(items)}** files.")
+
+    if not items or not st.button("🚀 Upload & Clean Series"):
+        return
+
+    try:
+        cursor = CleanedInstanceCursor(get_orthanc())
+    except requests.RequestException as e:
+        st.error(f"❌ Could not read Orthanc changes feed: {e}")
+        return
+
+    progress = st.progress(0.0, text="Uploading…")
+    kpis = st.empty()
+    table = st.empty()
 
-        time.sleep(poll_every)
+    def on_update(rows, stats):
+        progress.progress(stats["cleaned"] / max(stats["total"], 1),
+                          text=f"{stats['uploaded']}/{stats['total']} uploaded · {stats['cleaned']} cleaned")
+        with kpis.container():
+            k1, k2, k3, k4, k5 = st.columns(5)
+            k1.metric("Uploaded", f"{stats['uploaded']}/{stats['total']}")
+            k2.metric("Cleaned", stats["cleaned"])
+            k3.metric("Failed / skipped", f"{stats['failed']} / {stats['skipped']}")
+            k4.metric("OCR skipped", stats["ocr_skipped"])
+            k5.metric("Throughput", f"{stats['instances_per_min']:.1f} inst/min")
+        table.dataframe([{k: v for k, v in r.items() if not k.startswith("_")} for r in rows],
+                        use_container_width=True)
 
-    return None
+    rows, stats = run_batch(get_orthanc(), cursor, items, workers=workers, on_update=on_update,
+                            text_threshold=SCORE_THRESHOLD if skip_ocr else None,
+                            profile=deid.load_profile() if skip_ocr else None, salt=DEID_SALT,
+                            index=get_index())
+    on_update(rows, stats)
+    if skip_ocr:
+        report = skip_report([{"needs_ocr": r["ocr"], "frames": r["frames"] or 1} for r in rows if "ocr" in r])
+        st.info(f"🔤 OCR skipped for {report['skipped']}/{report['instances']} instances "
+                f"({report['skip_rate_pct']}%) · ~{report['gpu_seconds_saved']:.0f}s GPU saved "
+                f"at {GPU_SECONDS_PER_FRAME}s/frame")
+    if stats["cleaned"] == stats["uploaded"]:
+        st.success(f"✅ Cleaned {stats['cleaned']} instances in {stats['elapsed_s']}s"
+                   + (f" ({stats['reused']} already cleaned, reused from the local index)" if stats["reused"] else ""))
+    else:
+        st.warning(f"⚠️ {stats['uploaded'] - stats['cleaned']} uploaded instances have no cleaned copy yet.")
+
+    if run_qa and stats["cleaned"]:
+        loaders = dict(items)
+        pairs = [
+            (r["file"], loaders[r["file"]], lambda cid=r["cleaned_id"]: fetch_instance(get_orthanc(), cid)[0])
+            for r in rows if r["cleaned_id"]
+        ]
+        with st.spinner("🧪 Diffing original vs cleaned pixels…"):
+            diff_rows, summary = diff_series(pairs, workers=workers)
+        show_diff_summary(summary)
+        st.dataframe([{k: v for k, v in r.items() if k != "regions"} for r in diff_rows],
+                     use_container_width=True)
+
+
+# ---------- Local CPU header de-identification ----------
+def local_deid_mode():
+    st.markdown(
+        "Header-only de-identification on this server with pydicom — no Orthanc, no GPU. "
+        "Burned-in pixel text is **not** touched; use the remote cleaner for that."
+    )
+    profile = deid.load_profile()
+    st.caption(f"Profile: {profile['name']} v{profile['version']} · {len(profile['actions'])} tag rules")
+    salt = st.text_input("UID hashing salt (keep it identical across a study)", type="password",
+                         value=DEID_SALT)
+
+    single = st.file_uploader("De-identify a single DICOM", type=["dcm"], key="deid_single")
+    if single:
+        try:
+            cleaned_bytes = deid.deidentify_bytes(single.read(), profile, salt)
+            cleaned = pydicom.dcmread(io.BytesIO(cleaned_bytes), stop_before_pixels=True)
+            st.json({
+                "Patient Name": str(getattr(cleaned, "PatientName", "")),
+                "Study UID": str(getattr(cleaned, "StudyInstanceUID", "")),
+                "Patient Identity Removed": str(getattr(cleaned, "PatientIdentityRemoved", "")),
+            })
+            st.download_button("⬇️ Download De-identified DICOM", data=cleaned_bytes,
+                               file_name=f"deid_{single.name}", mime="application/dicom")
+        except Exception as e:
+            st.error(f"⚠️ De-identification failed: {e}")
+
+    st.markdown("#### Folder / archive")
+    if not SERVER_ROOTS:
+        st.info("📁 Folder de-identification is off; set DICOM_SERVER_ROOTS to the folders it may read and write.")
+        return
+    c1, c2, c3 = st.columns([2, 2, 1])
+    src_dir = c1.text_input("Source folder on the server", value="")
+    dst_dir = c2.text_input("Output folder", value="")
+    workers = c3.number_input("Processes", 1, os.cpu_count() or 1, os.cpu_count() or 1)
+    if src_dir and dst_dir and st.button("🧹 De-identify Folder"):
+        if not salt:
+            st.error("❌ A UID hashing salt is required; without one the new UIDs can be matched to the originals.")
+            return
+        if not (server_path(src_dir) and server_path(dst_dir)):
+            st.error("❌ Both folders must be under " + ", ".join(SERVER_ROOTS) + " (DICOM_SERVER_ROOTS).")
+            return
+        if not os.path.isdir(src_dir):
+            st.error("❌ Source folder not found.")
+            return
+        total = deid.count_files(src_dir)
+        progress = st.progress(0.0, text=f"0/{total}")
+        rows, done_bytes, t0 = [], 0, time.perf_counter()
+        for row in deid.iter_deidentify_directory(src_dir, dst_dir, profile, salt, workers=int(workers)):
+            rows.append(row)
+            done_bytes += row["bytes"]
+            progress.progress(len(rows) / max(total, 1), text=f"{len(rows)}/{total}")
+        elapsed = time.perf_counter() - t0
+        ok = sum(1 for r in rows if r["status"] == "ok")
+        k1, k2, k3 = st.columns(3)
+        k1.metric("De-identified", f"{ok}/{total}")
+        k2.metric("Files / s", f"{len(rows) / elapsed:.1f}" if elapsed else "–")
+        k3.metric("MB / s", f"{done_bytes / 1e6 / elapsed:.1f}" if elapsed else "–")
+        failed = [r for r in rows if r["status"] != "ok"]
+        if failed:
+            st.warning(f"⚠️ {len(failed)} files were not de-identified.")
+            st.dataframe(failed, use_container_width=True)
+
+
+# ---------- Upload, clean and link (single file) ----------
+def upload_and_clean(dicom_bytes, digest, header, file_name, skip_ocr=False):
+    """
+    Upload one file, clean it remotely (or locally when OCR is skipped) and wait
+    for the linked cleaned copy. Records both steps in the header index.
+    Returns (original_id, cleaned_id); stops the script run on failure.
+    """
+    # --- Open the changes cursor before anything we cause can appear in the feed
+    try:
+        cursor = CleanedInstanceCursor(get_orthanc())
+    except requests.RequestException as e:
+        st.error(f"❌ Could not read Orthanc changes feed: {e}")
+        st.stop()
+
+    # --- Upload to remote Orthanc
+    st.info("📤 Uploading to Orthanc...")
+    upload = get_orthanc().upload_instance(dicom_bytes)
+    if upload.status_code != 200:
+        st.error(f"❌ Upload failed ({upload.status_code}): {upload.text[:500]}")
+        st.stop()
+
+    upload_json = upload.json()
+    instance_id = upload_json.get("ID")
+    if not instance_id:
+        st.error("❌ Upload succeeded but no 'ID' field in Orthanc response.")
+        st.stop()
+
+    st.success(f"✅ Uploaded to Orthanc: {instance_id}")
+    get_index().record_upload(instance_id, digest, header=header, file_name=file_name, size_bytes=len(dicom_bytes))
+
+    # --- Trigger cleaner (or clean the header here when the pre-filter found no text)
+    if skip_ocr:
+        st.info("🔤 Header-only cleaning on this server, OCR skipped...")
+        try:
+            clean_locally(get_orthanc(), instance_id, dicom_bytes, deid.load_profile(), DEID_SALT)
+        except requests.RequestException as e:
+            st.error(f"❌ Local clean upload failed: {e}")
+            st.stop()
+    else:
+        st.info("🧠 Running OCR anonymization on the remote Orthanc node...")
+        lua_code = f'os.execute("/scripts/clean_dicom_image_gpu.py {instance_id} &")'
+        trigger = get_orthanc().execute_script(lua_code)
+        if trigger.status_code == 200:
+            st.success("🎯 Cleaner script started in background!")
+        else:
+            st.warning(f"⚠️ Could not trigger cleaner via API ({trigger.status_code}): {trigger.text[:300]}")
+
+    # --- Poll Orthanc for the cleaned instance
+    st.info("⏳ Waiting for cleaned instance to appear...")
+    cleaned_instance_id = orthanc_find_cleaned(cursor, instance_id, max_wait_seconds=180)
+
+    if not cleaned_instance_id:
+        st.error("❌ Timed out waiting for cleaned instance. "
+                 "Ensure the cleaner sets Metadata[1000]=<original_id>.")
+        st.stop()
+
+    st.success(f"✅ Found cleaned instance: {cleaned_instance_id}")
+    get_index().record_clean(instance_id, cleaned_instance_id, ocr=not skip_ocr)
+    return instance_id, cleaned_instance_id
+
+
+# ---------- Search the local header index ----------
+def index_search_mode():
+    st.markdown("Search everything uploaded or cleaned from this server — answered from the local index, "
+                "no Orthanc calls. A trailing `*` matches a prefix.")
+    totals = get_index().stats()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Instances", totals["instances"])
+    k2.metric("Cleaned", totals["cleaned"])
+    k3.metric("Patients", totals["patients"])
+    k4.metric("Studies", totals["studies"])
+
+    c1, c2, c3, c4 = st.columns(4)
+    patient_id = c1.text_input("Patient ID")
+    study_uid = c2.text_input("Study Instance UID")
+    series_uid = c3.text_input("Series Instance UID")
+    modality = c4.text_input("Modality")
+    c5, c6, c7 = st.columns(3)
+    date_from = c5.text_input("Study date from (YYYYMMDD)")
+    date_to = c6.text_input("Study date to (YYYYMMDD)")
+    status = c7.selectbox("Status", ["Any", "Cleaned", "Not cleaned"])
+
+    rows = get_index().search(patient_id=patient_id, study_uid=study_uid, series_uid=series_uid,
+                              modality=modality, date_from=date_from or None, date_to=date_to or None,
+                              cleaned={"Any": None, "Cleaned": True, "Not cleaned": False}[status])
+    st.write(f"**{len(rows)}** matches")
+    st.dataframe(rows, use_container_width=True)
+
+
+mode = st.radio("Mode", ["Single DICOM", "Series / study batch", "Local CPU de-identification", "Search index"],
+                horizontal=True)
+if mode == "Series / study batch":
+    batch_mode()
+    st.stop()
+if mode == "Local CPU de-identification":
+    local_deid_mode()
+    st.stop()
+if mode == "Search index":
+    index_search_mode()
+    st.stop()
 
 
 # ---------- Upload & process ----------
@@ -77,100 +364,118 @@ uploaded_file = st.file_uploader("Choose a DICOM file", type=["dcm"])
 
 if uploaded_file:
     try:
-        dicom_bytes = uploaded_file.read()
-        dataset = pydicom.dcmread(io.BytesIO(dicom_bytes), stop_before_pixels=False)
+        dicom_bytes = uploaded_file.getvalue()   # the uploader's buffer, not a second copy
+        try:
+            # original + spooled and downloaded cleaned copy, on top of what this session already holds
+            check_session_cap(3 * len(dicom_bytes), SESSION_MAX_BYTES, get_memory_budget().session_in_use(session_key()))
+        except MemoryBudgetExceeded as e:
+            st.error(f"❌ File too large for this server: {e}")
+            st.stop()
+        digest = content_hash(dicom_bytes)
+        dataset = get_previews().header(dicom_bytes, digest)
 
         st.subheader("📋 DICOM Header Info")
+        n_frames = get_previews().n_frames(dicom_bytes, digest)
         st.json({
             "Patient Name": str(getattr(dataset, "PatientName", "N/A")),
             "Modality": str(getattr(dataset, "Modality", "N/A")),
-            "Has PixelData": hasattr(dataset, "PixelData")
+            "Has PixelData": get_previews().has_pixels(dicom_bytes, digest),
+            "Frames": n_frames
         })
 
+        try:
+            text_check = score_instance(dicom_bytes)
+        except Exception:
+            text_check = {"text_score": None, "needs_ocr": True}
+        st.caption(f"🔤 Burned-in text score: {text_check['text_score']} "
+                   f"(OCR needed at ≥ {SCORE_THRESHOLD})")
+        skip_ocr = not text_check["needs_ocr"] and st.checkbox(
+            "No burned-in text detected — skip OCR and clean the header only", value=False,
+            help="The text pre-filter can miss faint or small annotations; OCR stays on unless you opt out.")
+
         st.markdown("### 🩻 Original DICOM (Before Cleaning)")
+        frame = st.slider("Frame", 0, n_frames - 1, n_frames // 2) if n_frames > 1 else None
         try:
-            st.image(render_dicom(dicom_bytes), use_container_width=True, clamp=True)
+            st.image(render_dicom(dicom_bytes, frame, digest), use_container_width=True, clamp=True)
         except Exception as e:
             st.warning(f"⚠️ Couldn't render original image: {e}")
 
-        if st.button("🚀 Upload, Clean & Compare"):
-            # --- Upload to remote Orthanc
-            st.info("📤 Uploading to Orthanc...")
-            upload = requests.post(
-                f"{ORTHANC_URL}/instances",
-                data=dicom_bytes,
-                headers={"Content-Type": "application/dicom"},
-                auth=AUTH,
-                verify=False
-            )
-            if upload.status_code != 200:
-                st.error(f"❌ Upload failed ({upload.status_code}): {upload.text[:500]}")
-                st.stop()
-
-            upload_json = upload.json()
-            instance_id = upload_json.get("ID")
-            if not instance_id:
-                st.error("❌ Upload succeeded but no 'ID' field in Orthanc response.")
-                st.stop()
+        known = get_index().find_by_hash(digest)
+        reuse = False
+        if known and known["cleaned_id"]:
+            st.info(f"♻️ This exact file was already uploaded ({known['instance_id']}) "
+                    f"and cleaned ({known['cleaned_id']}).")
+            reuse = st.checkbox("Reuse the existing cleaned copy (no upload, no OCR)", value=True)
 
-            st.success(f"✅ Uploaded to Orthanc: {instance_id}")
-
-            # --- Trigger cleaner
-            st.info("🧠 Running OCR anonymization on the remote Orthanc node...")
-            lua_code = f'os.execute("/scripts/clean_dicom_image_gpu.py {instance_id} &")'
-            trigger = requests.post(
-                f"{ORTHANC_URL}/tools/execute-script",
-                auth=AUTH,
-                data=lua_code,
-                headers={"Content-Type": "text/plain"},
-                verify=False,
-                timeout=10
-            )
-            if trigger.status_code == 200:
-                st.success("🎯 Cleaner script started in background!")
+        if st.button("🚀 Upload, Clean & Compare"):
+            if reuse and not get_orthanc().instance_exists(known["cleaned_id"]):
+                st.warning(f"⚠️ Cleaned copy {known['cleaned_id']} is no longer in Orthanc — cleaning this file again.")
+                reuse = False
+            if reuse:
+                instance_id, cleaned_instance_id = known["instance_id"], known["cleaned_id"]
             else:
-                st.warning(f"⚠️ Could not trigger cleaner via API ({trigger.status_code}): {trigger.text[:300]}")
+                instance_id, cleaned_instance_id = upload_and_clean(
+                    dicom_bytes, digest, dataset, uploaded_file.name, skip_ocr)
 
-            # --- Poll Orthanc for the cleaned instance
-            st.info("⏳ Waiting for cleaned instance to appear...")
-            cleaned_instance_id = orthanc_find_cleaned(instance_id, max_wait_seconds=180, poll_every=5)
-
-            if not cleaned_instance_id:
-                st.error("❌ Timed out waiting for cleaned instance. "
-                         "Ensure the cleaner sets Metadata[1000]=<original_id>.")
+            # --- Stream cleaned DICOM into a spooled temp file, within the server memory budget.
+            # Reserved up front: the original and the decoded frames the diff holds; once the cleaned
+            # size is known, its resident spool and the in-memory copy handed to the download button.
+            budget, session = get_memory_budget(), session_key()
+            try:
+                reserved = budget.acquire(len(dicom_bytes) + working_set_bytes(dataset), session=session)
+            except MemoryBudgetExceeded as e:
+                st.error(f"❌ Server busy, try again shortly: {e}")
                 st.stop()
+            cleaned_file = None
+            try:
+                try:
+                    cleaned_file, cleaned_size, cleaned_digest = fetch_instance(get_orthanc(), cleaned_instance_id)
+                except requests.RequestException as e:
+                    st.error(f"❌ Failed to download cleaned DICOM: {e}")
+                    st.stop()
+                try:
+                    reserved += budget.acquire(resident_bytes(cleaned_size) + cleaned_size, session=session)
+                except MemoryBudgetExceeded as e:
+                    st.error(f"❌ Server busy, try again shortly: {e}")
+                    st.stop()
+                get_index().record_clean(instance_id, cleaned_instance_id, cleaned_digest)
 
-            st.success(f"✅ Found cleaned instance: {cleaned_instance_id}")
+                # --- Visual comparison ---
+                st.markdown("## 🔍 Visual Comparison")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("### Original")
+                    st.image(render_dicom(dicom_bytes, frame, digest), use_container_width=True, clamp=True)
+                with col2:
+                    st.markdown("### Cleaned")
+                    st.image(render_dicom(cleaned_file, frame, cleaned_digest), use_container_width=True, clamp=True)
 
-            # --- Download cleaned DICOM
-            anon_file = requests.get(
-                f"{ORTHANC_URL}/instances/{cleaned_instance_id}/file",
-                auth=AUTH,
-                verify=False
-            )
-            if anon_file.status_code != 200:
-                st.error(f"❌ Failed to download cleaned DICOM ({anon_file.status_code}): {anon_file.text[:300]}")
-                st.stop()
+                # --- Pixel-diff QA ---
+                st.markdown("## 🧪 Pixel-Diff QA")
+                diff_rows = diff_instance(dicom_bytes, cleaned_file)
+                show_diff_summary(summarize(diff_rows))
+                shown = diff_rows[frame if frame is not None and frame < len(diff_rows) else len(diff_rows) // 2]
+                if shown["regions"]:
+                    st.image(
+                        draw_regions(render_dicom(cleaned_file, shown["frame"], cleaned_digest), shown["regions"],
+                                     (int(dataset.Rows), int(dataset.Columns))),
+                        caption=f"Changed regions, frame {shown['frame']}", use_container_width=True
+                    )
+                st.dataframe([{k: v for k, v in r.items() if k != "regions"} for r in diff_rows],
+                             use_container_width=True)
 
-            cleaned_bytes = anon_file.content
-
-            # --- Visual comparison ---
-            st.markdown("## 🔍 Visual Comparison")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("### Original")
-                st.image(render_dicom(dicom_bytes), use_container_width=True, clamp=True)
-            with col2:
-                st.markdown("### Cleaned")
-                st.image(render_dicom(cleaned_bytes), use_container_width=True, clamp=True)
-
-            # --- Download cleaned DICOM ---
-            st.download_button(
-                label="⬇️ Download Cleaned DICOM",
-                data=cleaned_bytes,
-                file_name=f"cleaned_{cleaned_instance_id}.dcm",
-                mime="application/dicom"
-            )
+                # --- Download cleaned DICOM ---
+                cleaned_file.seek(0)
+                st.download_button(
+                    label="⬇️ Download Cleaned DICOM",
+                    data=cleaned_file.read(),   # download_button takes bytes, not a spooled temp file
+                    file_name=f"cleaned_{cleaned_instance_id}.dcm",
+                    mime="application/dicom"
+                )
+            finally:
+                if cleaned_file is not None:
+                    cleaned_file.close()       # frees the spool / deletes the temp file
+                budget.release(reserved, session=session)
 
             # --- Show IDs ---
             st.json({
@@ -178,6 +483,9 @@ if uploaded_file:
                 "Cleaned ID": cleaned_instance_id
             })
 
+            with st.expander("⏱️ Orthanc call latency"):
+                st.dataframe(get_orthanc().latency_summary(), use_container_width=True)
+
     except Exception as e:
         st.error(f"⚠️ Invalid DICOM file: {e}")
 
@@ -0,0 +1,227 @@
+"""
+Series / study batch mode for the DICOM cleaner.
+
+Instances from a ZIP or a folder are uploaded by a bounded thread pool, the
+remote cleaner is triggered per instance, and every pending cleaned result is
+tracked through one shared changes-feed cursor while uploads are still running.
+With the text pre-filter on, instances that show no burned-in text skip OCR:
+they are header-cleaned here and linked like a remote result. With a header
+index, files already cleaned are reused after one existence check in Orthanc
+instead of a fresh upload and clean.
+"""
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+import requests
+
+import deid
+from header_index import sha1_bytes
+from orthanc_changes import LINK_METADATA_KEY
+from text_filter import score_instance
+
+CLEANER_LUA = 'os.execute("/scripts/clean_dicom_image_gpu.py {instance_id} &")'
+# Folders the app may read or write on the server (os.pathsep-separated); none = server paths are off
+SERVER_ROOTS = [r for r in os.environ.get("DICOM_SERVER_ROOTS", "").split(os.pathsep) if r.strip()]
+
+
+def is_dicom(data):
+    """Part 10 files carry 'DICM' after the 128-byte preamble."""
+    return len(data) > 132 and data[128:132] == b"DICM"
+
+
+@contextmanager
+def zip_items(zip_file):
+    """
+    (name, loader) pairs for every file in a ZIP; loaders are safe to call from threads
+    and valid until the with-block exits, which closes the archive.
+    """
+    with zipfile.ZipFile(zip_file) as zf:
+        lock = threading.Lock()
+
+        def loader(name):
+            def _load():
+                with lock:
+                    return zf.read(name)
+            return _load
+
+        yield [
+            (info.filename, loader(info.filename))
+            for info in zf.infolist()
+            if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        ]
+
+
+def server_path(path, roots=None):
+    """`path` resolved (symlinks and ..), if it lies under one of `roots`; None otherwise."""
+    real = os.path.realpath(path)
+    for root in SERVER_ROOTS if roots is None else roots:
+        root = os.path.realpath(root)
+        if os.path.commonpath([real, root]) == root:
+            return real
+    return None
+
+
+def folder_items(folder):
+    """(path, loader) pairs for every file below `folder`."""
+    items = []
+    for root, _, files in os.walk(folder):
+        for fname in sorted(files):
+            path = os.path.join(root, fname)
+            items.append((os.path.relpath(path, folder), partial(Path.read_bytes, Path(path))))
+    return items
+
+
+def clean_locally(client, instance_id, data, profile, salt):
+    """
+    Header-only clean for an instance without burned-in text: de-identify here,
+    upload the copy and set Metadata[1000] like the remote cleaner would, so the
+    changes cursor resolves it. Returns the cleaned instance id.
+    """
+    upload = client.upload_instance(deid.deidentify_bytes(data, profile, salt))
+    upload.raise_for_status()
+    cleaned_id = upload.json()["ID"]
+    client.set_instance_metadata(cleaned_id, LINK_METADATA_KEY, instance_id).raise_for_status()
+    return cleaned_id
+
+
+def needs_ocr(data, text_threshold):
+    """(needs OCR, text score, frames); anything the filter can't read goes to OCR."""
+    try:
+        result = score_instance(data, text_threshold)
+    except Exception:
+        return True, None, None
+    return result["needs_ocr"], result["text_score"], result["frames"]
+
+
+def upload_and_trigger(client, name, load, text_threshold=None, profile=None, salt=None, index=None):
+    """
+    Upload one instance and start the remote cleaner for it. With `text_threshold`
+    set, instances scoring below it are cleaned locally with `profile` instead.
+    With a HeaderIndex, identical files whose cleaned copy is still in Orthanc are
+    not uploaded again, and new uploads are recorded.
+    """
+    row = {"file": name, "instance_id": None, "cleaned_id": None, "status": "uploading",
+           "upload_s": None, "clean_s": None}
+    t0 = time.perf_counter()
+    data = load()
+    if not is_dicom(data):
+        row["status"] = "skipped (not DICOM)"
+        return row
+    sha1 = sha1_bytes(data) if index is not None else None
+    try:
+        if index is not None:
+            known = index.find_by_hash(sha1)
+            # The index can outlive the instance in Orthanc; a deleted cleaned copy is cleaned again
+            if known and known["cleaned_id"] and client.instance_exists(known["cleaned_id"]):
+                row.update(instance_id=known["instance_id"], cleaned_id=known["cleaned_id"], status="already cleaned")
+                return row
+        upload = client.upload_instance(data)
+        if upload.status_code != 200 or not upload.json().get("ID"):
+            row["status"] = f"upload failed ({upload.status_code})"
+            return row
+        row["instance_id"] = upload.json()["ID"]
+        row["upload_s"] = round(time.perf_counter() - t0, 3)
+        if index is not None:
+            index.record_upload(row["instance_id"], sha1, data=data, file_name=name)
+
+        if text_threshold is not None:
+            row["ocr"], row["text_score"], row["frames"] = needs_ocr(data, text_threshold)
+            if not row["ocr"]:
+                clean_locally(client, row["instance_id"], data, profile, salt)
+                row["status"] = "cleaning"
+                row["_t0"] = t0
+                return row
+
+        trigger = client.execute_script(CLEANER_LUA.format(instance_id=row["instance_id"]))
+        row["status"] = "cleaning" if trigger.status_code == 200 else f"trigger failed ({trigger.status_code})"
+    except requests.RequestException as e:
+        row["status"] = f"error: {e}"
+    row["_t0"] = t0
+    return row
+
+
+def run_batch(client, cursor, items, workers=8, max_wait_seconds=600, poll_every=0.5, on_update=None,
+              text_threshold=None, profile=None, salt=None, index=None):
+    """
+    Upload `items` concurrently and wait for all cleaned copies through `cursor`.
+    `on_update(rows, stats)` is called whenever progress changes. Returns (rows, stats).
+    `text_threshold`, `profile` and `salt` enable the OCR pre-filter and `index`
+    the header index (see upload_and_trigger).
+    """
+    rows = []
+    by_instance = {}     # original instance id -> rows still waiting for a cleaned copy
+    t_start = time.perf_counter()
+
+    def stats():
+        elapsed = time.perf_counter() - t_start
+        cleaned = sum(1 for r in rows if r["cleaned_id"])
+        return {
+            "total": len(items),
+            "uploaded": sum(1 for r in rows if r["instance_id"]),
+            "cleaned": cleaned,
+            "skipped": sum(1 for r in rows if r["status"].startswith("skipped")),
+            "failed": sum(1 for r in rows if not r["instance_id"] and not r["status"].startswith("skipped")),
+            "ocr_skipped": sum(1 for r in rows if r.get("ocr") is False),
+            "reused": sum(1 for r in rows if r["status"] == "already cleaned"),
+            "elapsed_s": round(elapsed, 1),
+            "instances_per_min": round(cleaned / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        }
+
+    def resolve(instance_id, cleaned_id):
+        for row in by_instance.pop(instance_id, []):
+            row["cleaned_id"] = cleaned_id
+            row["status"] = "cleaned" if row.get("ocr", True) else "cleaned (OCR skipped)"
+            row["clean_s"] = round(time.perf_counter() - row.pop("_t0"), 3)
+            if index is not None:
+                index.record_clean(instance_id, cleaned_id, ocr=row.get("ocr"))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(upload_and_trigger, client, name, load, text_threshold, profile, salt, index)
+                   for name, load in items}
+        deadline = None
+
+        while futures or by_instance:
+            if futures:
+                done, futures = wait(futures, timeout=poll_every, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                deadline = deadline or time.time() + max_wait_seconds
+                if time.time() > deadline:
+                    break
+                time.sleep(poll_every)
+
+            changed = bool(done)
+            for f in done:
+                row = f.result()
+                rows.append(row)
+                if row["status"] == "cleaning":
+                    cursor.track([row["instance_id"]])
+                    by_instance.setdefault(row["instance_id"], []).append(row)
+                    if row["instance_id"] in cursor.links:
+                        resolve(row["instance_id"], cursor.links[row["instance_id"]])
+                else:
+                    row.pop("_t0", None)
+
+            if by_instance:
+                try:
+                    for original_id, cleaned_id in cursor.poll().items():
+                        if original_id in by_instance:
+                            resolve(original_id, cleaned_id)
+                            changed = True
+                except requests.RequestException:
+                    pass
+
+            if changed and on_update:
+                on_update(rows, stats())
+
+    for waiting in by_instance.values():
+        for row in waiting:
+            row["status"] = "timed out"
+            row.pop("_t0", None)
+    return rows, stats()
@@ -0,0 +1,173 @@
+"""
+End-to-end latency benchmark: upload -> clean -> lookup -> download.
+
+Generates synthetic DICOMs (see imaging_common/synthetic_dicom.py) and pushes
+them through the same calls the app makes, against the local Orthanc stand-in
+with a configurable simulated cleaner delay (or a real server via --url). For
+each concurrency level it reports per-stage p50/p95 latency and throughput:
+
+    upload    POST /instances
+    trigger   POST /tools/execute-script
+    clean     trigger -> cleaned copy linked (cleaner time + changes-feed lookup)
+    lookup    clean minus the simulated cleaner delay (stand-in only)
+    download  streamed GET /instances/<id>/file into a spool
+
+    python dicom_anonymisation/bench_pipeline.py --mix CT:40,MR:20,US:2,DX:2 --concurrency 1,4,16
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from imaging_common.mock_orthanc import serve
+from imaging_common.orthanc_client import OrthancClient
+from imaging_common.synthetic_dicom import make_series, MODALITIES
+from batch import CLEANER_LUA
+from orthanc_changes import CleanedInstanceCursor
+from retrieval import fetch_instance
+
+STAGES = ["upload", "trigger", "clean", "lookup", "download", "total"]
+
+
+class LinkWatcher:
+    """Single thread following the changes feed and waking the worker waiting on each original."""
+
+    def __init__(self, cursor, poll_every):
+        self.cursor = cursor
+        self.poll_every = poll_every
+        self._events = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _event(self, original_id):
+        with self._lock:
+            return self._events.setdefault(original_id, threading.Event())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                for original_id in self.cursor.poll():
+                    self._event(original_id).set()
+            except requests.RequestException:
+                pass
+            self._stop.wait(self.poll_every)
+
+    def wait(self, original_id, timeout):
+        self.cursor.track([original_id])
+        if self._event(original_id).wait(timeout):
+            return self.cursor.links[original_id]
+        return None
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def parse_mix(spec):
+    """'CT:40,US:2' -> [('CT', 40), ('US', 2)]"""
+    mix = []
+    for part in spec.split(","):
+        modality, _, count = part.partition(":")
+        if modality.strip().upper() not in MODALITIES:
+            raise SystemExit(f"unknown modality {modality!r}; choose from {', '.join(MODALITIES)}")
+        mix.append((modality.strip().upper(), int(count or 1)))
+    return mix
+
+
+def generate(mix, seed):
+    return [(modality, data) for modality, count in mix for data in make_series(modality, count, seed=seed)]
+
+
+def run_one(client, watcher, modality, data, max_wait, cleaner_delay):
+    row = {"modality": modality, "bytes": len(data), "ok": False}
+    t0 = time.perf_counter()
+    upload = client.upload_instance(data)
+    upload.raise_for_status()
+    instance_id = upload.json()["ID"]
+    t1 = time.perf_counter()
+    client.execute_script(CLEANER_LUA.format(instance_id=instance_id)).raise_for_status()
+    t2 = time.perf_counter()
+    cleaned_id = watcher.wait(instance_id, max_wait)
+    t3 = time.perf_counter()
+    row.update(upload=t1 - t0, trigger=t2 - t1, clean=t3 - t2)
+    if cleaned_id is None:
+        return row
+    if cleaner_delay is not None:
+        row["lookup"] = max(0.0, row["clean"] - cleaner_delay)
+    spool, _, _ = fetch_instance(client, cleaned_id)
+    spool.close()
+    t4 = time.perf_counter()
+    row.update(download=t4 - t3, total=t4 - t0, ok=True)
+    return row
+
+
+def run_level(client, items, workers, max_wait, poll_every, cleaner_delay):
+    watcher = LinkWatcher(CleanedInstanceCursor(client), poll_every)
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(
+                lambda item: run_one(client, watcher, item[0], item[1], max_wait, cleaner_delay), items))
+    finally:
+        watcher.stop()
+    return rows, time.perf_counter() - t0
+
+
+def report(workers, rows, wall):
+    ok = [r for r in rows if r["ok"]]
+    mb = sum(r["bytes"] for r in ok) / 1e6
+    print(f"\nconcurrency {workers}: {len(ok)}/{len(rows)} cleaned in {wall:.2f}s  "
+          f"{len(ok) / wall * 60:.1f} inst/min  {mb / wall:.1f} MB/s")
+    print(f"  {'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = [r[stage] for r in ok if stage in r]
+        if values:
+            p50, p95 = np.percentile(values, [50, 95])
+            print(f"  {stage:<10}{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    return {"concurrency": workers, "cleaned": len(ok), "inst_per_min": round(len(ok) / wall * 60, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Run against an existing Orthanc instead of the local stand-in.")
+    parser.add_argument("--mix", default="CT:40,MR:20,XA:2,US:2,DX:2",
+                        help=f"modality:count list; modalities: {', '.join(MODALITIES)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated worker counts.")
+    parser.add_argument("--cleaner-delay", type=float, default=1.0, help="Simulated cleaner seconds (stand-in only).")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Per-connection delay on the stand-in.")
+    parser.add_argument("--poll-every", type=float, default=0.2)
+    parser.add_argument("--max-wait", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    url, cleaner_delay = args.url, None
+    if not url:
+        server, url = serve(cleaner_delay=args.cleaner_delay, connect_delay=args.connect_delay)
+        cleaner_delay = args.cleaner_delay
+    levels = [int(w) for w in args.concurrency.split(",")]
+    client = OrthancClient(url, pool_size=max(levels))
+    mix = parse_mix(args.mix)
+    print(f"Target {url}  mix {args.mix}  cleaner delay {cleaner_delay if cleaner_delay is not None else 'real'}")
+
+    summary = []
+    for workers in levels:
+        items = generate(mix, args.seed + workers)   # fresh UIDs per level so nothing is AlreadyStored
+        rows, wall = run_level(client, items, workers, args.max_wait, args.poll_every, cleaner_delay)
+        summary.append(report(workers, rows, wall))
+
+    print("\nthroughput by concurrency")
+    for s in summary:
+        print(f"  {s['concurrency']:>4} workers  {s['inst_per_min']:>8.1f} inst/min  ({s['cleaned']} cleaned)")
+
+
+if __name__ == "__main__":
+    main()
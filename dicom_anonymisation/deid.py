@@ -0,0 +1,178 @@
+"""
+Local CPU header de-identification engine (no network, no GPU).
+
+Applies a configurable PS3.15 basic-profile style rule set (see
+deid_basic_profile.json) with pydicom. UIDs are replaced by a salted hash
+under the 2.25 root, so the same input UID maps to the same output UID in every
+file, process and run that shares the salt: a study keeps its structure
+(Study/Series/SOP/FrameOfReference links) after cleaning. The salt is a
+secret: without it a replacement UID is a bare hash that anyone holding a list
+of candidate UIDs can recompute to tell which study is which. De-identification
+refuses an empty salt; load_salt() takes DEID_SALT or generates one on first
+use and keeps it (owner-only) at DEID_SALT_PATH, so later runs reuse it.
+
+Files are streamed: only the header is parsed; the pixel data and anything
+after it is copied from the source file in fixed-size chunks, so large
+multi-frame objects never sit in memory. Directories are processed in a
+process pool.
+"""
+import hashlib
+import io
+import json
+import os
+import secrets
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pydicom
+from pydicom.datadict import tag_for_keyword
+from pydicom.multival import MultiValue
+from pydicom.uid import DeflatedExplicitVRLittleEndian
+
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deid_basic_profile.json")
+STANDARD_UID_ROOT = "1.2.840.10008."   # SOP classes, transfer syntaxes, coding schemes
+COPY_CHUNK = 1 << 20
+DEID_METHOD = "PS3.15 Basic Profile (local CPU engine)"
+SALT_PATH = os.environ.get("DEID_SALT_PATH", os.path.expanduser("~/.dicom_cleaner/deid_salt"))
+
+
+def load_profile(path=None):
+    with open(path or PROFILE_PATH) as f:
+        return json.load(f)
+
+
+def load_salt(path=SALT_PATH):
+    """DEID_SALT when set, else the salt kept at `path`, generated (256 random bits) on first use."""
+    salt = os.environ.get("DEID_SALT", "").strip()
+    if salt:
+        return salt
+    try:
+        with open(path) as f:
+            salt = f.read().strip()
+        if salt:
+            return salt
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    salt = secrets.token_hex(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:   # another process created it first
+        return load_salt(path)
+    with os.fdopen(fd, "w") as f:
+        f.write(salt + "\n")
+    return salt
+
+
+def hash_uid(uid, salt=""):
+    """Deterministic replacement UID: 2.25.<128-bit integer from SHA-256(salt + uid)>."""
+    digest = hashlib.sha256(f"{salt}{uid}".encode()).digest()
+    return f"2.25.{int.from_bytes(digest[:16], 'big')}"
+
+
+def hash_value(value, salt=""):
+    return hashlib.sha256(f"{salt}{value}".encode()).hexdigest()[:16].upper()
+
+
+def _replace_uids(value, salt):
+    if isinstance(value, (list, MultiValue)):
+        return [_replace_uids(v, salt) for v in value]
+    value = str(value)
+    if not value or value.startswith(STANDARD_UID_ROOT):
+        return value
+    return hash_uid(value, salt)
+
+
+def apply_profile(ds, profile, salt):
+    """De-identify `ds` in place, recursing into sequences. Returns the dataset."""
+    if not salt:
+        raise ValueError("a non-empty UID hashing salt is required (set DEID_SALT or use deid.load_salt())")
+    actions = {}
+    for keyword, action in profile.get("actions", {}).items():
+        tag = tag_for_keyword(keyword)
+        if tag is not None:
+            actions[tag] = action
+
+    if profile.get("remove_private_tags", True):
+        ds.remove_private_tags()
+
+    def _visit(dataset, elem):
+        if elem.tag.element == 0 and elem.tag.group != 0x0002:
+            del dataset[elem.tag]     # group lengths are stale once values change
+            return
+        action = actions.get(elem.tag)
+        if action == "X":
+            del dataset[elem.tag]
+        elif action == "Z":
+            elem.value = [] if elem.VR == "SQ" else ""
+        elif action == "H" and elem.value not in (None, ""):
+            elem.value = hash_value(elem.value, salt)
+        elif elem.VR == "UI" and action != "K" and (action == "U" or profile.get("hash_uids", True)):
+            elem.value = _replace_uids(elem.value, salt)
+
+    ds.walk(_visit)
+
+    meta = getattr(ds, "file_meta", None)
+    if meta is not None and "MediaStorageSOPInstanceUID" in meta and "SOPInstanceUID" in ds:
+        meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.PatientIdentityRemoved = "YES"
+    ds.DeidentificationMethod = DEID_METHOD
+    return ds
+
+
+def deidentify_bytes(dicom_bytes, profile, salt):
+    """In-memory variant for single uploads."""
+    ds = pydicom.dcmread(io.BytesIO(dicom_bytes))
+    apply_profile(ds, profile, salt)
+    out = io.BytesIO()
+    ds.save_as(out)
+    return out.getvalue()
+
+
+def deidentify_file(src_path, dst_path, profile, salt):
+    """
+    Stream one file: parse the header only, write the de-identified header,
+    then copy the pixel data (and any trailing elements) through unchanged.
+    """
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    with open(src_path, "rb") as fp:
+        ds = pydicom.dcmread(fp, stop_before_pixels=True)
+        if ds.file_meta.get("TransferSyntaxUID") == DeflatedExplicitVRLittleEndian:
+            # The deflated body can't be spliced; fall back to a full read.
+            fp.seek(0)
+            ds = pydicom.dcmread(fp)
+            apply_profile(ds, profile, salt)
+            ds.save_as(dst_path)
+            return
+        apply_profile(ds, profile, salt)
+        with open(dst_path, "wb") as out:
+            ds.save_as(out)
+            shutil.copyfileobj(fp, out, COPY_CHUNK)
+
+
+def _deidentify_job(job):
+    src_path, dst_path, profile, salt = job
+    try:
+        deidentify_file(src_path, dst_path, profile, salt)
+        return {"file": src_path, "output": dst_path, "status": "ok", "bytes": os.path.getsize(src_path)}
+    except Exception as e:
+        return {"file": src_path, "output": None, "status": f"error: {e}", "bytes": 0}
+
+
+def iter_deidentify_directory(src_dir, dst_dir, profile, salt, workers=None, chunksize=8):
+    """
+    De-identify every file below `src_dir` into the same layout under `dst_dir`
+    using a process pool. Yields one result row per file, in walk order.
+    """
+    jobs = []
+    for root, _, files in os.walk(src_dir):
+        for fname in sorted(files):
+            src = os.path.join(root, fname)
+            jobs.append((src, os.path.join(dst_dir, os.path.relpath(src, src_dir)), profile, salt))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_deidentify_job, jobs, chunksize=chunksize)
+
+
+def count_files(src_dir):
+    return sum(len(files) for _, _, files in os.walk(src_dir))
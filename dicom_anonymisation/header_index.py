@@ -0,0 +1,172 @@
+"""
+Local SQLite index of uploaded and cleaned instances.
+
+Every upload records the Orthanc instance ID, a SHA-1 of the file and the
+identifying header tags (PatientID, Study/Series/SOP UIDs, Modality, dates);
+every clean records the linked cleaned ID and its hash. Re-uploads of an
+identical file are caught by hash before any network call, the
+original -> cleaned link is a primary-key lookup instead of a metadata scan,
+and uploads can be searched without walking Orthanc's REST API.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+
+import pydicom
+
+INDEX_PATH = os.environ.get("DICOM_INDEX_PATH", os.path.expanduser("~/.dicom_cleaner/header_index.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id   TEXT PRIMARY KEY,
+    sha1          TEXT NOT NULL,
+    file_name     TEXT,
+    size_bytes    INTEGER,
+    patient_id    TEXT,
+    study_uid     TEXT,
+    series_uid    TEXT,
+    sop_uid       TEXT,
+    modality      TEXT,
+    study_date    TEXT,
+    uploaded_at   REAL,
+    cleaned_id    TEXT,
+    cleaned_sha1  TEXT,
+    cleaned_at    REAL,
+    ocr           INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_instances_sha1 ON instances (sha1);
+CREATE INDEX IF NOT EXISTS ix_instances_cleaned ON instances (cleaned_id);
+CREATE INDEX IF NOT EXISTS ix_instances_patient ON instances (patient_id, study_date);
+CREATE INDEX IF NOT EXISTS ix_instances_study ON instances (study_uid, series_uid);
+"""
+
+SEARCH_FIELDS = ("patient_id", "study_uid", "series_uid", "modality")
+
+
+def sha1_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def header_fields(data=None, header=None):
+    """Indexed tags from a parsed header, or from the file bytes (pixels are not read)."""
+    if header is None:
+        header = pydicom.dcmread(io.BytesIO(data), stop_before_pixels=True)
+    return {
+        "patient_id": str(header.get("PatientID", "")),
+        "study_uid": str(header.get("StudyInstanceUID", "")),
+        "series_uid": str(header.get("SeriesInstanceUID", "")),
+        "sop_uid": str(header.get("SOPInstanceUID", "")),
+        "modality": str(header.get("Modality", "")),
+        "study_date": str(header.get("StudyDate", "")),
+    }
+
+
+class HeaderIndex:
+    """One connection shared by all threads of the server process, serialised by a lock."""
+
+    def __init__(self, path=INDEX_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def _one(self, sql, params):
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    # ---------- writes ----------
+    def record_upload(self, instance_id, sha1, data=None, header=None, file_name=None, size_bytes=None):
+        """Insert or refresh an upload; header tags come from `header` or are parsed from `data`."""
+        try:
+            fields = header_fields(data, header)
+        except Exception:
+            fields = dict.fromkeys(("patient_id", "study_uid", "series_uid", "sop_uid", "modality", "study_date"))
+        size_bytes = size_bytes if size_bytes is not None else (len(data) if data is not None else None)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO instances (instance_id, sha1, file_name, size_bytes, patient_id, study_uid,
+                                          series_uid, sop_uid, modality, study_date, uploaded_at)
+                   VALUES (:instance_id, :sha1, :file_name, :size_bytes, :patient_id, :study_uid,
+                           :series_uid, :sop_uid, :modality, :study_date, :uploaded_at)
+                   ON CONFLICT(instance_id) DO UPDATE SET
+                       sha1 = excluded.sha1, file_name = COALESCE(excluded.file_name, file_name),
+                       uploaded_at = excluded.uploaded_at""",
+                dict(fields, instance_id=instance_id, sha1=sha1, file_name=file_name,
+                     size_bytes=size_bytes, uploaded_at=time.time()),
+            )
+
+    def record_clean(self, instance_id, cleaned_id, cleaned_sha1=None, ocr=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE instances SET cleaned_id = ?, cleaned_sha1 = COALESCE(?, cleaned_sha1),
+                                        cleaned_at = ?, ocr = COALESCE(?, ocr)
+                   WHERE instance_id = ?""",
+                (cleaned_id, cleaned_sha1, time.time(), None if ocr is None else int(ocr), instance_id),
+            )
+
+    # ---------- lookups ----------
+    def find_by_hash(self, sha1):
+        """Latest upload of an identical file, preferring one that already has a cleaned copy."""
+        return self._one(
+            "SELECT * FROM instances WHERE sha1 = ? ORDER BY cleaned_id IS NULL, uploaded_at DESC LIMIT 1",
+            (sha1,),
+        )
+
+    def cleaned_id(self, instance_id):
+        row = self._one("SELECT cleaned_id FROM instances WHERE instance_id = ?", (instance_id,))
+        return row["cleaned_id"] if row else None
+
+    def original_of(self, cleaned_id):
+        row = self._one("SELECT instance_id FROM instances WHERE cleaned_id = ?", (cleaned_id,))
+        return row["instance_id"] if row else None
+
+    def search(self, date_from=None, date_to=None, cleaned=None, limit=500, **filters):
+        """
+        Filter on any of SEARCH_FIELDS (exact match, or prefix match with a trailing '*'),
+        StudyDate bounds (YYYYMMDD) and cleaned status. Newest uploads first.
+        """
+        where, params = [], []
+        for field in SEARCH_FIELDS:
+            value = (filters.get(field) or "").strip()
+            if not value:
+                continue
+            if value.endswith("*"):
+                where.append(f"{field} LIKE ? ESCAPE '\\'")
+                params.append(value[:-1].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+            else:
+                where.append(f"{field} = ?")
+                params.append(value)
+        if date_from:
+            where.append("study_date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("study_date <= ?")
+            params.append(date_to)
+        if cleaned is not None:
+            where.append("cleaned_id IS NOT NULL" if cleaned else "cleaned_id IS NULL")
+        sql = "SELECT * FROM instances"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY uploaded_at DESC LIMIT ?"
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params + [int(limit)])]
+
+    def stats(self):
+        row = self._one(
+            """SELECT COUNT(*) AS instances, COUNT(cleaned_id) AS cleaned,
+                      COUNT(DISTINCT patient_id) AS patients, COUNT(DISTINCT study_uid) AS studies,
+                      COALESCE(SUM(size_bytes), 0) AS bytes
+               FROM instances""",
+            (),
+        )
+        return row
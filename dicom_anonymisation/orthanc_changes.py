@@ -0,0 +1,77 @@
+"""
+Orthanc changes-feed cursor used to link original uploads to their cleaned copies.
+
+The remote cleaner stores the anonymised instance and sets
+Metadata[1000] = <original_instance_id>. Rather than listing every instance on
+each poll, the cursor follows /changes?since=<seq> from a sequence number taken
+before the cleaner is triggered, so a poll costs one request plus one metadata
+read per *new* instance, and nothing is missed however many instances arrive.
+"""
+import time
+
+import requests
+
+LINK_METADATA_KEY = "1000"
+WATCHED_CHANGES = {"NewInstance", "UpdatedMetadata"}
+
+
+class CleanedInstanceCursor:
+    def __init__(self, client, since=None, page_size=100):
+        self.client = client     # imaging_common.orthanc_client.OrthancClient
+        self.page_size = page_size
+        self.links = {}          # original instance id -> cleaned instance id
+        self._linked = set()     # cleaned ids already resolved
+        self._ignore = set()     # originals we uploaded ourselves; never cleaned copies
+        self.since = client.last_change_seq() if since is None else since
+
+    def track(self, original_ids):
+        """Mark instances we uploaded so their own change events skip the metadata read."""
+        self._ignore.update(original_ids)
+
+    def poll(self):
+        """
+        Drain every change after the cursor and return {original_id: cleaned_id}
+        for the links discovered in this call.
+        """
+        found = {}
+        while True:
+            payload = self.client.changes(self.since, self.page_size)
+            for change in payload.get("Changes", []):
+                if change.get("ResourceType") != "Instance" or change.get("ChangeType") not in WATCHED_CHANGES:
+                    continue
+                inst_id = change.get("ID")
+                if inst_id in self._linked or inst_id in self._ignore:
+                    continue
+                original_id = self.client.instance_metadata(inst_id, LINK_METADATA_KEY)
+                if original_id:
+                    self.links[original_id] = inst_id
+                    self._linked.add(inst_id)
+                    found[original_id] = inst_id
+            self.since = max(self.since, int(payload.get("Last") or 0))
+            if payload.get("Done", True):
+                return found
+
+    def wait_for(self, original_ids, max_wait_seconds=120, poll_every=0.5, on_found=None, on_error=None):
+        """
+        Poll until every original in `original_ids` has a cleaned copy or the
+        deadline passes. Returns the {original_id: cleaned_id} links found.
+        """
+        original_ids = list(original_ids)
+        self.track(original_ids)
+        pending = {o for o in original_ids if o not in self.links}
+        deadline = time.time() + max_wait_seconds
+
+        while pending and time.time() < deadline:
+            try:
+                for original_id, cleaned_id in self.poll().items():
+                    if original_id in pending:
+                        pending.discard(original_id)
+                        if on_found:
+                            on_found(original_id, cleaned_id)
+            except requests.RequestException as e:
+                if on_error:
+                    on_error(e)
+            if pending:
+                time.sleep(poll_every)
+
+        return {o: self.links[o] for o in original_ids if o in self.links}
@@ -0,0 +1,177 @@
+"""
+Fast DICOM preview rendering for the cleaner UI.
+
+Each upload is parsed once: the header is cached by content hash and frames are
+decoded one at a time straight from the encoded bytes (or a spooled temp file),
+so a 512x512x400 CT
+never becomes a multi-GB float array. Each frame is downsampled to the display
+size *before* any float conversion, then rescaled and VOI-windowed in place
+(WindowCenter/WindowWidth, falling back to min/max) and cached as uint8.
+"""
+import hashlib
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pydicom
+from pydicom.multival import MultiValue
+
+try:
+    from pydicom.pixels import pixel_array as _decode_frame   # pydicom >= 3: per-frame decode
+except ImportError:
+    _decode_frame = None
+PER_FRAME_DECODE = _decode_frame is not None
+
+DISPLAY_SIZE = 768
+HASH_CHUNK = 1 << 20
+
+
+def open_source(src):
+    """Bytes are wrapped without copying; file objects are rewound and used as-is."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return io.BytesIO(src)
+    src.seek(0)
+    return src
+
+
+def _size(src):
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return len(src)
+    return src.seek(0, io.SEEK_END)
+
+
+def content_hash(src):
+    """SHA-1 of bytes or of a file object, read in chunks."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return hashlib.sha1(src).hexdigest()
+    h = hashlib.sha1()
+    fp = open_source(src)
+    for chunk in iter(lambda: fp.read(HASH_CHUNK), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def decode_frame(src, index, n_frames):
+    """Full-resolution pixels of one frame, without decoding the rest of the volume."""
+    if _decode_frame is not None:
+        return _decode_frame(open_source(src), index=index if n_frames > 1 else None)
+    arr = pydicom.dcmread(open_source(src)).pixel_array   # pydicom 2: whole volume
+    return arr[index] if n_frames > 1 else arr
+
+
+def _first(value, default=None):
+    """WindowCenter/WindowWidth may be multi-valued; the first pair is the default view."""
+    if value is None:
+        return default
+    if isinstance(value, (list, tuple, MultiValue)):
+        return float(value[0]) if len(value) else default
+    return float(value)
+
+
+def window_frame(frame, header, max_size=DISPLAY_SIZE):
+    """Downsample, rescale and window one decoded frame into a uint8 image."""
+    step = max(1, math.ceil(max(frame.shape[0], frame.shape[1]) / max_size))
+    small = frame[::step, ::step]
+
+    if small.ndim == 3:   # colour: no VOI LUT, only bring to 8 bits
+        if small.dtype == np.uint8:
+            return np.ascontiguousarray(small)
+        out = small.astype(np.float32)
+        out *= 255.0 / max(float(out.max()), 1.0)
+        return out.astype(np.uint8)
+
+    out = small.astype(np.float32)   # small copy; the rest is in place
+    slope = float(getattr(header, "RescaleSlope", 1) or 1)
+    intercept = float(getattr(header, "RescaleIntercept", 0) or 0)
+    if slope != 1:
+        out *= slope
+    if intercept:
+        out += intercept
+
+    center = _first(getattr(header, "WindowCenter", None))
+    width = _first(getattr(header, "WindowWidth", None))
+    if center is not None and width and width > 1:
+        lo, hi = center - width / 2.0, center + width / 2.0
+    else:
+        lo, hi = float(out.min()), float(out.max())
+
+    np.clip(out, lo, hi, out=out)
+    out -= lo
+    if hi > lo:
+        out *= 255.0 / (hi - lo)
+    if getattr(header, "PhotometricInterpretation", "") == "MONOCHROME1":
+        np.subtract(255.0, out, out=out)
+    return out.astype(np.uint8)
+
+
+class PreviewService:
+    """LRU caches of parsed headers and rendered frames, keyed by content hash."""
+
+    def __init__(self, max_headers=32, max_frames=256):
+        self._lock = threading.Lock()
+        self._headers = OrderedDict()   # digest -> (header Dataset without pixels, has pixel data)
+        self._frames = OrderedDict()    # (digest, frame, max_size) -> uint8 preview
+        self.max_headers = max_headers
+        self.max_frames = max_frames
+
+    @staticmethod
+    def _lru_get(cache, key):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        return None
+
+    @staticmethod
+    def _lru_put(cache, key, value, limit):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def _header_entry(self, data, digest=None):
+        digest = digest or content_hash(data)
+        with self._lock:
+            entry = self._lru_get(self._headers, digest)
+        if entry is None:
+            fp = open_source(data)
+            hdr = pydicom.dcmread(fp, stop_before_pixels=True)
+            entry = (hdr, fp.tell() < _size(data))   # reader stops right at (7FE0,0010)
+            if getattr(hdr, "buffer", None) is not None:
+                hdr.buffer = None                  # don't pin the whole file in the cache
+            with self._lock:
+                self._lru_put(self._headers, digest, entry, self.max_headers)
+        return entry
+
+    def header(self, data, digest=None):
+        return self._header_entry(data, digest)[0]
+
+    def has_pixels(self, data, digest=None):
+        return self._header_entry(data, digest)[1]
+
+    def n_frames(self, data, digest=None):
+        return int(getattr(self.header(data, digest), "NumberOfFrames", 1) or 1)
+
+    def render(self, data, frame=None, max_size=DISPLAY_SIZE, digest=None):
+        """uint8 preview of one frame (the middle one by default)."""
+        digest = digest or content_hash(data)
+        hdr = self.header(data, digest)
+        n = self.n_frames(data, digest)
+        frame = n // 2 if frame is None else min(max(int(frame), 0), n - 1)
+
+        key = (digest, frame, max_size)
+        with self._lock:
+            img = self._lru_get(self._frames, key)
+        if img is None:
+            img = window_frame(decode_frame(data, frame, n), hdr, max_size)
+            with self._lock:
+                self._lru_put(self._frames, key, img, self.max_frames)
+        return img
+
+    def forget(self, digest):
+        """Drop everything cached for one file."""
+        with self._lock:
+            self._headers.pop(digest, None)
+            for key in [k for k in self._frames if k[0] == digest]:
+                del self._frames[key]
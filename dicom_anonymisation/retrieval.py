@@ -0,0 +1,105 @@
+"""
+Bounded-memory retrieval of cleaned instances.
+
+Cleaned files are streamed from Orthanc with iter_content() into a
+SpooledTemporaryFile that spills to disk past SPOOL_MAX_BYTES, hashing as they
+arrive. A process-wide MemoryBudget caps how many bytes all sessions together
+may hold in the compare step and keeps a running total per session, so one
+session can never hold more than its cap; large ultrasound / mammography
+objects queue instead of OOMing the Streamlit server.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+CHUNK_BYTES = 1 << 20
+SPOOL_MAX_BYTES = int(os.environ.get("DICOM_SPOOL_MAX_MB", "16")) << 20
+SESSION_MAX_BYTES = int(os.environ.get("DICOM_SESSION_MAX_MB", "1024")) << 20
+SERVER_MAX_BYTES = int(os.environ.get("DICOM_SERVER_MAX_MB", "2048")) << 20
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+class MemoryBudget:
+    """Counting semaphore over bytes, shared by every session of the server process."""
+
+    def __init__(self, total_bytes=SERVER_MAX_BYTES, session_bytes=SESSION_MAX_BYTES):
+        self.total_bytes = total_bytes
+        self.session_bytes = session_bytes
+        self.in_use = 0
+        self.by_session = {}   # session key -> bytes it holds now
+        self._cond = threading.Condition()
+
+    def session_in_use(self, session):
+        with self._cond:
+            return self.by_session.get(session, 0)
+
+    def acquire(self, nbytes, timeout=60, session=None):
+        """
+        Block until `nbytes` fit in the budget; returns the amount to pass to release().
+        A `session` that would go past its own cap is refused at once rather than queued.
+        """
+        nbytes = min(nbytes, self.total_bytes)
+        deadline = time.time() + timeout
+        with self._cond:
+            if session is not None:
+                check_session_cap(nbytes, self.session_bytes, self.by_session.get(session, 0))
+            while self.in_use + nbytes > self.total_bytes:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise MemoryBudgetExceeded(
+                        f"server memory budget busy ({self.in_use >> 20} of {self.total_bytes >> 20} MB in use)"
+                    )
+                self._cond.wait(remaining)
+            self.in_use += nbytes
+            if session is not None:
+                self.by_session[session] = self.by_session.get(session, 0) + nbytes
+        return nbytes
+
+    def release(self, nbytes, session=None):
+        with self._cond:
+            self.in_use -= nbytes
+            if session is not None:
+                left = self.by_session.get(session, 0) - nbytes
+                if left > 0:
+                    self.by_session[session] = left
+                else:
+                    self.by_session.pop(session, None)
+            self._cond.notify_all()
+
+
+def check_session_cap(nbytes, cap=SESSION_MAX_BYTES, in_use=0):
+    """Refuse `nbytes` more for a session already holding `in_use`."""
+    if in_use + nbytes > cap:
+        held = f" on top of {in_use >> 20} MB held" if in_use else ""
+        raise MemoryBudgetExceeded(f"{nbytes >> 20} MB{held} exceeds the per-session cap of {cap >> 20} MB")
+
+
+def resident_bytes(nbytes, spool_max=SPOOL_MAX_BYTES):
+    """Bytes a spooled copy of `nbytes` keeps in RAM."""
+    return min(nbytes, spool_max)
+
+
+def fetch_instance(client, instance_id, spool_max=SPOOL_MAX_BYTES, chunk_bytes=CHUNK_BYTES):
+    """
+    Stream /instances/<id>/file into a spooled temp file.
+    Returns (file positioned at 0, size in bytes, sha1 hex). Raises on HTTP errors.
+    """
+    resp = client.download_instance(instance_id, stream=True)
+    try:
+        resp.raise_for_status()
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_max, mode="w+b")
+        h = hashlib.sha1()
+        size = 0
+        for chunk in resp.iter_content(chunk_size=chunk_bytes):
+            spool.write(chunk)
+            h.update(chunk)
+            size += len(chunk)
+        spool.seek(0)
+        return spool, size, h.hexdigest()
+    finally:
+        resp.close()
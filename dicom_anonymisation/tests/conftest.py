@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The app imports its sibling modules directly and imaging_common from the repo root.
+APP_DIR = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(APP_DIR), str(APP_DIR.parent)]
+
+from imaging_common.mock_orthanc import serve          # noqa: E402
+from imaging_common.orthanc_client import OrthancClient  # noqa: E402
+
+
+@pytest.fixture
+def orthanc():
+    """(server, client) for a fresh local Orthanc stand-in; server.state is the in-memory store."""
+    server, url = serve(cleaner_delay=0.1)
+    yield server, OrthancClient(url, retries=0)
+    server.shutdown()
+    server.server_close()
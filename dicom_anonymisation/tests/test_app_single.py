@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from imaging_common.synthetic_dicom import make_instance
+from orthanc_changes import LINK_METADATA_KEY
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def app(orthanc, tmp_path, monkeypatch):
+    server, client = orthanc
+    monkeypatch.setenv("ORTHANC_URL", client.base_url)
+    monkeypatch.setenv("DICOM_INDEX_PATH", str(tmp_path / "index.sqlite3"))
+    monkeypatch.setenv("DEID_SALT", "test-salt")
+    sys.modules.pop("header_index", None)   # INDEX_PATH is read at import
+    st.cache_resource.clear()               # pooled client / index are per process
+    yield AppTest.from_file(str(APP_DIR / "app.py"), default_timeout=120)
+    st.cache_resource.clear()
+
+
+def upload(at, data, name="ct.dcm"):
+    at.run()
+    at.file_uploader[0].set_value((name, data, "application/dicom")).run()
+    assert not at.error, [e.value for e in at.error]
+    return at
+
+
+@pytest.mark.parametrize("skip_ocr", [True, False])
+def test_single_file_upload_clean_and_download(app, orthanc, skip_ocr):
+    server, _ = orthanc
+    data = make_instance("CT", rows=64, cols=64, seed=1)
+    at = upload(app, data)
+    if at.checkbox and skip_ocr:
+        assert not at.checkbox[0].value   # OCR stays on unless the user opts out
+        at.checkbox[0].check()
+
+    at.button[0].click().run()
+
+    assert not at.error, [e.value for e in at.error]
+    assert len(at.get("download_button")) == 1
+    ids = at.json[-1].value
+    assert '"Original ID"' in ids and '"Cleaned ID"' in ids
+    assert len(server.state.instances) == 2   # original + linked cleaned copy
+
+
+def test_reuse_falls_back_to_fresh_clean_when_cleaned_copy_is_gone(app, orthanc):
+    server, _ = orthanc
+    at = upload(app, make_instance("CT", rows=64, cols=64, seed=2))
+    at.button[0].click().run()
+    assert not at.error, [e.value for e in at.error]
+
+    # The cleaned copy is deleted from Orthanc; the local index still remembers it.
+    cleaned_ids = [i for i, meta in server.state.metadata.items() if meta.get(LINK_METADATA_KEY)]
+    assert len(cleaned_ids) == 1
+    del server.state.instances[cleaned_ids[0]]
+
+    at.run()
+    assert [c.value for c in at.checkbox if c.label.startswith("Reuse the existing cleaned copy")] == [True]
+    at.button[0].click().run()
+
+    assert not at.error, [e.value for e in at.error]
+    assert any("no longer in Orthanc" in w.value for w in at.warning)
+    assert len(at.get("download_button")) == 1
+    assert len(server.state.instances) == 2   # cleaned again
@@ -0,0 +1,82 @@
+import os
+import zipfile
+
+import pytest
+
+from batch import folder_items, server_path, upload_and_trigger, zip_items
+from header_index import HeaderIndex, sha1_bytes
+from imaging_common.synthetic_dicom import make_instance
+
+
+def indexed_clean(server, index, data):
+    """Upload `data`, store a cleaned copy and record both in `index`; returns (original, cleaned) ids."""
+    original_id, _ = server.state.store(data)
+    cleaned_id, _ = server.state.store(b"cleaned:" + data)
+    index.record_upload(original_id, sha1_bytes(data), data=data)
+    index.record_clean(original_id, cleaned_id)
+    return original_id, cleaned_id
+
+
+def test_indexed_cleaned_copy_is_reused_without_upload(orthanc):
+    server, client = orthanc
+    index = HeaderIndex(":memory:")
+    data = make_instance("CT", rows=32, cols=32, seed=1)
+    original_id, cleaned_id = indexed_clean(server, index, data)
+    stored = dict(server.state.instances)
+
+    row = upload_and_trigger(client, "a.dcm", lambda: data, index=index)
+
+    assert row["status"] == "already cleaned"
+    assert (row["instance_id"], row["cleaned_id"]) == (original_id, cleaned_id)
+    assert server.state.instances == stored
+
+
+def test_deleted_cleaned_copy_is_cleaned_again(orthanc):
+    server, client = orthanc
+    index = HeaderIndex(":memory:")
+    data = make_instance("CT", rows=32, cols=32, seed=2)
+    original_id, cleaned_id = indexed_clean(server, index, data)
+    del server.state.instances[cleaned_id]
+
+    row = upload_and_trigger(client, "a.dcm", lambda: data, index=index)
+
+    assert row["status"] == "cleaning"
+    assert row["instance_id"] == original_id
+    assert row["cleaned_id"] is None
+
+
+def test_zip_items_close_the_archive_on_exit(tmp_path):
+    path = tmp_path / "series.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("a.dcm", b"first")
+        zf.writestr("__MACOSX/._a.dcm", b"resource fork")
+        zf.writestr("sub/b.dcm", b"second")
+
+    with zip_items(str(path)) as items:
+        assert {name: load() for name, load in items} == {"a.dcm": b"first", "sub/b.dcm": b"second"}
+    with pytest.raises(ValueError):   # "Attempt to use ZIP archive that was already closed"
+        items[0][1]()
+
+
+def test_folder_items_read_each_file(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.dcm").write_bytes(b"first")
+    (tmp_path / "sub" / "b.dcm").write_bytes(b"second")
+
+    items = folder_items(str(tmp_path))
+
+    assert {name: load() for name, load in items} == {"a.dcm": b"first", os.path.join("sub", "b.dcm"): b"second"}
+
+
+def test_server_path_stays_under_the_allowed_roots(tmp_path):
+    root, outside = tmp_path / "root", tmp_path / "outside"
+    (root / "series").mkdir(parents=True)
+    outside.mkdir()
+    (root / "escape").symlink_to(outside)
+
+    assert server_path(str(root / "series"), [str(root)]) == str(root / "series")
+    assert server_path(str(root), [str(root)]) == str(root)
+    assert server_path(str(root / "series" / ".." / ".." / "outside"), [str(root)]) is None
+    assert server_path(str(root / "escape"), [str(root)]) is None
+    assert server_path(str(tmp_path / "root2"), [str(root)]) is None   # a prefix is not a parent
+    assert server_path(str(root / "series"), []) is None
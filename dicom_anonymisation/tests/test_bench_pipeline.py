@@ -0,0 +1,24 @@
+import pytest
+
+from bench_pipeline import STAGES, generate, parse_mix, report, run_level
+
+
+def test_parse_mix():
+    assert parse_mix("ct:3, MR , US:1") == [("CT", 3), ("MR", 1), ("US", 1)]
+    with pytest.raises(SystemExit, match="unknown modality 'PET'"):
+        parse_mix("PET:2")
+
+
+def test_a_level_cleans_every_instance_and_reports_each_stage(orthanc, capsys):
+    _, client = orthanc
+    items = generate([("CT", 3), ("US", 1)], seed=5)
+
+    rows, wall = run_level(client, items, workers=2, max_wait=5, poll_every=0.02, cleaner_delay=0.1)
+    summary = report(2, rows, wall)
+
+    assert [r["modality"] for r in rows] == ["CT", "CT", "CT", "US"]
+    assert all(r["ok"] and r["clean"] >= 0.1 for r in rows)
+    assert summary["concurrency"] == 2 and summary["cleaned"] == 4
+    printed = capsys.readouterr().out
+    assert "4/4 cleaned" in printed
+    assert all(f"  {stage:<10}" in printed for stage in STAGES)
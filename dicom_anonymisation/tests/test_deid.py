@@ -0,0 +1,75 @@
+import io
+import os
+import stat
+
+import pydicom
+import pytest
+
+import deid
+from imaging_common.synthetic_dicom import make_instance
+
+SALT = "test-salt"
+
+
+@pytest.fixture(scope="module")
+def profile():
+    return deid.load_profile()
+
+
+def test_empty_salt_is_refused(profile):
+    with pytest.raises(ValueError, match="salt"):
+        deid.deidentify_bytes(make_instance("CT", rows=16, cols=16, seed=1), profile, "")
+
+
+def test_uids_depend_on_the_salt(profile):
+    data = make_instance("CT", rows=16, cols=16, seed=1)
+    a = pydicom.dcmread(io.BytesIO(deid.deidentify_bytes(data, profile, SALT)))
+    b = pydicom.dcmread(io.BytesIO(deid.deidentify_bytes(data, profile, "other")))
+    original = pydicom.dcmread(io.BytesIO(data))
+    assert a.StudyInstanceUID == deid.hash_uid(original.StudyInstanceUID, SALT)
+    assert a.StudyInstanceUID != b.StudyInstanceUID
+    assert a.StudyInstanceUID != deid.hash_uid(original.StudyInstanceUID)   # not the unsalted hash
+
+
+def test_load_salt_generates_once_and_keeps_it_private(tmp_path, monkeypatch):
+    monkeypatch.delenv("DEID_SALT", raising=False)
+    path = str(tmp_path / "keys" / "deid_salt")
+    salt = deid.load_salt(path)
+    assert len(salt) == 64
+    assert deid.load_salt(path) == salt
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    monkeypatch.setenv("DEID_SALT", "from-env")
+    assert deid.load_salt(path) == "from-env"
+
+
+@pytest.mark.parametrize("modality", ["CT", "US"])
+def test_streamed_file_matches_in_memory_result(tmp_path, profile, modality):
+    data = make_instance(modality, seed=3)
+    src, dst = tmp_path / "in.dcm", tmp_path / "out" / "in.dcm"
+    src.write_bytes(data)
+
+    deid.deidentify_file(str(src), str(dst), profile, SALT)
+    streamed = pydicom.dcmread(str(dst))
+    in_memory = pydicom.dcmread(io.BytesIO(deid.deidentify_bytes(data, profile, SALT)))
+
+    assert streamed.PatientIdentityRemoved == "YES"
+    assert str(streamed.PatientName) == str(in_memory.PatientName) != "DOE^JOHN"
+    for keyword in ("StudyInstanceUID", "SeriesInstanceUID", "SOPInstanceUID"):
+        assert streamed[keyword].value == in_memory[keyword].value
+    assert streamed.file_meta.MediaStorageSOPInstanceUID == streamed.SOPInstanceUID
+    assert streamed.PixelData == in_memory.PixelData == pydicom.dcmread(io.BytesIO(data)).PixelData
+
+
+def test_directory_rows_report_each_file(tmp_path, profile):
+    src = tmp_path / "src"
+    (src / "series").mkdir(parents=True)
+    (src / "series" / "a.dcm").write_bytes(make_instance("CT", rows=16, cols=16, seed=4))
+    (src / "notes.txt").write_text("not dicom")
+
+    rows = {os.path.basename(r["file"]): r for r in
+            deid.iter_deidentify_directory(str(src), str(tmp_path / "dst"), profile, SALT, workers=1)}
+
+    assert rows["a.dcm"]["status"] == "ok"
+    assert os.path.exists(tmp_path / "dst" / "series" / "a.dcm")
+    assert rows["notes.txt"]["status"].startswith("error")
@@ -0,0 +1,93 @@
+import time
+
+from orthanc_changes import LINK_METADATA_KEY, CleanedInstanceCursor
+
+
+def store_cleaned(state, original_id, link=True):
+    """Store a cleaned copy of `original_id` the way the remote cleaner does; returns its id."""
+    cleaned_id, _ = state.store(b"cleaned:" + original_id.encode())
+    if link:
+        state.set_metadata(cleaned_id, LINK_METADATA_KEY, original_id)
+    return cleaned_id
+
+
+def test_poll_advances_across_pages(orthanc):
+    server, client = orthanc
+    cursor = CleanedInstanceCursor(client, page_size=5)
+    assert cursor.since == 0
+
+    expected = {}
+    for i in range(12):
+        original_id, _ = server.state.store(f"original-{i}".encode())
+        expected[original_id] = store_cleaned(server.state, original_id)
+    total = len(server.state.changes)
+    assert total > 3 * cursor.page_size
+
+    assert cursor.poll() == expected
+    assert cursor.since == total
+    assert cursor.links == expected
+    assert cursor.poll() == {}   # nothing new after the cursor
+
+
+def test_cursor_skips_changes_before_it_was_opened(orthanc):
+    server, client = orthanc
+    old_original, _ = server.state.store(b"old")
+    store_cleaned(server.state, old_original)
+
+    cursor = CleanedInstanceCursor(client, page_size=2)
+    new_original, _ = server.state.store(b"new")
+    cleaned_id = store_cleaned(server.state, new_original)
+
+    assert cursor.poll() == {new_original: cleaned_id}
+
+
+def test_link_set_after_new_instance_is_found_on_metadata_update(orthanc):
+    server, client = orthanc
+    cursor = CleanedInstanceCursor(client)
+    original_id, _ = server.state.store(b"original")
+
+    cleaned_id = store_cleaned(server.state, original_id, link=False)   # NewInstance, no link yet
+    assert cursor.poll() == {}
+    assert original_id not in cursor.links
+
+    server.state.set_metadata(cleaned_id, LINK_METADATA_KEY, original_id)   # UpdatedMetadata
+    assert cursor.poll() == {original_id: cleaned_id}
+
+
+def test_tracked_uploads_skip_the_metadata_read(orthanc, monkeypatch):
+    server, client = orthanc
+    cursor = CleanedInstanceCursor(client)
+    original_id, _ = server.state.store(b"original")
+    cursor.track([original_id])
+
+    reads = []
+    real = client.instance_metadata
+    monkeypatch.setattr(client, "instance_metadata", lambda inst_id, key: reads.append(inst_id) or real(inst_id, key))
+    cleaned_id = store_cleaned(server.state, original_id)
+
+    assert cursor.poll() == {original_id: cleaned_id}
+    assert original_id not in reads
+
+
+def test_wait_for_returns_link_from_triggered_cleaner(orthanc):
+    server, client = orthanc
+    cursor = CleanedInstanceCursor(client)
+    original_id, _ = server.state.store(b"original")
+    server.state.run_cleaner(original_id)
+
+    found = []
+    links = cursor.wait_for([original_id], max_wait_seconds=5, poll_every=0.02,
+                            on_found=lambda o, c: found.append((o, c)))
+    assert list(links) == [original_id]
+    assert found == [(original_id, links[original_id])]
+
+
+def test_wait_for_times_out_without_cleaned_copy(orthanc):
+    server, client = orthanc
+    cursor = CleanedInstanceCursor(client)
+    original_id, _ = server.state.store(b"original")
+
+    t0 = time.monotonic()
+    assert cursor.wait_for([original_id], max_wait_seconds=0.3, poll_every=0.05) == {}
+    assert 0.3 <= time.monotonic() - t0 < 2
+
@@ -0,0 +1,89 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from imaging_common.orthanc_client import LatencyStats, OrthancClient, endpoint_label
+from imaging_common.synthetic_dicom import make_instance
+
+
+@pytest.fixture
+def flaky():
+    """A server that answers 503 to the first `failures` requests of each method."""
+    state = {"failures": 2, "seen": {}}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _answer(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            n = state["seen"][self.command] = state["seen"].get(self.command, 0) + 1
+            code = 503 if n <= state["failures"] else 200
+            self.send_response(code)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        do_GET = do_POST = _answer
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_idempotent_calls_are_retried_and_posts_are_not(flaky):
+    url, state = flaky
+    client = OrthancClient(url, retries=3, backoff=0)
+
+    assert client.get("/system").status_code == 200
+    assert client.post("/instances", data=b"x").status_code == 503
+
+    assert state["seen"] == {"GET": 3, "POST": 1}
+    assert [(r["endpoint"], r["calls"], r["errors"]) for r in client.stats.summary()] == [
+        ("GET /system", 1, 0), ("POST /instances", 1, 1)]
+
+
+def test_calls_reuse_one_pooled_connection(orthanc):
+    server, client = orthanc
+    data = make_instance("CT", rows=16, cols=16, seed=1)
+    connections = []
+    setup = server.RequestHandlerClass.setup
+
+    def counting_setup(handler):
+        connections.append(1)
+        setup(handler)
+    server.RequestHandlerClass.setup = counting_setup
+
+    instance_id = client.upload_instance(data).json()["ID"]
+    for _ in range(10):
+        assert client.instance_exists(instance_id)
+    assert client.download_instance(instance_id).content == data
+
+    assert len(connections) == 1
+
+
+@pytest.mark.parametrize("method, path, label", [
+    ("GET", "/instances/abc-123/file", "GET /instances/{id}/file"),
+    ("GET", "/instances/abc/metadata/1024?expand", "GET /instances/{id}/metadata/{key}"),
+    ("POST", "/instances", "POST /instances"),
+    ("GET", "/changes?since=10&limit=100", "GET /changes"),
+    ("POST", "/tools/execute-script", "POST /tools/execute-script"),
+])
+def test_endpoint_label(method, path, label):
+    assert endpoint_label(method, path) == label
+
+
+def test_latency_stats_keep_a_rolling_window():
+    stats = LatencyStats(window=10)
+    for i in range(20):
+        stats.record("GET /x", i / 1000, ok=i % 5 != 0)
+
+    [row] = stats.summary()
+
+    assert (row["calls"], row["errors"]) == (20, 4)
+    assert (row["p50_ms"], row["max_ms"]) == (14.0, 19.0)   # only the last 10 samples (10..19 ms)
@@ -0,0 +1,85 @@
+import io
+
+import numpy as np
+import pydicom
+
+from imaging_common.synthetic_dicom import make_instance
+from pixel_diff import changed_regions, diff_frame, diff_instance, diff_series, draw_regions, summarize
+
+
+def burn_in(data, box, value=0, frames=None):
+    """Copy of `data` with `box` (row0, col0, row1, col1, inclusive) set to `value` in the given frames."""
+    ds = pydicom.dcmread(io.BytesIO(data))
+    arr = ds.pixel_array.copy()
+    r0, c0, r1, c1 = box
+    if arr.ndim == 2:
+        arr[r0:r1 + 1, c0:c1 + 1] = value
+    else:
+        arr[frames if frames is not None else slice(None), r0:r1 + 1, c0:c1 + 1] = value
+    ds.PixelData = arr.tobytes()
+    out = io.BytesIO()
+    ds.save_as(out)
+    return out.getvalue()
+
+
+def test_regions_merge_nearby_changes_and_check_masking():
+    rng = np.random.default_rng(0)
+    original = rng.integers(100, 200, (64, 64)).astype(np.uint16)
+    cleaned = original.copy()
+    cleaned[2:6, 3:10] = 0          # two glyphs 3 px apart are one region; the gap between
+    cleaned[2:6, 13:20] = 0         # them still shows the image, so it is not masked
+    cleaned[20:24, 50:60] += 7      # a small change, below threshold 7
+    cleaned[40:50, 40:50] = 0       # a solid mask
+
+    row = diff_frame(original, cleaned)
+
+    assert row["regions"] == [(2, 3, 5, 19), (20, 50, 23, 59), (40, 40, 49, 49)]
+    assert (row["n_regions"], row["masked_regions"]) == (3, 1)
+    assert row["changed_pct"] == round(100 * (56 + 40 + 100) / 64 ** 2, 3)
+    assert row["max_abs_diff"] == int(max(original[2:6, 3:20].max(), original[40:50, 40:50].max()))
+    assert diff_frame(original, cleaned, threshold=7)["regions"] == [(2, 3, 5, 19), (40, 40, 49, 49)]
+    assert changed_regions(np.zeros((10, 10), bool)) == []
+    assert not diff_frame(original, original[:32])["aligned"]
+
+
+def test_multi_frame_instance_is_diffed_per_frame():
+    original = make_instance("XA", rows=64, cols=64, frames=4, seed=1)
+    cleaned = burn_in(original, (0, 0, 7, 31), frames=[1, 3])
+
+    rows = diff_instance(original, cleaned, workers=2)
+
+    assert [r["frame"] for r in rows] == [0, 1, 2, 3]
+    assert [r["regions"] for r in rows] == [[], [(0, 0, 7, 31)], [], [(0, 0, 7, 31)]]
+    assert diff_instance(original, make_instance("XA", rows=64, cols=64, frames=3, seed=1))[0]["aligned"] is False
+
+
+def test_series_summary_and_failed_loads():
+    ct = make_instance("CT", rows=64, cols=64, seed=2)
+
+    def gone():
+        raise IOError("cleaned copy not found")
+
+    pairs = [
+        ("masked.dcm", ct, burn_in(ct, (0, 0, 9, 63), value=-2000)),   # below any CT value
+        ("untouched.dcm", lambda: ct, lambda: ct),
+        ("missing.dcm", ct, gone),
+    ]
+
+    rows, summary = diff_series(pairs, workers=2)
+
+    assert [r["instance"] for r in rows] == ["masked.dcm", "untouched.dcm", "missing.dcm"]
+    assert rows[2]["error"] == "cleaned copy not found"
+    assert summary == summarize(rows) == {
+        "frames": 3, "misaligned_frames": 1, "frames_changed": 1, "mean_redacted_pct": round(15.625 / 2, 3),
+        "max_redacted_pct": 15.625, "regions": 1, "masked_regions": 1, "unmasked_regions": 0,
+    }
+
+
+def test_draw_regions_scales_boxes_onto_the_preview():
+    image = np.zeros((32, 32), np.uint8)
+
+    out = draw_regions(image, [(0, 0, 63, 31)], full_shape=(64, 64))
+
+    assert out.shape == (32, 32, 3)
+    assert (out[0, 0:16] == (255, 0, 0)).all() and (out[0:32, 15] == (255, 0, 0)).all()
+    assert (out[5, 20] == 0).all()
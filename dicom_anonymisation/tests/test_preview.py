@@ -0,0 +1,72 @@
+import io
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pydicom
+import pytest
+
+from imaging_common.synthetic_dicom import make_instance
+from preview import PreviewService, content_hash, decode_frame, window_frame
+
+
+def test_content_hash_is_the_same_for_bytes_and_spooled_files():
+    data = make_instance("CT", rows=32, cols=32, seed=1)
+    with tempfile.SpooledTemporaryFile(max_size=16) as f:
+        f.write(data)
+        assert content_hash(f) == content_hash(data)
+
+
+def test_decode_frame_returns_one_frame_of_the_volume():
+    data = make_instance("XA", rows=32, cols=48, frames=5, seed=2)
+    volume = pydicom.dcmread(io.BytesIO(data)).pixel_array
+
+    assert np.array_equal(decode_frame(data, 3, 5), volume[3])
+
+
+@pytest.mark.parametrize("header, expected", [
+    (SimpleNamespace(WindowCenter=100, WindowWidth=200), [0, 0, 127, 255, 255]),
+    (SimpleNamespace(WindowCenter=[100, 500], WindowWidth=[200, 1000]), [0, 0, 127, 255, 255]),  # first pair
+    (SimpleNamespace(RescaleSlope=2, RescaleIntercept=-100, WindowCenter=200, WindowWidth=400),
+     [0, 0, 63, 191, 255]),   # -300, -100, 100, 300, 500 after rescale
+    (SimpleNamespace(), [0, 63, 127, 191, 255]),   # no VOI window: min/max
+    (SimpleNamespace(PhotometricInterpretation="MONOCHROME1"), [255, 191, 127, 63, 0]),
+])
+def test_window_frame(header, expected):
+    frame = np.array([[-100, 0, 100, 200, 300]], dtype=np.int16)
+
+    assert window_frame(frame, header).tolist() == [expected]
+
+
+def test_window_frame_downsamples_before_display():
+    frame = np.arange(1000 * 600, dtype=np.uint16).reshape(1000, 600)
+
+    assert window_frame(frame, SimpleNamespace(), max_size=250).shape == (250, 150)
+    rgb = np.full((40, 40, 3), 1000, np.uint16)
+    assert window_frame(rgb, SimpleNamespace()).dtype == np.uint8
+
+
+def test_preview_service_caches_by_content_and_clamps_frames():
+    service = PreviewService(max_headers=2, max_frames=2)
+    data = make_instance("XA", rows=32, cols=32, frames=4, seed=3)
+    digest = content_hash(data)
+
+    assert service.n_frames(data) == 4 and service.has_pixels(data)
+    middle = service.render(data)
+    assert service.render(data) is middle                       # cached
+    assert np.array_equal(service.render(data, frame=2), middle)
+    assert service.render(data, frame=99).shape == middle.shape  # clamped to the last frame
+    assert len(service._frames) == 2                            # LRU-bounded
+
+    service.forget(digest)
+    assert not service._frames and digest not in service._headers
+    assert service.render(data) is not middle
+
+
+def test_header_only_files_have_no_pixels():
+    ds = pydicom.dcmread(io.BytesIO(make_instance("CT", rows=16, cols=16, seed=4)))
+    del ds.PixelData
+    out = io.BytesIO()
+    ds.save_as(out)
+
+    assert not PreviewService().has_pixels(out.getvalue())
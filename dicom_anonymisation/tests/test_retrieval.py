@@ -0,0 +1,42 @@
+import io
+
+import pydicom
+import pytest
+
+from imaging_common.synthetic_dicom import make_instance
+from pixel_diff import working_set_bytes
+from retrieval import MemoryBudget, MemoryBudgetExceeded, check_session_cap
+
+
+def test_session_running_total_is_capped():
+    budget = MemoryBudget(total_bytes=1000, session_bytes=300)
+    first = budget.acquire(200, session="a")
+    with pytest.raises(MemoryBudgetExceeded, match="on top of"):
+        budget.acquire(200, session="a")           # 400 > 300 for this session
+    other = budget.acquire(200, session="b")       # other sessions have their own total
+    assert budget.session_in_use("a") == 200 and budget.in_use == 400
+
+    budget.release(first, session="a")
+    assert budget.session_in_use("a") == 0 and "a" not in budget.by_session
+    budget.release(budget.acquire(300, session="a"), session="a")
+    budget.release(other, session="b")
+    assert budget.in_use == 0 and budget.by_session == {}
+
+
+def test_server_budget_times_out_when_full():
+    budget = MemoryBudget(total_bytes=100, session_bytes=100)
+    budget.acquire(80, session="a")
+    with pytest.raises(MemoryBudgetExceeded, match="busy"):
+        budget.acquire(50, timeout=0.05, session="b")
+
+
+def test_check_session_cap_counts_bytes_already_held():
+    check_session_cap(100, cap=100)
+    with pytest.raises(MemoryBudgetExceeded):
+        check_session_cap(60, cap=100, in_use=50)
+
+
+def test_working_set_covers_both_decoded_frames():
+    header = pydicom.dcmread(io.BytesIO(make_instance("CT", rows=64, cols=32, seed=1)), stop_before_pixels=True)
+    frame = 64 * 32 * (header.BitsAllocated // 8) * int(getattr(header, "SamplesPerPixel", 1))
+    assert working_set_bytes(header) >= 2 * frame
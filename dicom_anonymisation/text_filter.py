@@ -0,0 +1,114 @@
+"""
+Cheap CPU pre-filter for burned-in text.
+
+Most CT/MR slices carry no burned-in annotations, so sending every frame to the
+remote PaddleOCR cleaner wastes GPU time. Each frame is windowed and downsampled
+(see preview.window_frame), cut into TILE x TILE tiles, and tiles in the border
+bands where scanners burn in labels are scored as text-like when they combine
+dense strong edges in both directions with a small, high-contrast foreground. Frames whose score
+stays below the threshold can skip OCR and get header-only cleaning instead.
+"""
+import os
+
+import numpy as np
+import pydicom
+
+from preview import decode_frame, open_source, window_frame
+
+TILE = 8
+BORDER = 0.18              # fraction of height/width treated as annotation bands
+EDGE_DELTA = 60            # uint8 step that counts as a strong edge
+TILE_CONTRAST = 100        # min (max - min) inside a text tile
+EDGE_MIN = (0.14, 0.08)    # edge share in the dominant / other direction: glyph strokes run both
+EDGE_MAX = 0.75            # ways, while an anatomical boundary fills at most one line of a tile
+FG_FRAC = (0.04, 0.65)     # share of glyph pixels (near the tile's extreme) in a text tile
+SCORE_THRESHOLD = 0.004    # share of border tiles that must look like text
+SCORE_SIZE = 512           # frames are scored at this display size
+MAX_SAMPLED_FRAMES = 5
+GPU_SECONDS_PER_FRAME = float(os.environ.get("OCR_GPU_SECONDS_PER_FRAME", "1.5"))
+
+
+def _border_tiles(th, tw):
+    rows = np.zeros((th, 1), dtype=bool)
+    cols = np.zeros((1, tw), dtype=bool)
+    br, bc = max(1, int(round(th * BORDER))), max(1, int(round(tw * BORDER)))
+    rows[:br] = rows[-br:] = True
+    cols[:, :bc] = cols[:, -bc:] = True
+    return rows | cols
+
+
+def text_tiles(img):
+    """Boolean (tiles_h, tiles_w) grid of text-like tiles for a uint8 image."""
+    if img.ndim == 3:
+        img = img.max(axis=-1)
+    h, w = (img.shape[0] // TILE) * TILE, (img.shape[1] // TILE) * TILE
+    img = img[:h, :w].astype(np.int16)
+
+    edges_x = np.zeros((h, w), dtype=bool)
+    edges_y = np.zeros((h, w), dtype=bool)
+    edges_x[:, 1:] = np.abs(np.diff(img, axis=1)) > EDGE_DELTA
+    edges_y[1:, :] = np.abs(np.diff(img, axis=0)) > EDGE_DELTA
+
+    th, tw = h // TILE, w // TILE
+    tiles = img.reshape(th, TILE, tw, TILE).transpose(0, 2, 1, 3).reshape(th, tw, TILE * TILE)
+    tmax, tmin = tiles.max(axis=-1), tiles.min(axis=-1)
+    contrast = tmax - tmin
+    ex = edges_x.reshape(th, TILE, tw, TILE).mean(axis=(1, 3))
+    ey = edges_y.reshape(th, TILE, tw, TILE).mean(axis=(1, 3))
+    ex, ey = np.maximum(ex, ey), np.minimum(ex, ey)   # orientation-free
+    # glyphs are the bright (or, on light backgrounds, dark) extreme of the tile
+    bright = (tiles >= (tmax - contrast // 4)[..., None]).mean(axis=-1)
+    dark = (tiles <= (tmin + contrast // 4)[..., None]).mean(axis=-1)
+    fg = np.minimum(bright, dark)
+
+    return (
+        (contrast >= TILE_CONTRAST)
+        & (ex >= EDGE_MIN[0]) & (ey >= EDGE_MIN[1]) & (ex + ey <= 2 * EDGE_MAX)
+        & (fg >= FG_FRAC[0]) & (fg <= FG_FRAC[1])
+    )
+
+
+def text_score(img):
+    """Share of border tiles that look like burned-in text (0..1)."""
+    tiles = text_tiles(img)
+    if tiles.size == 0:
+        return 0.0
+    border = _border_tiles(*tiles.shape)
+    return float(np.count_nonzero(tiles & border)) / max(1, int(np.count_nonzero(border)))
+
+
+def sampled_frames(n_frames, k=MAX_SAMPLED_FRAMES):
+    """First, last and evenly spaced frames: burned-in labels repeat across a cine/volume."""
+    if n_frames <= k:
+        return list(range(n_frames))
+    return sorted({int(round(i * (n_frames - 1) / (k - 1))) for i in range(k)})
+
+
+def score_instance(src, threshold=SCORE_THRESHOLD):
+    """
+    Score a DICOM (bytes or file object). Returns a dict with the max frame score,
+    the frames sampled, and whether the instance needs OCR.
+    """
+    hdr = pydicom.dcmread(open_source(src), stop_before_pixels=True)
+    n_frames = int(getattr(hdr, "NumberOfFrames", 1) or 1)
+    frames = sampled_frames(n_frames)
+    score = 0.0
+    for i in frames:
+        score = max(score, text_score(window_frame(decode_frame(src, i, n_frames), hdr, SCORE_SIZE)))
+        if score >= threshold:
+            break
+    return {"text_score": round(score, 4), "frames": n_frames, "sampled": len(frames),
+            "needs_ocr": score >= threshold}
+
+
+def skip_report(results, gpu_seconds_per_frame=GPU_SECONDS_PER_FRAME):
+    """Skip rate and estimated GPU time saved for a list of score_instance() results."""
+    skipped = [r for r in results if not r["needs_ocr"]]
+    frames_skipped = sum(r["frames"] for r in skipped)
+    return {
+        "instances": len(results),
+        "skipped": len(skipped),
+        "skip_rate_pct": round(100.0 * len(skipped) / len(results), 1) if results else 0.0,
+        "frames_skipped": frames_skipped,
+        "gpu_seconds_saved": round(frames_skipped * gpu_seconds_per_frame, 1),
+    }
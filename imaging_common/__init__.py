@@ -0,0 +1 @@
+"""Helpers shared by the imaging Streamlit apps (dicom_anonymisation, pacs_find_patient)."""
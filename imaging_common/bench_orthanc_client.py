@@ -0,0 +1,69 @@
+"""
+Request-rate benchmark: bare requests.get vs the pooled OrthancClient.
+
+Runs against the local Orthanc stand-in (or any server given with --url) and
+reports requests/second for sequential and threaded workloads. Use --tls-delay
+to add a per-connection handshake cost to the stand-in, which is what the
+pooled session saves on the remote RunPod proxy.
+
+    python imaging_common/bench_orthanc_client.py --requests 500 --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from imaging_common.mock_orthanc import serve
+from imaging_common.orthanc_client import OrthancClient
+
+PATH = "/changes?last"
+
+
+def bare_get(url):
+    requests.get(f"{url}{PATH}", timeout=10).raise_for_status()
+
+
+def run(label, fn, n, workers):
+    t0 = time.perf_counter()
+    if workers <= 1:
+        for _ in range(n):
+            fn()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda _: fn(), range(n)))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {n:>6} req  {elapsed:7.2f}s  {n / elapsed:9.1f} req/s")
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Benchmark an existing server instead of the local stand-in.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tls-delay", type=float, default=0.0,
+                        help="Seconds added to each new connection on the stand-in to mimic a TLS handshake.")
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        server, url = serve(connect_delay=args.tls_delay)
+
+    client = OrthancClient(url, pool_size=max(args.workers, 1))
+    print(f"Target {url}")
+    for workers in (1, args.workers):
+        bare = run(f"bare requests.get  (workers={workers})", lambda: bare_get(url), args.requests, workers)
+        pooled = run(f"pooled client      (workers={workers})", lambda: client.get(PATH).raise_for_status(),
+                     args.requests, workers)
+        print(f"{'speed-up':<34} {pooled / bare:.2f}x\n")
+
+    for row in client.latency_summary():
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Local Orthanc stand-in for the imaging apps and their benchmarks.
+
+Implements the subset of the Orthanc REST API the apps rely on: uploads, file
+download, instance metadata, the /changes feed, study-level /tools/find and
+/tools/execute-script. A triggered "cleaner" runs after a configurable delay,
+stores a cleaned copy and links it back with Metadata[1000] = <original_id>,
+just like /scripts/clean_dicom_image_gpu.py does on the real node.
+
+    python imaging_common/mock_orthanc.py --port 8042 --cleaner-delay 2
+    ORTHANC_URL=http://127.0.0.1:8042 streamlit run dicom_anonymisation/app.py
+    PACS_ORTHANC_URL=http://127.0.0.1:8042 streamlit run pacs_find_patient/app.py
+"""
+import argparse
+import fnmatch
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CLEANER_SCRIPT_RE = re.compile(r"clean_dicom_image_gpu\.py\s+([0-9a-f-]+)")
+
+
+def orthanc_id(seed):
+    """Orthanc-style identifier: a SHA-1 split into five dash-separated groups."""
+    h = hashlib.sha1(seed).hexdigest()
+    return "-".join(h[i:i + 8] for i in range(0, 40, 8))
+
+
+def simulate_clean(dicom_bytes):
+    """Blank PatientName and the top band of pixels, falling back to a plain copy."""
+    try:
+        import numpy as np
+        import pydicom
+
+        ds = pydicom.dcmread(io.BytesIO(dicom_bytes))
+        ds.PatientName = "ANONYMIZED"
+        if "PixelData" in ds and not ds.file_meta.TransferSyntaxUID.is_compressed:
+            arr = ds.pixel_array.copy()
+            band = max(1, int(ds.Rows) // 10)
+            if int(getattr(ds, "NumberOfFrames", 1) or 1) > 1:
+                arr[:, :band] = 0
+            else:
+                arr[:band] = 0
+            ds.PixelData = np.ascontiguousarray(arr).tobytes()
+        out = io.BytesIO()
+        ds.save_as(out)
+        return out.getvalue()
+    except Exception:
+        return dicom_bytes
+
+
+def study_tags(dicom_bytes):
+    """Study-level tags used by /tools/find; empty when the header can't be read."""
+    try:
+        import pydicom
+
+        ds = pydicom.dcmread(io.BytesIO(dicom_bytes), stop_before_pixels=True)
+    except Exception:
+        return {}
+    return {
+        "PatientID": str(ds.get("PatientID", "")),
+        "PatientName": str(ds.get("PatientName", "")),
+        "StudyInstanceUID": str(ds.get("StudyInstanceUID", "")),
+        "StudyDate": str(ds.get("StudyDate", "")),
+        "StudyDescription": str(ds.get("StudyDescription", "")),
+        "AccessionNumber": str(ds.get("AccessionNumber", "")),
+        "Modality": str(ds.get("Modality", "")),
+    }
+
+
+def _matches(value, constraint):
+    """Orthanc-style match: exact, '*'/'?' wildcards, 'A-B' date ranges or backslash lists."""
+    if not constraint or constraint == "*":
+        return True
+    if "\\" in constraint:
+        return any(_matches(value, c) for c in constraint.split("\\"))
+    if "-" in constraint and (constraint.replace("-", "") or "0").isdigit():
+        lo, hi = constraint.split("-", 1)
+        return (not lo or value >= lo) and (not hi or value <= hi)
+    if "*" in constraint or "?" in constraint:
+        return fnmatch.fnmatchcase(value, constraint)
+    return value == constraint
+
+
+class MockOrthancState:
+    def __init__(self, cleaner_delay=1.0, connect_delay=0.0):
+        self.lock = threading.Lock()
+        self.cleaner_delay = cleaner_delay
+        self.connect_delay = connect_delay   # per new connection, stands in for a TLS handshake
+        self.instances = {}   # instance id -> bytes
+        self.metadata = {}    # instance id -> {key: value}
+        self.changes = []     # Orthanc change log, Seq == index + 1
+        self.studies = {}     # study id -> {"tags": {...}, "modalities": set, "instances": [...]}
+
+    def _log_change(self, change_type, inst_id):
+        self.changes.append({
+            "ChangeType": change_type,
+            "Date": time.strftime("%Y%m%dT%H%M%S"),
+            "ID": inst_id,
+            "Path": f"/instances/{inst_id}",
+            "ResourceType": "Instance",
+            "Seq": len(self.changes) + 1,
+        })
+
+    def store(self, data, seed=None):
+        inst_id = orthanc_id(seed or data)
+        with self.lock:
+            if inst_id in self.instances:
+                return inst_id, "AlreadyStored"
+            self.instances[inst_id] = data
+            self.metadata[inst_id] = {}
+            self._log_change("NewInstance", inst_id)
+            tags = study_tags(data)
+            if tags.get("StudyInstanceUID"):
+                study = self.studies.setdefault(
+                    orthanc_id(tags["StudyInstanceUID"].encode()),
+                    {"tags": tags, "modalities": set(), "instances": []},
+                )
+                study["modalities"].add(tags["Modality"])
+                study["instances"].append(inst_id)
+        return inst_id, "Success"
+
+    def find_studies(self, query, limit=0):
+        modality_filter = query.get("ModalitiesInStudy")
+        out = []
+        with self.lock:
+            for study_id, study in self.studies.items():
+                tags = study["tags"]
+                if not all(_matches(tags.get(k, ""), v) for k, v in query.items() if k != "ModalitiesInStudy"):
+                    continue
+                if modality_filter and not any(_matches(m, modality_filter) for m in study["modalities"]):
+                    continue
+                out.append({
+                    "ID": study_id,
+                    "Type": "Study",
+                    "MainDicomTags": {k: tags[k] for k in ("StudyInstanceUID", "StudyDate", "StudyDescription", "AccessionNumber")},
+                    "PatientMainDicomTags": {k: tags[k] for k in ("PatientID", "PatientName")},
+                    "RequestedTags": {"ModalitiesInStudy": "\\".join(sorted(study["modalities"]))},
+                })
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def set_metadata(self, inst_id, key, value):
+        with self.lock:
+            self.metadata[inst_id][key] = value
+            self._log_change("UpdatedMetadata", inst_id)
+
+    def changes_since(self, since, limit):
+        with self.lock:
+            batch = self.changes[since:since + limit]
+            done = since + len(batch) >= len(self.changes)
+            last = batch[-1]["Seq"] if batch else len(self.changes)
+        return {"Changes": batch, "Done": done, "Last": last}
+
+    def last_change(self):
+        with self.lock:
+            batch = self.changes[-1:]
+        return {"Changes": batch, "Done": True, "Last": batch[-1]["Seq"] if batch else 0}
+
+    def run_cleaner(self, original_id):
+        def _clean():
+            data = self.instances.get(original_id)
+            if data is None:
+                return
+            cleaned_id, _ = self.store(simulate_clean(data), seed=b"cleaned:" + original_id.encode())
+            self.set_metadata(cleaned_id, "1000", original_id)
+
+        threading.Timer(self.cleaner_delay, _clean).start()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # headers and body go out in separate writes
+
+        def setup(self):
+            super().setup()
+            if state.connect_delay:
+                time.sleep(state.connect_delay)
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body=b"", content_type="application/json"):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            query = parse_qs(url.query, keep_blank_values=True)
+
+            if parts == ["changes"]:
+                if "last" in query:
+                    return self._send(200, state.last_change())
+                since = int(query.get("since", ["0"])[0])
+                limit = int(query.get("limit", ["100"])[0])
+                return self._send(200, state.changes_since(since, limit))
+            if parts == ["instances"]:
+                return self._send(200, list(state.instances))
+            if len(parts) >= 2 and parts[0] == "instances" and parts[1] in state.instances:
+                inst_id = parts[1]
+                if len(parts) == 2:
+                    return self._send(200, {"ID": inst_id, "Type": "Instance",
+                                            "FileSize": len(state.instances[inst_id])})
+                if parts[2:] == ["file"]:
+                    return self._send(200, state.instances[inst_id], "application/dicom")
+                if parts[2:] == ["metadata"]:
+                    return self._send(200, list(state.metadata[inst_id]))
+                if len(parts) == 4 and parts[2] == "metadata":
+                    value = state.metadata[inst_id].get(parts[3])
+                    if value is None:
+                        return self._send(404, {"Message": "Unknown metadata"})
+                    return self._send(200, value.encode(), "text/plain")
+            return self._send(404, {"Message": "Unknown resource"})
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == "/instances":
+                inst_id, status = state.store(body)
+                return self._send(200, {"ID": inst_id, "Path": f"/instances/{inst_id}", "Status": status})
+            if self.path == "/tools/find":
+                req = json.loads(body or b"{}")
+                if req.get("Level") != "Study":
+                    return self._send(400, {"Message": "Only Level=Study is supported by the stand-in"})
+                studies = state.find_studies(req.get("Query", {}), int(req.get("Limit") or 0))
+                return self._send(200, studies if req.get("Expand") else [s["ID"] for s in studies])
+            if self.path == "/tools/execute-script":
+                m = CLEANER_SCRIPT_RE.search(body.decode(errors="replace"))
+                if m:
+                    state.run_cleaner(m.group(1))
+                return self._send(200, b"", "text/plain")
+            return self._send(404, {"Message": "Unknown resource"})
+
+        def do_PUT(self):
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+            if len(parts) == 4 and parts[0] == "instances" and parts[2] == "metadata" and parts[1] in state.instances:
+                state.set_metadata(parts[1], parts[3], self._body().decode())
+                return self._send(200, b"", "text/plain")
+            return self._send(404, {"Message": "Unknown resource"})
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=0, cleaner_delay=1.0, connect_delay=0.0):
+    """Start the stand-in on a background thread; returns (server, base_url)."""
+    state = MockOrthancState(cleaner_delay=cleaner_delay, connect_delay=connect_delay)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Orthanc stand-in for the DICOM cleaner.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8042)
+    parser.add_argument("--cleaner-delay", type=float, default=1.0, help="Seconds before the simulated cleaner stores its output.")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Seconds added to each new connection (simulated TLS handshake).")
+    args = parser.parse_args()
+
+    server, url = serve(args.host, args.port, args.cleaner_delay, args.connect_delay)
+    print(f"Mock Orthanc listening on {url} (cleaner delay {args.cleaner_delay}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,205 @@
+"""
+Local DICOMweb QIDO-RS stand-in for the federated query and its benchmarks.
+
+Serves GET /studies (also under /dicom-web/studies) from an in-memory list of
+study records in application/dicom+json. Matching keys may be given by keyword
+or tag and follow the Orthanc stand-in's rules (exact, wildcards, date ranges,
+backslash lists); limit/offset page the result (capped at max_page like a
+real archive's page limit), includefield is accepted and ignored (every stored
+attribute is returned), and an empty match is 204.
+
+    python imaging_common/mock_qido.py --port 8043 --studies 5000
+    PACS_QIDO_URL=http://127.0.0.1:8043 streamlit run pacs_find_patient/app.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from imaging_common.mock_orthanc import _matches
+
+# keyword -> (tag, VR) for the study-level attributes the stand-in stores
+ATTRIBUTES = {
+    "StudyDate": ("00080020", "DA"),
+    "AccessionNumber": ("00080050", "SH"),
+    "ModalitiesInStudy": ("00080061", "CS"),
+    "StudyDescription": ("00081030", "LO"),
+    "PatientName": ("00100010", "PN"),
+    "PatientID": ("00100020", "LO"),
+    "StudyInstanceUID": ("0020000D", "UI"),
+}
+TAGS = {tag: keyword for keyword, (tag, _) in ATTRIBUTES.items()}
+PAGING_PARAMS = {"limit", "offset", "includefield", "fuzzymatching"}
+
+DEMO_STUDIES = [
+    ("123", "20250925", "CT", "CT Chest"),
+    ("123", "20250311", "MR", "MRI Brain w/o contrast"),
+    ("123", "20241102", "CR", "XR Chest 2 views"),
+    ("456", "20250816", "MR", "MRI Brain"),
+    ("456", "20250503", "US", "US Abdomen"),
+]
+
+
+def study_record(patient_id, study_date, modalities, description, study_uid=None, accession=""):
+    """One study in application/dicom+json."""
+    values = {
+        "PatientID": patient_id,
+        "PatientName": {"Alphabetic": f"PATIENT^{patient_id}"},
+        "StudyDate": study_date,
+        "ModalitiesInStudy": modalities.split("\\"),
+        "StudyDescription": description,
+        "StudyInstanceUID": study_uid or f"1.2.826.0.1.3680043.10.543.{patient_id}.{study_date}.{zlib.crc32(description.encode())}",
+        "AccessionNumber": accession,
+    }
+    out = {}
+    for keyword, value in values.items():
+        tag, vr = ATTRIBUTES[keyword]
+        out[tag] = {"vr": vr, "Value": value if isinstance(value, list) else [value]}
+    return out
+
+
+def random_studies(n, patients=10_000, seed=7):
+    rng = random.Random(seed)
+    studies = []
+    for i in range(n):
+        modality = rng.choice(["CT", "MR", "CR", "US", "MG", "XA"])
+        day = date(2015, 1, 1) + timedelta(days=rng.randrange(3650))
+        studies.append(study_record(str(rng.randrange(patients)), day.strftime("%Y%m%d"), modality,
+                                    f"{modality} {rng.choice(['Chest', 'Abdomen', 'Brain', 'Spine', 'Knee'])}",
+                                    study_uid=f"1.2.826.0.1.3680043.10.543.{seed}.{i}"))
+    return studies
+
+
+def _text(attr):
+    """Every value of a DICOM JSON attribute as text (PN uses its Alphabetic form)."""
+    return [v.get("Alphabetic", "") if isinstance(v, dict) else str(v) for v in attr.get("Value", [])]
+
+
+class MockQidoState:
+    def __init__(self, studies=(), latency=0.0, connect_delay=0.0, max_page=0):
+        self.lock = threading.Lock()
+        self.studies = []
+        self.by_patient = {}   # exact PatientID -> studies, so patient lookups skip the full scan
+        for record in studies:
+            self._add(record)
+        self.latency = latency               # per request, stands in for archive search time
+        self.connect_delay = connect_delay   # per new connection, stands in for a TLS handshake
+        self.max_page = max_page             # server-side page cap; 0 = honour any limit
+        self.requests = 0
+
+    def _add(self, record):
+        self.studies.append(record)
+        for pid in _text(record.get("00100020", {})):
+            self.by_patient.setdefault(pid, []).append(record)
+
+    def add(self, record):
+        with self.lock:
+            self._add(record)
+
+    def search(self, filters, limit=0, offset=0):
+        """(page, total matches); filters are tag -> constraint."""
+        with self.lock:
+            self.requests += 1
+            pid = filters.get("00100020", "")
+            candidates = self.studies if not pid or any(c in pid for c in "*?\\") else self.by_patient.get(pid, [])
+            matched = [s for s in candidates
+                       if all(any(_matches(v, c) for v in _text(s.get(tag, {})) or [""])
+                              for tag, c in filters.items())]
+        if self.max_page:
+            limit = min(limit or self.max_page, self.max_page)
+        page = matched[offset:offset + limit] if limit else matched[offset:]
+        return page, len(matched)
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            if state.connect_delay:
+                time.sleep(state.connect_delay)
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, body=b"", content_type="application/dicom+json", headers=()):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in headers:
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            if parts not in (["studies"], ["dicom-web", "studies"]):
+                return self._send(404, {"Message": "Unknown resource"}, "application/json")
+            filters, limit, offset = {}, 0, 0
+            for key, value in parse_qsl(url.query, keep_blank_values=True):
+                if key == "limit":
+                    limit = int(value)
+                elif key == "offset":
+                    offset = int(value)
+                elif key in PAGING_PARAMS:
+                    continue
+                else:
+                    tag = ATTRIBUTES[key][0] if key in ATTRIBUTES else key.replace(",", "").upper()
+                    if tag not in TAGS:
+                        return self._send(400, {"Message": f"Unsupported matching key {key}"}, "application/json")
+                    filters[tag] = value
+            if state.latency:
+                time.sleep(state.latency)
+            page, total = state.search(filters, limit, offset)
+            if not page:
+                return self._send(204, b"")
+            headers = [("Warning", '299 mock-qido: "There are additional results that can be requested"')] \
+                if offset + len(page) < total else []
+            return self._send(200, page, headers=headers)
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=0, studies=None, latency=0.0, connect_delay=0.0, max_page=0):
+    """Start the stand-in on a background thread; returns (server, base_url). Defaults to the demo studies."""
+    if studies is None:
+        studies = [study_record(*s) for s in DEMO_STUDIES]
+    state = MockQidoState(studies, latency=latency, connect_delay=connect_delay, max_page=max_page)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local DICOMweb QIDO-RS stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8043)
+    parser.add_argument("--studies", type=int, default=0, help="Random studies to add to the demo set.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each search.")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="Seconds added to each new connection (simulated TLS handshake).")
+    parser.add_argument("--max-page", type=int, default=0, help="Cap every page at this many studies, whatever the limit.")
+    args = parser.parse_args()
+
+    studies = [study_record(*s) for s in DEMO_STUDIES] + random_studies(args.studies)
+    server, url = serve(args.host, args.port, studies, args.latency, args.connect_delay, args.max_page)
+    print(f"Mock QIDO-RS listening on {url} ({len(studies)} studies)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,165 @@
+"""
+Shared Orthanc REST client for the imaging apps.
+
+One pooled keep-alive requests.Session per base URL, so repeated calls reuse
+TCP/TLS connections instead of handshaking on every request. Idempotent calls
+are retried with exponential backoff on connection errors and 429/5xx, every
+call gets a (connect, read) timeout, and per-endpoint latency is recorded for
+display in the apps.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (3.05, 30)    # (connect, read) seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class LatencyStats:
+    """Rolling per-endpoint latency samples (seconds) and error counts."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = {}   # endpoint -> deque of seconds
+        self._calls = {}     # endpoint -> total calls
+        self._errors = {}    # endpoint -> failed calls
+
+    def record(self, endpoint, seconds, ok=True):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self._window)).append(seconds)
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            rows = []
+            for endpoint, samples in self._samples.items():
+                ordered = sorted(samples)
+                rows.append({
+                    "endpoint": endpoint,
+                    "calls": self._calls[endpoint],
+                    "errors": self._errors.get(endpoint, 0),
+                    "p50_ms": round(_percentile(ordered, 50) * 1000, 1),
+                    "p95_ms": round(_percentile(ordered, 95) * 1000, 1),
+                    "max_ms": round(ordered[-1] * 1000, 1),
+                })
+        return sorted(rows, key=lambda r: r["endpoint"])
+
+
+def endpoint_label(method, path):
+    """Collapse resource IDs so /instances/<id>/file is tracked as one endpoint."""
+    parts = [p for p in path.split("?")[0].split("/") if p]
+    if len(parts) >= 2 and parts[0] in ("instances", "series", "studies", "patients"):
+        parts[1] = "{id}"
+    if len(parts) >= 4 and parts[2] == "metadata":
+        parts[3] = "{key}"
+    return f"{method} /" + "/".join(parts)
+
+
+class OrthancClient:
+    def __init__(self, base_url, auth=None, verify=False, timeout=DEFAULT_TIMEOUT,
+                 retries=3, backoff=0.3, pool_size=16):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.stats = LatencyStats()
+
+        # POST is left out of allowed_methods: uploads and script triggers are
+        # only retried when the connection itself failed, never after a response.
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.auth = auth
+        self.session.verify = verify
+
+    def request(self, method, path, timeout=None, **kwargs):
+        label = endpoint_label(method, path)
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.request(
+                method, f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs
+            )
+        except requests.RequestException:
+            self.stats.record(label, time.perf_counter() - t0, ok=False)
+            raise
+        self.stats.record(label, time.perf_counter() - t0, ok=resp.status_code < 500)
+        return resp
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    # ---------- Orthanc endpoints used by the apps ----------
+    def upload_instance(self, dicom_bytes, timeout=None):
+        return self.post("/instances", data=dicom_bytes,
+                         headers={"Content-Type": "application/dicom"}, timeout=timeout)
+
+    def execute_script(self, lua_code, timeout=10):
+        return self.post("/tools/execute-script", data=lua_code,
+                         headers={"Content-Type": "text/plain"}, timeout=timeout)
+
+    def instance_exists(self, instance_id):
+        """False once Orthanc no longer stores the instance (deleted or recycled)."""
+        return self.get(f"/instances/{instance_id}").status_code == 200
+
+    def download_instance(self, instance_id, timeout=None, stream=False):
+        """With stream=True the body is left on the socket for iter_content()."""
+        return self.get(f"/instances/{instance_id}/file", timeout=timeout, stream=stream)
+
+    def instance_metadata(self, instance_id, key):
+        """Metadata value as text, or None when the key is not set."""
+        r = self.get(f"/instances/{instance_id}/metadata/{key}")
+        if r.status_code != 200:
+            return None
+        return r.text.strip().strip('"') or None
+
+    def set_instance_metadata(self, instance_id, key, value):
+        return self.put(f"/instances/{instance_id}/metadata/{key}", data=str(value),
+                        headers={"Content-Type": "text/plain"})
+
+    def changes(self, since=0, limit=100):
+        r = self.get("/changes", params={"since": since, "limit": limit})
+        r.raise_for_status()
+        return r.json()
+
+    def last_change_seq(self):
+        r = self.get("/changes", params={"last": ""})
+        r.raise_for_status()
+        return int(r.json().get("Last") or 0)
+
+    def find(self, level, query, expand=True, limit=None, requested_tags=None):
+        body = {"Level": level, "Query": query, "Expand": expand}
+        if limit:
+            body["Limit"] = limit
+        if requested_tags:
+            body["RequestedTags"] = list(requested_tags)
+        r = self.post("/tools/find", json=body)
+        r.raise_for_status()
+        return r.json()
+
+    def latency_summary(self):
+        return self.stats.summary()
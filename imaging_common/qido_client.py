@@ -0,0 +1,56 @@
+"""
+DICOMweb QIDO-RS study search for the imaging apps.
+
+QIDO-RS is plain HTTP + JSON, so the client reuses OrthancClient's pooled
+keep-alive session, retry policy and per-endpoint latency stats (Orthanc's own
+DICOMweb plugin lives under /dicom-web). Filters are pushed down into the
+query string, results are paged with limit/offset until an empty page, and pages come back as the
+parsed application/dicom+json list, ready for a VendorAdapter to read.
+"""
+from imaging_common.orthanc_client import OrthancClient
+
+DICOM_JSON = "application/dicom+json"
+
+
+def study_filters(patient_id=None, modality=None, start=None, end=None):
+    """QIDO-RS matching keys for a patient / modality / StudyDate range lookup."""
+    filters = {}
+    if patient_id:
+        filters["PatientID"] = patient_id
+    if modality:
+        filters["ModalitiesInStudy"] = modality
+    if start or end:
+        filters["StudyDate"] = f"{start.strftime('%Y%m%d') if start else ''}-{end.strftime('%Y%m%d') if end else ''}"
+    return filters
+
+
+class QidoClient(OrthancClient):
+    def search_studies(self, filters, limit=None, offset=0, includefields=()):
+        """One GET /studies page; 204 No Content is an empty page."""
+        params = list(filters.items())
+        params += [("includefield", f) for f in includefields]
+        if limit:
+            params.append(("limit", limit))
+        if offset:
+            params.append(("offset", offset))
+        r = self.get("/studies", params=params, headers={"Accept": DICOM_JSON})
+        if r.status_code == 204:
+            return []
+        r.raise_for_status()
+        return r.json()
+
+    def iter_studies(self, filters, page_size=100, max_results=None, includefields=()):
+        """
+        Yield result pages until an empty page (or 204) comes back or max_results is reached.
+        A short page is not the end: servers may cap a page below `limit` (Orthanc, most PACS).
+        """
+        offset = 0
+        while True:
+            limit = min(page_size, max_results - offset) if max_results else page_size
+            page = self.search_studies(filters, limit, offset, includefields)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+            if max_results and offset >= max_results:
+                return
@@ -0,0 +1,113 @@
+"""
+Synthetic DICOM generator for benchmarks and local testing.
+
+Builds Part 10 files with pydicom for a handful of modality presets that span
+the sizes the cleaner sees in practice: single-frame CT/MR slices, large 16-bit
+DX/MG plates and multi-frame 8-bit XA / RGB ultrasound cines. Headers carry
+the usual identifying tags so de-identification has something to remove.
+
+    from imaging_common.synthetic_dicom import make_instance, make_series
+    data = make_instance("US", frames=20)
+"""
+import io
+
+import numpy as np
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+# modality -> SOP class, matrix, frames, bits, samples/pixel, signedness, VOI window
+MODALITIES = {
+    "CT": dict(sop_class="1.2.840.10008.5.1.4.1.1.2", rows=512, cols=512, frames=1, bits=16,
+               samples=1, signed=True, window=(40, 400), rescale=(1, -1024)),
+    "MR": dict(sop_class="1.2.840.10008.5.1.4.1.1.4", rows=256, cols=256, frames=1, bits=16,
+               samples=1, signed=False, window=(600, 1200), rescale=None),
+    "DX": dict(sop_class="1.2.840.10008.5.1.4.1.1.1.1", rows=2048, cols=2048, frames=1, bits=16,
+               samples=1, signed=False, window=(2048, 4096), rescale=None),
+    "MG": dict(sop_class="1.2.840.10008.5.1.4.1.1.1.2", rows=3328, cols=2560, frames=1, bits=16,
+               samples=1, signed=False, window=(2048, 4096), rescale=None),
+    "XA": dict(sop_class="1.2.840.10008.5.1.4.1.1.12.1", rows=512, cols=512, frames=30, bits=8,
+               samples=1, signed=False, window=None, rescale=None),
+    "US": dict(sop_class="1.2.840.10008.5.1.4.1.1.3.1", rows=480, cols=640, frames=30, bits=8,
+               samples=3, signed=False, window=None, rescale=None),
+}
+
+
+def _pixels(rng, preset, rows, cols, frames):
+    """Noisy ellipse on a dark background, repeated (with drift) across frames."""
+    yy, xx = np.mgrid[:rows, :cols]
+    r = ((yy - rows / 2) / (rows * 0.35)) ** 2 + ((xx - cols / 2) / (cols * 0.4)) ** 2
+    top = (1 << preset["bits"]) - 1 if not preset["signed"] else 3000
+    base = np.where(r < 1, top * 0.45, top * 0.02)
+
+    dtype = {(8, False): np.uint8, (16, False): np.uint16, (16, True): np.int16}[(preset["bits"], preset["signed"])]
+    shape = (frames, rows, cols) + ((preset["samples"],) if preset["samples"] > 1 else ())
+    noise = rng.normal(0, top * 0.03, shape[:3]).astype(np.float32)
+    arr = np.clip(base[None] + noise, 0 if not preset["signed"] else -1024, top).astype(dtype)
+    if preset["samples"] > 1:
+        arr = np.repeat(arr[..., None], preset["samples"], axis=-1)
+    return arr if frames > 1 else arr[0]
+
+
+def make_instance(modality="CT", rows=None, cols=None, frames=None, patient_id="SYN0001",
+                  patient_name="DOE^JOHN", study_uid=None, series_uid=None, instance_number=1, seed=None):
+    """One synthetic instance as Part 10 bytes; preset sizes can be overridden."""
+    preset = MODALITIES[modality]
+    rows, cols = rows or preset["rows"], cols or preset["cols"]
+    frames = frames or preset["frames"]
+    rng = np.random.default_rng(seed)
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = preset["sop_class"]
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = preset["sop_class"]
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = study_uid or generate_uid()
+    ds.SeriesInstanceUID = series_uid or generate_uid()
+    ds.Modality = modality
+    ds.PatientName = patient_name
+    ds.PatientID = patient_id
+    ds.PatientBirthDate = "19610402"
+    ds.PatientSex = "M"
+    ds.StudyDate = ds.SeriesDate = "20250925"
+    ds.StudyTime = "140200"
+    ds.AccessionNumber = f"ACC{rng.integers(100000, 999999)}"
+    ds.InstitutionName = "ST. MARY HOSPITAL"
+    ds.ReferringPhysicianName = "SMITH^ANNA"
+    ds.StudyDescription = f"SYNTHETIC {modality}"
+    ds.SeriesNumber = 1
+    ds.InstanceNumber = instance_number
+
+    ds.Rows, ds.Columns = rows, cols
+    ds.SamplesPerPixel = preset["samples"]
+    ds.PhotometricInterpretation = "RGB" if preset["samples"] > 1 else "MONOCHROME2"
+    if preset["samples"] > 1:
+        ds.PlanarConfiguration = 0
+    ds.BitsAllocated = ds.BitsStored = preset["bits"]
+    ds.HighBit = preset["bits"] - 1
+    ds.PixelRepresentation = 1 if preset["signed"] else 0
+    if frames > 1:
+        ds.NumberOfFrames = frames
+    if preset["window"]:
+        ds.WindowCenter, ds.WindowWidth = preset["window"]
+    if preset["rescale"]:
+        ds.RescaleSlope, ds.RescaleIntercept = preset["rescale"]
+    ds.PixelData = _pixels(rng, preset, rows, cols, frames).tobytes()
+
+    out = io.BytesIO()
+    ds.save_as(out, enforce_file_format=True)
+    return out.getvalue()
+
+
+def make_series(modality="CT", n_instances=10, seed=None, **kwargs):
+    """`n_instances` instances sharing one study and series UID."""
+    study_uid, series_uid = generate_uid(), generate_uid()
+    rng = np.random.default_rng(seed)
+    return [
+        make_instance(modality, study_uid=study_uid, series_uid=series_uid, instance_number=i + 1,
+                      seed=int(rng.integers(1 << 31)), **kwargs)
+        for i in range(n_instances)
+    ]
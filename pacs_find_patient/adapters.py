@@ -0,0 +1,195 @@
+"""
+Vendor adapter registry for the federated query.
+
+Each vendor declares in vendors.json how its records map onto the unified
+schema (a key or dotted path per field), the date format it uses and what it
+can be queried for. Mappings are compiled once, when the registry loads, into
+accessor closures and a date converter, so normalising a record is a fixed
+list of function calls with no per-record probing of alternative keys.
+DICOMweb vendors ("record_format": "dicom+json") map fields to tags and are
+read straight out of the parsed QIDO-RS response. Adding a vendor is a config
+change.
+"""
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+
+UNIFIED_FIELDS = ("patient_id", "study", "modality", "date")
+VENDORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vendors.json")
+DICOM_VR = {"00080020": "DA", "00080061": "CS", "00081030": "LO", "00100020": "LO", "00080060": "CS"}
+
+
+def compile_accessor(path):
+    """'a' -> r.get('a'); 'a.b.c' -> r['a']['b'].get('c'), None when any level is missing."""
+    keys = path.split(".")
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda record: record.get(key)
+
+    head, last = keys[:-1], keys[-1]
+
+    def get(record):
+        for key in head:
+            record = record.get(key)
+            if not isinstance(record, dict):
+                return None
+        return record.get(last)
+    return get
+
+
+def compile_dicom_accessor(tag):
+    """'00100020' -> first Value of that DICOM JSON attribute; multi-valued attributes joined with '\\'."""
+    tag = tag.replace(",", "").upper()
+
+    def get(record):
+        attr = record.get(tag)
+        values = attr.get("Value") if attr else None
+        if not values:
+            return None
+        if len(values) == 1:
+            value = values[0]
+            return value.get("Alphabetic") if isinstance(value, dict) else value
+        return "\\".join(str(v) for v in values)
+    return get
+
+
+def compile_date(fmt):
+    """Converter from the vendor's date format to ISO YYYY-MM-DD; unparseable values pass through."""
+    if fmt.startswith("%Y-%m-%d"):
+        return lambda v: v[:10] if v else v
+    if fmt.startswith("%Y%m%d"):
+        return lambda v: f"{v[:4]}-{v[4:6]}-{v[6:8]}" if v and len(v) >= 8 else v
+
+    def convert(v):
+        try:
+            return datetime.strptime(v, fmt).date().isoformat()
+        except (TypeError, ValueError):
+            return v
+    return convert
+
+
+class VendorAdapter:
+    def __init__(self, config):
+        self.config = config
+        self.name = config["name"]
+        self.source = config.get("source", "simulated")
+        self.enabled = config.get("enabled", True)
+        self.date_format = config.get("date_format", "%Y-%m-%d")
+        self.capabilities = config.get("capabilities", {})
+        self.latency_s = tuple(config.get("latency_s", (0.4, 1.2)))
+        self.tail_prob, self.tail_factor = config.get("latency_tail", (0.03, 4.0))
+        self.record_format = config.get("record_format", "json")
+        self.fields = {f: config["fields"][f] for f in UNIFIED_FIELDS}
+
+        compile_field = compile_dicom_accessor if self.record_format == "dicom+json" else compile_accessor
+        getters = [(f, compile_field(self.fields[f])) for f in UNIFIED_FIELDS]
+        to_iso = compile_date(self.date_format)
+        vendor = self.name
+
+        def normalize(record):
+            out = {f: get(record) for f, get in getters}
+            out["date"] = to_iso(out["date"])
+            out["vendor"] = vendor
+            return out
+        self.normalize = normalize
+
+    def normalize_many(self, records):
+        normalize = self.normalize
+        return [normalize(r) for r in records]
+
+    def cap(self, records):
+        """Truncate a query response to the vendor's declared max_results."""
+        limit = self.capabilities.get("max_results")
+        return records[:limit] if limit else records
+
+    def sample_latency(self, rng=random):
+        """Simulated response time: uniform over latency_s, with a tail_prob chance of a tail_factor x stall."""
+        latency = rng.uniform(*self.latency_s)
+        return latency * self.tail_factor if rng.random() < self.tail_prob else latency
+
+    def serves(self, modality):
+        """False when the vendor declares it holds no studies of `modality`."""
+        modalities = self.capabilities.get("modalities")
+        return not modality or not modalities or modality in modalities
+
+    @property
+    def includefields(self):
+        """Tags a QIDO-RS query must ask for so every mapped field comes back."""
+        return [self.fields[f] for f in UNIFIED_FIELDS] if self.record_format == "dicom+json" else []
+
+    def to_native(self, unified):
+        """Inverse mapping (unified -> vendor schema), used to simulate vendor payloads."""
+        record = {}
+        for field in UNIFIED_FIELDS:
+            value = unified[field]
+            if field == "date":
+                value = datetime.strptime(value, "%Y-%m-%d").strftime(self.date_format)
+            if self.record_format == "dicom+json":
+                tag = self.fields[field]
+                record[tag] = {"vr": DICOM_VR.get(tag, "LO"), "Value": str(value).split("\\")}
+                continue
+            *head, last = self.fields[field].split(".")
+            node = record
+            for key in head:
+                node = node.setdefault(key, {})
+            node[last] = value
+        return record
+
+    def simulate(self, patients=("123", "456"), per_patient=(0, 3), seed=None):
+        """Deterministic synthetic studies in the vendor's own schema."""
+        rng = random.Random(seed if seed is not None else self.name)
+        modalities = self.capabilities.get("modalities") or ["CT", "MR", "CR", "US"]
+        records = []
+        for pid in patients:
+            for _ in range(rng.randint(*per_patient)):
+                modality = rng.choice(modalities)
+                day = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+                records.append(self.to_native({
+                    "patient_id": pid,
+                    "study": f"{modality} {rng.choice(['Chest', 'Abdomen', 'Brain', 'Spine', 'Knee', 'Pelvis'])}",
+                    "modality": modality,
+                    "date": day.isoformat(),
+                }))
+        return records
+
+
+class AdapterRegistry:
+    def __init__(self, adapters=()):
+        self._adapters = {}
+        for adapter in adapters:
+            self.register(adapter)
+
+    @classmethod
+    def load(cls, path=VENDORS_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(VendorAdapter(cfg) for cfg in json.load(f)["vendors"])
+
+    def register(self, adapter):
+        self._adapters[adapter.name] = adapter
+
+    def get(self, name):
+        return self._adapters[name]
+
+    def __iter__(self):
+        return iter(self._adapters.values())
+
+    def __len__(self):
+        return len(self._adapters)
+
+    def names(self, source=None):
+        return [a.name for a in self if a.enabled and (source is None or a.source == source)]
+
+    def for_query(self, modality=None, names=None):
+        """Enabled adapters worth asking for `modality`, optionally restricted to `names`."""
+        return [a for a in self
+                if a.enabled and a.serves(modality) and (names is None or a.name in names)]
+
+    def describe(self):
+        return [
+            {"vendor": a.name, "source": a.source, "enabled": a.enabled, "date_format": a.date_format,
+             "modalities": ", ".join(a.capabilities.get("modalities", [])) or "any",
+             "max_results": a.capabilities.get("max_results"), "record_format": a.record_format,
+             **{f"map:{f}": a.fields[f] for f in UNIFIED_FIELDS}}
+            for a in self
+        ]
@@ -1,13 +1,41 @@
 # federated_imaging_demo_radiology.py
 import streamlit as st
 import pandas as pd
-import time, random, asyncio
+import time, asyncio, os, sys, uuid
 from datetime import datetime, date
+from functools import partial
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from imaging_common.orthanc_client import OrthancClient
+from imaging_common.qido_client import QidoClient, study_filters
+from adapters import AdapterRegistry
+from dedup import dedupe
+from federation import fan_out, fan_out_async, merge_records, status_badge, status_table
+from fhir_export import EXPORT_DIR, export_patients, ndjson_lines
+from metrics_store import MetricsStore
+from load_test import ReaderWorkload, patient_population, run_load_test
+from prefetch import Prefetcher, parse_worklist
+from prior_index import PriorStudyIndex
+from resilience import VendorHealth
+from result_cache import ResultCache, lookup_key
+
+# Optional real archive: point at any Orthanc (or imaging_common/mock_orthanc.py)
+ORTHANC_PACS_URL = os.environ.get("PACS_ORTHANC_URL", "")
+ORTHANC_PACS_AUTH = (os.environ.get("PACS_ORTHANC_USER", "orthanc"), os.environ.get("PACS_ORTHANC_PASSWORD", "orthanc"))
+# Optional DICOMweb archive: any QIDO-RS endpoint (or imaging_common/mock_qido.py)
+QIDO_PACS_URL = os.environ.get("PACS_QIDO_URL", "")
+QIDO_PACS_AUTH = (os.environ.get("PACS_QIDO_USER", ""), os.environ.get("PACS_QIDO_PASSWORD", "")) \
+    if os.environ.get("PACS_QIDO_USER") else None
+LIVE_SOURCES = {"orthanc": ORTHANC_PACS_URL, "qido": QIDO_PACS_URL}   # source -> base URL, empty when not configured
+PRIOR_WINDOW = (date(2025, 4, 1), date(2025, 10, 31))   # default From/To; prefetch warms lookups for this range
+VENDOR_TIMEOUT_S = float(os.environ.get("PACS_VENDOR_TIMEOUT_S", "1.5"))   # per vendor, federated query
 
 st.set_page_config(page_title="Unified Imaging Query Demo", layout="wide")
 
 # ------------------------------------------------------------------
-# Mock data from two vendor PACS clouds
+# Mock data from vendor PACS clouds (Philips and GE hand-written, the rest
+# generated in each vendor's own schema from vendors.json)
 # ------------------------------------------------------------------
 PHILIPS_CLOUD = [
     {"patient_id": "123", "study": "CT Thorax", "modality": "CT", "vendor": "Philips Imaging Cloud", "date": "2025-09-25"},
@@ -24,44 +52,156 @@ GE_CLOUD = [
 # ------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------
-def normalize(record):
-    """Map Philips + GE schemas into one unified schema."""
-    return {
-        "patient_id": record.get("patient_id") or record.get("pid"),
-        "study": record.get("study") or record.get("exam"),
-        "modality": record.get("modality"),
-        "date": record.get("date") or record.get("study_date"),
-        "vendor": record.get("vendor"),
-    }
-
-def filter_records(records, patient_id, modality, start, end):
-    out = []
-    for r in records:
-        n = normalize(r)
-        if patient_id and n["patient_id"] != patient_id:
-            continue
-        if modality and n["modality"] != modality:
-            continue
-        try:
-            d = datetime.strptime(n["date"], "%Y-%m-%d").date()
-            if start and d < start: continue
-            if end and d > end: continue
-        except: pass
-        out.append(n)
-    return out
-
-def query_cloud(dataset, patient_id, modality, start, end):
+@st.cache_resource
+def get_registry():
+    """Vendor adapters with their field mappings compiled once per server process."""
+    return AdapterRegistry.load()
+
+@st.cache_resource
+def get_vendor_data():
+    """Native-schema records per simulated vendor."""
+    data = {"Philips Imaging Cloud": PHILIPS_CLOUD, "GE Health Cloud": GE_CLOUD}
+    for adapter in get_registry():
+        if adapter.source == "simulated" and adapter.name not in data:
+            data[adapter.name] = adapter.simulate()
+    return data
+
+@st.cache_resource
+def get_prior_index():
+    """Prior-study index, loaded once per vendor sync (here: once per server process)."""
+    index = PriorStudyIndex()
+    for vendor, records in get_vendor_data().items():
+        index.sync(vendor, get_registry().get(vendor).normalize_many(records))
+    return index
+
+@st.cache_resource
+def get_result_cache():
+    """Per-vendor lookup results shared by every session (PACS_CACHE_TTL_S / PACS_CACHE_MAX_ENTRIES)."""
+    return ResultCache()
+
+@st.cache_resource
+def get_vendor_health():
+    """Rolling per-vendor latency, adaptive timeouts and circuit breakers shared by every session."""
+    return VendorHealth()
+
+@st.cache_resource
+def get_metrics_store():
+    """Durable query metrics with minute/hour rollups (PACS_METRICS_PATH)."""
+    store = MetricsStore()
+    store.prune()
+    return store
+
+@st.cache_resource
+def get_sync_state():
+    return {"orthanc_seq": None}
+
+def invalidate_on_new_orthanc_studies():
+    """Anything new in the Orthanc change log invalidates its cached answers."""
+    try:
+        seq = get_orthanc().last_change_seq()
+    except Exception:
+        return
+    state = get_sync_state()
+    if state["orthanc_seq"] is not None and seq != state["orthanc_seq"]:
+        get_result_cache().invalidate(vendor="Orthanc PACS")
+    state["orthanc_seq"] = seq
+
+def record_new_study(vendor, record):
+    """A study arrived at `vendor`: index it and drop that patient's cached lookups."""
+    get_prior_index().add(vendor, dict(record, vendor=vendor))
+    return get_result_cache().invalidate(vendor=vendor, patient_id=record["patient_id"])
+
+def query_cloud(vendor, patient_id, modality, start, end):
+    adapter = get_registry().get(vendor)
+    t0 = time.perf_counter()
+    time.sleep(adapter.sample_latency())   # simulate vendor latency
+    res = adapter.cap(get_prior_index().query(vendor, patient_id, modality, start, end))
+    return res, time.perf_counter() - t0
+
+async def query_cloud_async(vendor, patient_id, modality, start, end):
+    adapter = get_registry().get(vendor)
+    t0 = time.perf_counter()
+    await asyncio.sleep(adapter.sample_latency())
+    res = adapter.cap(get_prior_index().query(vendor, patient_id, modality, start, end))
+    return res, time.perf_counter() - t0
+
+@st.cache_resource
+def get_orthanc():
+    """Pooled keep-alive client shared by every session of this server process."""
+    return OrthancClient(ORTHANC_PACS_URL, auth=ORTHANC_PACS_AUTH)
+
+def query_orthanc(patient_id, modality, start, end):
+    """Study-level /tools/find against the Orthanc archive, mapped to the unified schema."""
     t0 = time.perf_counter()
-    time.sleep(random.uniform(0.4, 1.2))   # simulate vendor latency
-    res = filter_records(dataset, patient_id, modality, start, end)
+    query = {}
+    if patient_id: query["PatientID"] = patient_id
+    if modality:   query["ModalitiesInStudy"] = modality
+    if start or end:
+        query["StudyDate"] = f"{start.strftime('%Y%m%d') if start else ''}-{end.strftime('%Y%m%d') if end else ''}"
+    studies = get_orthanc().find("Study", query, requested_tags=["ModalitiesInStudy"])
+    adapter = get_registry().get("Orthanc PACS")
+    res = adapter.normalize_many(adapter.cap(studies))
+    if modality:
+        for r in res:
+            r["modality"] = modality
     return res, time.perf_counter() - t0
 
-async def query_cloud_async(dataset, patient_id, modality, start, end):
+@st.cache_resource
+def get_qido():
+    """Pooled keep-alive QIDO-RS client shared by every session of this server process."""
+    return QidoClient(QIDO_PACS_URL, auth=QIDO_PACS_AUTH)
+
+def query_qido(vendor, patient_id, modality, start, end):
+    """QIDO-RS study search with filters in the query string, paged with limit/offset up to max_results."""
+    adapter = get_registry().get(vendor)
     t0 = time.perf_counter()
-    await asyncio.sleep(random.uniform(0.4, 1.2))
-    res = filter_records(dataset, patient_id, modality, start, end)
+    res = []
+    for page in get_qido().iter_studies(study_filters(patient_id, modality, start, end),
+                                        page_size=adapter.capabilities.get("page_size", 100),
+                                        max_results=adapter.capabilities.get("max_results"),
+                                        includefields=adapter.includefields):
+        res += adapter.normalize_many(page)
+    if modality:
+        for r in res:
+            r["modality"] = modality
     return res, time.perf_counter() - t0
 
+def available(adapter):
+    """Simulated vendors always answer; live archives only once their URL is configured."""
+    return adapter.source == "simulated" or bool(LIVE_SOURCES.get(adapter.source))
+
+def prior_frame(rows):
+    """Unified rows as a DataFrame, with merged-duplicate provenance flattened for display."""
+    df = pd.DataFrame(rows)
+    if "sources" in df:
+        df["sources"] = df["sources"].map(lambda src: "; ".join(f"{v}: {s}" for v, s in src))
+    return df
+
+def vendor_queries(patient_id, modality, start, end, vendors=None):
+    """
+    One zero-argument query per registered vendor that can hold `modality`,
+    optionally limited to `vendors`, for the fan-out executor.
+    """
+    async def cloud(vendor):
+        res, _ = await query_cloud_async(vendor, patient_id, modality, start, end)
+        return res
+    queries = {}
+    for adapter in get_registry().for_query(modality, vendors):
+        if not available(adapter):
+            continue
+        if adapter.source == "simulated":
+            queries[adapter.name] = partial(cloud, adapter.name)
+        elif adapter.source == "orthanc":
+            queries[adapter.name] = lambda: query_orthanc(patient_id, modality, start, end)[0]
+        elif adapter.source == "qido":
+            queries[adapter.name] = partial(lambda v: query_qido(v, patient_id, modality, start, end)[0], adapter.name)
+    return queries
+
+@st.cache_resource
+def get_prefetcher():
+    """Background worklist prefetcher warming the shared result cache (PACS_PREFETCH_* settings)."""
+    return Prefetcher(vendor_queries, get_result_cache(), PRIOR_WINDOW, VENDOR_TIMEOUT_S)
+
 # ------------------------------------------------------------------
 # UI
 # ------------------------------------------------------------------
@@ -76,13 +216,15 @@ This demo shows how a **federated query layer** can bring them together in one p
 c1, c2, c3, c4 = st.columns([1.2,1,1,1])
 with c1: patient_id = st.text_input("Patient ID", value="123")
 with c2: modality   = st.selectbox("Modality", ["","CT","MR","CR"], index=1)
-with c3: start_date = st.date_input("From", value=date(2025,4,1))
-with c4: end_date   = st.date_input("To",   value=date(2025,10,31))
+with c3: start_date = st.date_input("From", value=PRIOR_WINDOW[0])
+with c4: end_date   = st.date_input("To",   value=PRIOR_WINDOW[1])
 
 st.divider()
 
-tabs = st.tabs(["Philips Portal", "GE Portal", "Unified View", "Metrics"])
+tabs = st.tabs(["Philips Portal", "GE Portal", "Unified View", "Worklist", "Metrics"])
 if "run_log" not in st.session_state: st.session_state.run_log = []
+if "load_runs" not in st.session_state: st.session_state.load_runs = []
+if "session_id" not in st.session_state: st.session_state.session_id = uuid.uuid4().hex[:12]
 
 # ------------------------------------------------------------------
 # Philips
@@ -90,7 +232,7 @@ if "run_log" not in st.session_state: st.session_state.run_log = []
 with tabs[0]:
     st.subheader("Philips Imaging Cloud (separate query)")
     if st.button("Find Priors in Philips"):
-        res, t = query_cloud(PHILIPS_CLOUD, patient_id, modality, start_date, end_date)
+        res, t = query_cloud("Philips Imaging Cloud", patient_id, modality, start_date, end_date)
         st.success(f"Found {len(res)} studies in {t:.2f}s")
         st.dataframe(pd.DataFrame(res))
 
@@ -100,7 +242,7 @@ with tabs[0]:
 with tabs[1]:
     st.subheader("GE Health Cloud (separate query)")
     if st.button("Find Priors in GE"):
-        res, t = query_cloud(GE_CLOUD, patient_id, modality, start_date, end_date)
+        res, t = query_cloud("GE Health Cloud", patient_id, modality, start_date, end_date)
         st.success(f"Found {len(res)} studies in {t:.2f}s")
         st.dataframe(pd.DataFrame(res))
 
@@ -109,45 +251,212 @@ with tabs[1]:
 # ------------------------------------------------------------------
 with tabs[2]:
     st.subheader("Federated Query – Unified Patient View")
+    vendor_timeout = st.slider("Per-vendor timeout (s)", 0.2, 5.0, VENDOR_TIMEOUT_S, 0.1,
+                               help="Vendors that haven't answered by then are reported as timed out; "
+                                    "everything else is shown as a partial result.")
+    all_vendors = [a.name for a in get_registry() if a.enabled and available(a)]
+    selected = st.multiselect("Vendors", all_vendors, default=all_vendors)
+    o1, o2, o3 = st.columns(3)
+    use_cache = o1.checkbox("Use result cache", value=True,
+                            help="Repeat lookups are answered from the cache until the TTL expires "
+                                 "or a new study arrives for the patient.")
+    merge_dupes = o2.checkbox("Merge cross-vendor duplicates", value=True,
+                              help="Same patient, date and modality with equivalent descriptions "
+                                   "(e.g. CT Thorax / CT Chest) become one row listing every source.")
+    adaptive = o3.checkbox("Adaptive timeouts & breakers", value=True,
+                           help="Per-vendor timeout from observed p95 (the slider is the ceiling), a hedged "
+                                "duplicate request after the p90, and vendors skipped while their breaker is open.")
+    with st.expander("Simulate a new study arriving"):
+        n1, n2, n3, n4 = st.columns(4)
+        new_vendor = n1.selectbox("Vendor", get_registry().names(source="simulated"))
+        new_modality = n2.selectbox("Study modality", ["CT", "MR", "CR", "US"])
+        new_date = n3.date_input("Study date", value=date.today())
+        n4.write("")
+        if n4.button("Study arrives"):
+            dropped = record_new_study(new_vendor, {"patient_id": patient_id, "study": f"{new_modality} New study",
+                                                    "modality": new_modality, "date": new_date.isoformat()})
+            st.success(f"Indexed new {new_modality} study for {patient_id} at {new_vendor}; "
+                       f"invalidated {dropped} cached lookups.")
     if st.button("Run Unified Query"):
-        # Baseline: separate lookups
-        rA, tA = query_cloud(PHILIPS_CLOUD, patient_id, modality, start_date, end_date)
-        rB, tB = query_cloud(GE_CLOUD,      patient_id, modality, start_date, end_date)
-        fragmented = tA + tB
-
-        # Federated: parallel fan-out
-        t0 = time.perf_counter()
-        rA2, tA2 = asyncio.run(query_cloud_async(PHILIPS_CLOUD, patient_id, modality, start_date, end_date))
-        rB2, tB2 = asyncio.run(query_cloud_async(GE_CLOUD,      patient_id, modality, start_date, end_date))
-        federated = time.perf_counter() - t0
-
-        unified = sorted(rA2 + rB2, key=lambda x: x["date"])
-        df = pd.DataFrame(unified)
+        if ORTHANC_PACS_URL and use_cache:
+            invalidate_on_new_orthanc_studies()
+        queries = vendor_queries(patient_id, modality, start_date, end_date, selected)
+        if not queries:
+            st.info("No selected vendor holds this modality.")
+            st.stop()
+
+        # Federated: every vendor concurrently in one event loop, each with its own timeout;
+        # the table re-renders as each vendor's sorted stream is merged in
+        kpis = st.empty()
+        badges = st.empty()
+        table = st.empty()
+        answered = {}
+        unified = []
+
+        def show_progress(result, merged):
+            answered[result["vendor"]] = result
+            unified[:] = dedupe(merged) if merge_dupes else merged
+            badges.markdown("  \n".join(status_badge(answered.get(v), v) for v in queries))
+            if unified:
+                table.dataframe(prior_frame(unified), use_container_width=True)
+
+        badges.markdown("  \n".join(status_badge(None, v) for v in queries))
+        results, federated = fan_out(queries, default_timeout=vendor_timeout,
+                                     cache=get_result_cache() if use_cache else None,
+                                     cache_key=lambda v: lookup_key(v, patient_id, modality, start_date, end_date),
+                                     on_result=show_progress, health=get_vendor_health() if adaptive else None)
+        # Baseline: the same lookups done one portal after another
+        fragmented = sum(r["latency_s"] for r in results)
+        first = min((r["arrived_s"] for r in results if r["records"]), default=federated)
+        slowest = max(r["latency_s"] for r in results)
+        missing = [r["vendor"] for r in results if r["status"] != "ok"]
         saved = fragmented - federated
         pct   = (saved/fragmented*100) if fragmented>0 else 0
 
-        k1,k2,k3 = st.columns(3)
-        k1.metric("Two separate portals", f"{fragmented:.2f}s")
-        k2.metric("Unified query time",   f"{federated:.2f}s")
-        k3.metric("Time saved", f"{saved:.2f}s", f"{pct:.0f}%")
+        with kpis.container():
+            k1,k2,k3,k4,k5 = st.columns(5)
+            k1.metric(f"{len(results)} separate portals", f"{fragmented:.2f}s")
+            k2.metric("First result", f"{first:.2f}s")
+            k3.metric("Unified query time",   f"{federated:.2f}s")
+            k4.metric("Slowest vendor", f"{slowest:.2f}s")
+            k5.metric("Time saved", f"{saved:.2f}s", f"{pct:.0f}%")
 
-        st.dataframe(df, use_container_width=True)
-        st.session_state.run_log.append({
+        cache_hits = sum(r["cached"] for r in results)
+        hedged = sum(r["hedged"] for r in results)
+        if hedged:
+            st.caption(f"🔀 Hedged {hedged} slow vendor{'s' if hedged > 1 else ''} with a duplicate request.")
+        if cache_hits:
+            st.caption(f"⚡ {cache_hits}/{len(results)} vendors answered from the result cache (no vendor call).")
+        if missing:
+            st.warning(f"Partial result — no answer from: {', '.join(missing)}")
+        with st.expander("Per-vendor status"):
+            st.dataframe(pd.DataFrame(status_table(results)), use_container_width=True, hide_index=True)
+        records = sum(len(r["records"]) for r in results)
+        if merge_dupes and records > len(unified):
+            st.caption(f"🔗 Merged {records - len(unified)} duplicate reports into {len(unified)} unique studies.")
+        if not records:
+            table.info("No prior studies found.")
+        else:
+            st.download_button("Export FHIR ImagingStudy (NDJSON)", b"".join(ndjson_lines(unified)),
+                               f"priors_{patient_id}.ndjson", "application/fhir+ndjson")
+        run = {
             "ts": datetime.now().isoformat(timespec="seconds"),
             "patient_id": patient_id,
             "modality": modality,
+            "vendors": len(results),
             "fragmented_s": round(fragmented,2),
             "federated_s": round(federated,2),
             "saved_s": round(saved,2),
             "pct_saved": round(pct,1),
-            "records": len(df)
-        })
+            "vendors_ok": len(results) - len(missing),
+            "vendors_missing": len(missing),
+            "cache_hits": cache_hits,
+            "hedged": hedged,
+            "first_result_s": round(first,2),
+            "records": records,
+            "unique_studies": len(unified)
+        }
+        st.session_state.run_log.append(run)
+        get_metrics_store().record_query(run, results, session=st.session_state.session_id)
 
 # ------------------------------------------------------------------
-# Metrics log
+# Worklist prefetch
 # ------------------------------------------------------------------
 with tabs[3]:
-    st.subheader("Recorded Runs")
+    st.subheader("Worklist Prefetch")
+    st.caption("Load the day's reading worklist (CSV or HL7 ORM). Priors for each scheduled study are looked up "
+               "in the background ahead of read time, so the Unified View click is answered from the cache.")
+    prefetcher = get_prefetcher()
+    w1, w2 = st.columns([2, 1])
+    worklist_file = w1.file_uploader("Worklist", type=["csv", "hl7", "txt"])
+    w2.write("")
+    use_sample = w2.button("Load sample worklist")
+    if worklist_file or use_sample:
+        text = worklist_file.getvalue().decode(errors="replace") if worklist_file \
+            else (Path(__file__).parent / "sample_worklist.csv").read_text()
+        try:
+            entries = parse_worklist(text)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        prefetcher.load(entries)
+        st.success(f"Loaded {len(entries)} scheduled studies; prefetching "
+                   f"{prefetcher.lead_s / 60:.0f} min ahead with up to {prefetcher.max_concurrency} in flight.")
+    p1, p2 = st.columns(2)
+    if p1.button("Prefetch all now", help="Warm every worklist study immediately, ignoring scheduled times."):
+        with st.spinner("Prefetching priors…"):
+            st.success(f"Warmed {prefetcher.run_once(force=True)} studies.")
+    p2.button("Refresh status")   # any rerun re-reads the prefetcher state
+    pf = prefetcher.stats()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Worklist studies", pf["worklist"])
+    k2.metric("Warm in cache", pf["warm"])
+    k3.metric("Vendor calls", pf["vendor_calls"])
+    k4.metric("Failures", pf["failures"])
+    if pf["last_error"]:
+        at, message = pf["last_error"]
+        st.warning(f"⚠️ {pf['poll_errors']} prefetch poll(s) failed; last at {at:%H:%M:%S}: {message}")
+    if pf["worklist"]:
+        st.dataframe(pd.DataFrame(prefetcher.snapshot()), use_container_width=True, hide_index=True)
+        st.caption(f"Prefetch uses the default prior window {PRIOR_WINDOW[0]} – {PRIOR_WINDOW[1]} and the study's "
+                   "modality; a Unified View query with the same patient, modality and dates is a cache hit.")
+
+    st.subheader("FHIR Bulk Export")
+    st.caption("Unified priors for a patient list as FHIR ImagingStudy NDJSON (gzip), written to disk in chunks "
+               "while the lookups run; uses the From/To dates and modality above.")
+    worklist_ids = "\n".join(dict.fromkeys(r["patient_id"] for r in prefetcher.snapshot()))
+    export_ids = st.text_area("Patient IDs (one per line)", worklist_ids or patient_id, height=120)
+    if st.button("Export priors"):
+        async def lookup(pid):
+            results, _ = await fan_out_async(vendor_queries(pid, modality, start_date, end_date),
+                                             default_timeout=VENDOR_TIMEOUT_S, cache=get_result_cache(),
+                                             cache_key=lambda v: lookup_key(v, pid, modality, start_date, end_date),
+                                             health=get_vendor_health())
+            return dedupe(merge_records(results)), results
+
+        ids = [i for i in export_ids.splitlines() if i.strip()]
+        path = os.path.join(EXPORT_DIR, f"priors_{datetime.now():%Y%m%d_%H%M%S}.ndjson.gz")
+        bar = st.progress(0.0)
+        stats = export_patients(ids, lookup, path, on_progress=lambda s: bar.progress(
+            s["patients"] / len(ids), f"{s['patients']}/{len(ids)} patients · {s['studies']} studies"))
+        st.success(f"Exported {stats['studies']} ImagingStudy resources for {stats['patients']} patients "
+                   f"in {stats['seconds']}s → {stats['path']} ({stats['file_bytes']:,} bytes)")
+        if stats["partial"]:
+            st.warning(f"⚠️ {stats['partial']} patients exported with priors missing from: " + ", ".join(
+                f"{v} ({n})" for v, n in sorted(stats["vendor_failures"].items())))
+        if stats["failed"]:
+            st.warning(f"{stats['failed']} patient lookups failed and were skipped.")
+        with open(path, "rb") as f:
+            st.download_button("Download NDJSON (gzip)", f, os.path.basename(path), "application/gzip")
+
+# ------------------------------------------------------------------
+# Metrics log
+# ------------------------------------------------------------------
+with tabs[4]:
+    st.subheader("Query Latency Trend")
+    store = get_metrics_store()
+    t1, t2 = st.columns(2)
+    granularity = t1.radio("Rollup", ["minute", "hour"], index=1, horizontal=True)
+    lookback_h = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 168, "Last 30 days": 720}[
+        t2.selectbox("Window", ["Last hour", "Last 24 hours", "Last 7 days", "Last 30 days"], index=2)]
+    since = time.time() - lookback_h * 3600
+    trend = pd.DataFrame(store.query_rollups(granularity, since))
+    if not trend.empty:
+        trend["bucket"] = pd.to_datetime(trend["bucket"], unit="s")
+        totals = store.stats()
+        st.caption(f"{totals['queries']} queries from {totals['sessions']} sessions recorded in {store.path}; "
+                   "charts read the pre-aggregated rollups.")
+        st.line_chart(trend.set_index("bucket")[["avg_s", "p50_s", "p95_s"]])
+        st.dataframe(trend, use_container_width=True, hide_index=True)
+        with st.expander("Per-vendor latency and errors over the window"):
+            st.dataframe(pd.DataFrame(store.vendor_rollups(granularity, since)), use_container_width=True,
+                         hide_index=True)
+        st.download_button("Download raw queries (CSV)", pd.DataFrame(store.recent(10000)).to_csv(index=False).encode(),
+                           "federated_query_metrics.csv", "text/csv")
+    else:
+        st.info("No federated queries recorded in this window yet.")
+
+    st.subheader("Recorded Runs (this session)")
     log = pd.DataFrame(st.session_state.run_log)
     if not log.empty:
         st.dataframe(log, use_container_width=True)
@@ -156,6 +465,81 @@ with tabs[3]:
                            "federated_query_runs.csv","text/csv")
     else:
         st.info("Run a unified query to log results.")
+    st.subheader("Result Cache")
+    cache_stats = get_result_cache().stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Hit rate", f"{cache_stats['hit_rate_pct']:.1f}%")
+    m2.metric("Hits / misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+    m3.metric("Entries", cache_stats["entries"])
+    m4.metric("Expired / evicted / invalidated",
+              f"{cache_stats['expired']} / {cache_stats['evictions']} / {cache_stats['invalidations']}")
+    if st.button("Clear result cache"):
+        st.info(f"Dropped {get_result_cache().invalidate()} cached lookups.")
+    st.subheader("Vendor Health")
+    health_rows = get_vendor_health().table(VENDOR_TIMEOUT_S)
+    if health_rows:
+        states = pd.Series([r["breaker"] for r in health_rows]).value_counts()
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Breakers closed", int(states.get("closed", 0)))
+        h2.metric("Open", int(states.get("open", 0)))
+        h3.metric("Half-open", int(states.get("half-open", 0)))
+        h4.metric("Hedged requests", sum(r["hedges"] for r in health_rows))
+        st.dataframe(pd.DataFrame(health_rows), use_container_width=True, hide_index=True)
+        if st.button("Reset breakers and latency history"):
+            get_vendor_health().reset()
+            st.rerun()
+    else:
+        st.info("Vendor latency history builds up as unified queries run (adaptive mode).")
+    st.subheader("Load Test")
+    st.caption("Concurrent simulated readers run back-to-back unified lookups against this instance; "
+               "patients follow a Zipf distribution, so a few are looked up over and over.")
+    l1, l2, l3, l4, l5 = st.columns(5)
+    levels = l1.text_input("Concurrent readers", "1,8,32,128", help="Comma-separated; one run per level.")
+    load_duration = l2.number_input("Seconds per level", 2, 120, 10)
+    fault_rate = l3.number_input("Injected vendor fault rate", 0.0, 0.5, 0.0, 0.01)
+    load_cache = l4.checkbox("Use result cache", value=True, key="load_cache")
+    load_adaptive = l5.checkbox("Adaptive timeouts & breakers", value=True, key="load_adaptive")
+    if st.button("Run load test"):
+        try:
+            readers_levels = [int(r) for r in levels.split(",") if r.strip()]
+        except ValueError:
+            st.error(f"❌ Concurrent readers must be comma-separated whole numbers, got {levels!r}.")
+            st.stop()
+        if not readers_levels or min(readers_levels) < 1:
+            st.error("❌ Enter at least one reader count of 1 or more.")
+            st.stop()
+        population = patient_population(get_prior_index().patient_ids(), 5000)
+        progress = st.progress(0.0)
+        # Private to this run: synthetic patients and injected faults must not evict real readers' lookups,
+        # open real breakers or skew the adaptive timeouts clinicians get
+        run_cache = ResultCache() if load_cache else None
+        run_health = VendorHealth() if load_adaptive else None
+        for i, readers in enumerate(readers_levels):
+            report = run_load_test(vendor_queries, ReaderWorkload(population, seed=readers), readers, load_duration,
+                                   VENDOR_TIMEOUT_S, cache=run_cache,
+                                   fault_rate=fault_rate, seed=readers,
+                                   health=run_health)
+            st.session_state.load_runs.append({"ts": datetime.now().isoformat(timespec="seconds"), **report["summary"]})
+            progress.progress((i + 1) / len(readers_levels), f"{readers} readers: "
+                              f"{report['summary']['throughput_per_s']:.1f} lookups/s")
+        st.session_state.load_vendors = report["vendors"]
+    if st.session_state.load_runs:
+        runs = pd.DataFrame(st.session_state.load_runs)
+        st.dataframe(runs, use_container_width=True, hide_index=True)
+        st.line_chart(runs.drop_duplicates("readers", keep="last").set_index("readers")[["p50_ms", "p95_ms", "p99_ms"]])
+        with st.expander("Per-vendor error rates (last level)"):
+            st.dataframe(pd.DataFrame(st.session_state.load_vendors), use_container_width=True, hide_index=True)
+    with st.expander("Prior-study index"):
+        st.dataframe(pd.DataFrame(get_prior_index().stats()), use_container_width=True, hide_index=True)
+    with st.expander(f"Vendor adapters ({len(get_registry())} registered in vendors.json)"):
+        st.dataframe(pd.DataFrame(get_registry().describe()), use_container_width=True, hide_index=True)
+    if ORTHANC_PACS_URL:
+        st.subheader("Orthanc Call Latency")
+        st.dataframe(pd.DataFrame(get_orthanc().latency_summary()), use_container_width=True)
+    if QIDO_PACS_URL:
+        st.subheader("QIDO-RS Call Latency")
+        st.dataframe(pd.DataFrame(get_qido().latency_summary()), use_container_width=True)
 
 st.divider()
-st.caption("Demo only. Philips & GE datasets are simulated. The unified query normalizes both into one FHIR-like schema.")
+st.caption("Demo only. Vendor datasets are simulated. The unified query normalizes every vendor into one FHIR-like schema "
+           "using the field mappings in vendors.json and exports it as FHIR ImagingStudy NDJSON.")
@@ -0,0 +1,85 @@
+"""
+Prior-study lookup benchmark: linear normalise-and-filter scan vs PriorStudyIndex.
+
+Generates N studies for P patients in one vendor's native schema, then times
+patient + modality + date-range lookups both ways (the scan is what
+filter_records did per query: normalise, strptime, compare).
+
+    python pacs_find_patient/bench_prior_index.py --studies 1000000 --patients 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from adapters import AdapterRegistry
+from prior_index import PriorStudyIndex
+
+MODALITIES = ["CT", "MR", "CR", "US", "MG", "XA"]
+
+
+def linear_scan(adapter, records, patient_id, modality, start, end):
+    out = []
+    for r in records:
+        n = adapter.normalize(r)
+        if patient_id and n["patient_id"] != patient_id:
+            continue
+        if modality and n["modality"] != modality:
+            continue
+        d = datetime.strptime(n["date"], "%Y-%m-%d").date()
+        if start and d < start or end and d > end:
+            continue
+        out.append(n)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--studies", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--scan-queries", type=int, default=3, help="Linear scans are slow; time only a few.")
+    parser.add_argument("--vendor", default="Sectra")
+    args = parser.parse_args()
+
+    adapter = AdapterRegistry.load().get(args.vendor)
+    rng = random.Random(7)
+    t0 = time.perf_counter()
+    records = [
+        adapter.to_native({
+            "patient_id": str(rng.randrange(args.patients)),
+            "study": "Prior",
+            "modality": rng.choice(MODALITIES),
+            "date": (date(2015, 1, 1) + timedelta(days=rng.randrange(3650))).isoformat(),
+        })
+        for _ in range(args.studies)
+    ]
+    print(f"generated {len(records):,} {args.vendor} studies in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    index = PriorStudyIndex()
+    index.sync(args.vendor, adapter.normalize_many(records))
+    print(f"vendor sync (normalise + index)  {time.perf_counter() - t0:.2f}s")
+
+    queries = [(str(rng.randrange(args.patients)), rng.choice(MODALITIES),
+                date(2018, 1, 1), date(2023, 12, 31)) for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    hits = sum(len(index.query(args.vendor, *q)) for q in queries)
+    per_index = (time.perf_counter() - t0) / len(queries)
+    print(f"index lookup                     {per_index * 1e6:9.1f} µs/query  ({hits / len(queries):.2f} hits/query)")
+
+    t0 = time.perf_counter()
+    scan_hits = [len(linear_scan(adapter, records, *q)) for q in queries[:args.scan_queries]]
+    per_scan = (time.perf_counter() - t0) / args.scan_queries
+    print(f"linear scan                      {per_scan * 1e3:9.1f} ms/query")
+    print(f"speed-up                         {per_scan / per_index:,.0f}x")
+
+    assert scan_hits == [len(index.query(args.vendor, *q)) for q in queries[:args.scan_queries]], "result mismatch"
+
+
+if __name__ == "__main__":
+    main()
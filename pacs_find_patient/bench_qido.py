@@ -0,0 +1,83 @@
+"""
+QIDO-RS adapter benchmark against the local stand-in.
+
+Loads N random studies into imaging_common/mock_qido.py, then times patient +
+modality + date-range lookups through the DICOMweb adapter: pooled QidoClient
+vs a fresh connection per request, and filters pushed into the query string
+vs fetching the patient's studies and filtering client-side. Use --tls-delay
+to add a per-connection handshake cost to the stand-in.
+
+    python pacs_find_patient/bench_qido.py --studies 20000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adapters import AdapterRegistry
+from imaging_common.mock_qido import random_studies, serve
+from imaging_common.qido_client import QidoClient, study_filters
+
+MODALITIES = ["CT", "MR", "CR", "US", "MG", "XA"]
+
+
+def lookup(client, adapter, patient_id, modality, start, end, page_size, push_down=True):
+    filters = study_filters(patient_id, modality, start, end) if push_down else study_filters(patient_id)
+    res = []
+    for page in client.iter_studies(filters, page_size=page_size, includefields=adapter.includefields):
+        res += adapter.normalize_many(page)
+    if not push_down:
+        lo, hi = start.isoformat(), end.isoformat()
+        res = [r for r in res if modality in str(r["modality"]).split("\\") and lo <= r["date"] <= hi]
+    return res
+
+
+class UnpooledClient(QidoClient):
+    """New TCP connection per request: what a bare requests.get per page costs."""
+
+    def request(self, method, path, timeout=None, **kwargs):
+        return requests.request(method, f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--studies", type=int, default=20_000)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--tls-delay", type=float, default=0.0, help="Seconds added to each new connection.")
+    args = parser.parse_args()
+
+    adapter = AdapterRegistry.load().get("DICOMweb PACS")
+    server, url = serve(studies=random_studies(args.studies, args.patients), connect_delay=args.tls_delay)
+    print(f"stand-in at {url} with {args.studies:,} studies for {args.patients:,} patients")
+
+    rng = random.Random(3)
+    queries = [(str(rng.randrange(args.patients)), rng.choice(MODALITIES), date(2018, 1, 1), date(2023, 12, 31))
+               for _ in range(args.queries)]
+
+    def run(label, client, push_down=True):
+        before = server.state.requests
+        t0 = time.perf_counter()
+        hits = sum(len(lookup(client, adapter, *q, args.page_size, push_down)) for q in queries)
+        elapsed = time.perf_counter() - t0
+        pages = server.state.requests - before
+        print(f"{label:<38} {elapsed / len(queries) * 1e3:8.2f} ms/lookup  {pages / len(queries):5.2f} pages/lookup  "
+              f"{hits / len(queries):6.2f} hits/lookup")
+        return hits
+
+    pooled = run("pooled session, filters pushed down", QidoClient(url))
+    unpooled = run("new connection per page", UnpooledClient(url))
+    client_side = run("pooled, client-side filtering", QidoClient(url), push_down=False)
+    assert pooled == unpooled == client_side, "result mismatch"
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
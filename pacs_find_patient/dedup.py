@@ -0,0 +1,74 @@
+"""
+Cross-vendor study deduplication for the unified prior list.
+
+The same exam is often reported by several archives under different
+descriptions ("CT Thorax" at Philips, "CT Chest" at GE). Descriptions are
+reduced to a canonical token set (lower-cased, punctuation and modality words
+dropped, synonyms mapped through SYNONYMS), records are blocked on
+(patient_id, date, modality), and records of one block with the same
+canonical description are merged into one row that keeps every source as
+provenance. One pass over the input with dict lookups: linear time, and the
+output keeps the input (date) order.
+"""
+import re
+
+# description token -> canonical token; multi-word phrases are rewritten first
+PHRASES = {
+    "w/o contrast": "noncontrast",
+    "without contrast": "noncontrast",
+    "w/ contrast": "contrast",
+    "with contrast": "contrast",
+    "w/wo contrast": "contrast noncontrast",
+}
+SYNONYMS = {
+    "thorax": "chest", "thoracic": "chest", "lung": "chest", "lungs": "chest",
+    "abd": "abdomen", "abdominal": "abdomen",
+    "head": "brain", "cranial": "brain", "cerebral": "brain",
+    "cspine": "spine", "lspine": "spine", "tspine": "spine", "spinal": "spine",
+    "xray": "", "radiograph": "", "scan": "", "study": "", "exam": "", "imaging": "",
+    "wc": "contrast", "iv": "contrast", "enhanced": "contrast",
+    "wo": "noncontrast", "unenhanced": "noncontrast", "plain": "noncontrast",
+}
+MODALITY_WORDS = {"ct", "cta", "mr", "mri", "mra", "cr", "dx", "xr", "us", "ultrasound", "mg", "mammo", "xa", "pet"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def canonical_description(description):
+    """'CT Thorax w/ contrast' -> 'chest contrast' (sorted canonical tokens)."""
+    text = str(description or "").lower()
+    for phrase, replacement in PHRASES.items():
+        if phrase in text:
+            text = text.replace(phrase, f" {replacement} ")
+    tokens = set()
+    for token in _TOKEN_RE.findall(text):
+        if token in MODALITY_WORDS:
+            continue
+        token = SYNONYMS.get(token, token)
+        if token:
+            tokens.update(token.split())
+    return " ".join(sorted(tokens))
+
+
+def dedupe(records):
+    """
+    Merge duplicates in unified records. Each output row is the first record seen
+    for its (patient, date, modality, canonical description) with provenance
+    added: `copies`, `also_at` (other vendors) and `sources` [(vendor, study)].
+    """
+    merged = {}
+    out = []
+    for rec in records:
+        key = (rec.get("patient_id"), rec.get("date"), rec.get("modality"), canonical_description(rec.get("study")))
+        row = merged.get(key)
+        if row is None:
+            row = dict(rec, copies=1, also_at="", sources=[(rec.get("vendor"), rec.get("study"))])
+            merged[key] = row
+            out.append(row)
+            continue
+        row["copies"] += 1
+        row["sources"].append((rec.get("vendor"), rec.get("study")))
+        vendor = rec.get("vendor")
+        if vendor != row.get("vendor") and vendor not in row["also_at"].split(", "):
+            row["also_at"] = f"{row['also_at']}, {vendor}" if row["also_at"] else vendor
+    return out
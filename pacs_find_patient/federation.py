@@ -0,0 +1,168 @@
+"""
+Concurrent fan-out of one patient query to every vendor archive.
+
+All vendor queries run as tasks in a single event loop, each bounded by its
+own timeout. A slow or failing vendor only costs its own timeout and never
+holds back the others, so the unified latency is the slowest *answered*
+vendor (capped by the timeouts), not the sum, and whatever arrived in time is
+returned as a partial result with a per-vendor status. With a result cache,
+vendors whose answer is cached are not called at all. An `on_result` callback
+sees each vendor the moment it answers; its date-sorted records are heap-merged
+into the running unified list, so a UI can render after the fastest vendor.
+With a VendorHealth, timeouts follow each vendor's observed p95, a duplicate
+request is hedged after its p90, and vendors with an open breaker are skipped.
+"""
+import asyncio
+import heapq
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TIMEOUT_S = 2.0
+
+# Blocking vendor clients run here rather than in the loop's default executor:
+# asyncio.run() joins that one on exit, which would make a hung vendor block
+# the partial result it timed out of.
+_BLOCKING_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="vendor")
+
+
+async def _call(fn):
+    """Await coroutine functions directly; run blocking callables on a worker thread."""
+    if inspect.iscoroutinefunction(fn):
+        return await fn()
+    return await asyncio.get_running_loop().run_in_executor(_BLOCKING_POOL, fn)
+
+
+async def _hedged(fn, hedge_after, state):
+    """First successful answer of `fn`, sending a second copy if the first is still out after `hedge_after`."""
+    first = asyncio.ensure_future(_call(fn))
+    if hedge_after is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+    state["hedged"] = True
+    second = asyncio.ensure_future(_call(fn))
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    state["hedge_won"] = task is second
+                    return task.result()
+        raise task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _run_vendor(vendor, fn, timeout, cache=None, key=None, health=None):
+    t0 = time.perf_counter()
+    if cache is not None:
+        records = cache.get(key)
+        if records is not None:
+            return {"vendor": vendor, "status": "ok", "records": records, "latency_s": time.perf_counter() - t0,
+                    "error": None, "cached": True, "hedged": False, "timeout_s": timeout}
+    hedge_after = None
+    if health is not None:
+        if not health.allow(vendor):
+            return {"vendor": vendor, "status": "open", "records": [], "latency_s": 0.0,
+                    "error": "circuit open: vendor skipped", "cached": False, "hedged": False, "timeout_s": 0.0}
+        timeout = health.timeout_for(vendor, timeout)
+        hedge_after = health.hedge_after(vendor)
+    state = {"hedged": False, "hedge_won": False}
+    try:
+        records = await asyncio.wait_for(_hedged(fn, hedge_after, state), timeout)
+        status, error = "ok", None
+        if cache is not None:
+            cache.put(key, records)
+    except asyncio.TimeoutError:
+        records, status, error = [], "timeout", f"no answer within {timeout:.1f}s"
+    except Exception as e:
+        records, status, error = [], "error", str(e)
+    latency = time.perf_counter() - t0
+    if health is not None:
+        health.record(vendor, latency, status, state["hedged"], state["hedge_won"])
+    return {
+        "vendor": vendor,
+        "status": status,
+        "records": records,
+        "latency_s": latency,
+        "error": error,
+        "cached": False,
+        "hedged": state["hedged"],
+        "timeout_s": timeout,
+    }
+
+
+def _by_date(rec):
+    return rec.get("date") or ""
+
+
+async def fan_out_async(queries, timeouts=None, default_timeout=DEFAULT_TIMEOUT_S, cache=None, cache_key=None,
+                        on_result=None, health=None):
+    """
+    `queries` maps vendor -> zero-argument callable (sync or async) returning a list
+    of unified records. With a ResultCache, `cache_key(vendor)` gives each vendor's
+    key; only successful answers are stored. `on_result(result, merged)` is called
+    in completion order with the vendor's result and the unified records so far.
+    `health` (a VendorHealth) turns on adaptive timeouts, hedging and breakers.
+    Returns (per-vendor result dicts in query order, wall seconds).
+    """
+    timeouts = timeouts or {}
+    t0 = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(_run_vendor(vendor, fn, timeouts.get(vendor, default_timeout),
+                                          cache, cache_key(vendor) if cache is not None else None, health))
+        for vendor, fn in queries.items()
+    ]
+    merged = []
+    for next_done in asyncio.as_completed(tasks):
+        result = await next_done
+        result["records"].sort(key=_by_date)   # vendors usually answer sorted already: near O(n)
+        result["arrived_s"] = time.perf_counter() - t0
+        merged = merge_sorted(merged, result["records"])
+        if on_result:
+            on_result(result, merged)
+    return [t.result() for t in tasks], time.perf_counter() - t0
+
+
+def fan_out(queries, timeouts=None, default_timeout=DEFAULT_TIMEOUT_S, cache=None, cache_key=None, on_result=None,
+            health=None):
+    """Blocking wrapper for Streamlit: one event loop for the whole fan-out."""
+    return asyncio.run(fan_out_async(queries, timeouts, default_timeout, cache, cache_key, on_result, health))
+
+
+def merge_sorted(merged, records):
+    """Heap-merge date-sorted `records` into the date-sorted `merged` list (linear)."""
+    if not merged:
+        return list(records)
+    return list(heapq.merge(merged, records, key=_by_date))
+
+
+def merge_records(results):
+    """All records that arrived, oldest study first, merged from the per-vendor sorted lists."""
+    return list(heapq.merge(*(sorted(r["records"], key=_by_date) for r in results), key=_by_date))
+
+
+STATUS_BADGES = {"ok": ":green[●]", "timeout": ":orange[●]", "error": ":red[●]", "open": ":violet[⊘]"}
+
+
+def status_badge(result=None, vendor=None):
+    """Markdown badge for one vendor: pending, answered (live or cached), timed out or failed."""
+    if result is None:
+        return f":gray[○ {vendor} …]"
+    if result["status"] == "ok":
+        source = "cache" if result["cached"] else f"{result['latency_s']:.2f}s" + (" · hedged" if result["hedged"] else "")
+        return f"{STATUS_BADGES['ok']} {result['vendor']} · {len(result['records'])} · {source}"
+    return f"{STATUS_BADGES.get(result['status'], '●')} {result['vendor']} · {result['status']}"
+
+
+def status_table(results):
+    return [
+        {"vendor": r["vendor"], "status": r["status"], "cached": r["cached"], "records": len(r["records"]),
+         "latency_s": round(r["latency_s"], 3), "timeout_s": round(r["timeout_s"], 2), "hedged": r["hedged"],
+         "error": r["error"] or ""}
+        for r in results
+    ]
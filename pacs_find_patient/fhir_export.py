@@ -0,0 +1,179 @@
+"""
+Streaming FHIR R4 ImagingStudy export of the unified prior view.
+
+Unified study records (one vendor's or merged by dedupe) become ImagingStudy
+resources, one JSON object per line (NDJSON, as in FHIR Bulk Data). Patient
+lists are read lazily and looked up by a bounded number of workers. Resources
+are buffered only up to chunk_size lines before each write, so memory stays
+flat however many patients are exported. Output may be gzip-compressed
+(.ndjson.gz).
+
+    python pacs_find_patient/fhir_export.py --patients ids.txt --out priors.ndjson.gz
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+EXPORT_DIR = os.environ.get("PACS_EXPORT_DIR", os.path.expanduser("~/.pacs_find_patient/exports"))
+CHUNK_SIZE = int(os.environ.get("PACS_EXPORT_CHUNK", "500"))
+EXPORT_CONCURRENCY = int(os.environ.get("PACS_EXPORT_CONCURRENCY", "4"))
+
+DCM_SYSTEM = "http://dicom.nema.org/resources/ontology/DCM"
+VENDOR_SYSTEM = "urn:pacs-federation:vendor:"
+_FHIR_ID_RE = re.compile(r"^[A-Za-z0-9\-.]{1,64}$")
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-")
+
+
+def study_id(record):
+    """Stable resource id: the same study exports under the same id every time."""
+    key = "|".join(str(record.get(f) or "") for f in ("patient_id", "date", "modality", "study", "vendor"))
+    return hashlib.sha1(key.encode()).hexdigest()[:32]
+
+
+def imaging_study(record):
+    """One unified record -> FHIR R4 ImagingStudy; merged duplicates keep one identifier per source vendor."""
+    pid = str(record.get("patient_id") or "")
+    sources = record.get("sources") or [(record.get("vendor"), record.get("study"))]
+    resource = {
+        "resourceType": "ImagingStudy",
+        "id": study_id(record),
+        "meta": {"source": f"{VENDOR_SYSTEM}{_slug(record.get('vendor'))}"},
+        "identifier": [{"system": f"{VENDOR_SYSTEM}{_slug(vendor)}", "value": f"{pid}|{record.get('date')}|{study}"}
+                       for vendor, study in sources],
+        "status": "available",
+        "subject": {"reference": f"Patient/{pid}"} if _FHIR_ID_RE.match(pid) else {"identifier": {"value": pid}},
+    }
+    modalities = [m.strip() for m in str(record.get("modality") or "").split("\\") if m.strip()]
+    if modalities:
+        resource["modality"] = [{"system": DCM_SYSTEM, "code": m} for m in modalities]
+    if record.get("date"):
+        resource["started"] = str(record["date"])[:10]
+    if record.get("study"):
+        resource["description"] = str(record["study"])
+    return resource
+
+
+def ndjson_lines(records):
+    """Encoded NDJSON lines, one ImagingStudy per record."""
+    for record in records:
+        yield json.dumps(imaging_study(record), separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+
+
+async def export_patients_async(patient_ids, lookup, out, chunk_size=CHUNK_SIZE, concurrency=EXPORT_CONCURRENCY,
+                                on_progress=None):
+    """
+    `lookup(patient_id)` is a coroutine returning that patient's unified records and the per-vendor
+    fan-out results. A patient with any vendor not "ok" (timeout, error, open breaker) is exported
+    with what the other vendors returned and counted as partial. `concurrency` workers pull IDs from
+    the (possibly lazy) iterable, so only that many lookups are in flight.
+    """
+    ids = iter(patient_ids)
+    buf = []
+    stats = {"patients": 0, "studies": 0, "bytes": 0, "chunks": 0, "failed": 0, "partial": 0,
+             "vendor_failures": {}}
+
+    def flush():
+        if buf:
+            data = b"".join(buf)
+            out.write(data)
+            stats["bytes"] += len(data)
+            stats["chunks"] += 1
+            buf.clear()
+
+    async def worker():
+        for pid in ids:   # the shared iterator hands each ID to exactly one worker
+            pid = str(pid).strip()
+            if not pid:
+                continue
+            try:
+                records, results = await lookup(pid)
+            except Exception:
+                stats["failed"] += 1
+                continue
+            missing = [r["vendor"] for r in results if r["status"] != "ok"]
+            if missing:
+                stats["partial"] += 1
+                for vendor in missing:
+                    stats["vendor_failures"][vendor] = stats["vendor_failures"].get(vendor, 0) + 1
+            for line in ndjson_lines(records):
+                buf.append(line)
+                stats["studies"] += 1
+                if len(buf) >= chunk_size:
+                    flush()
+            stats["patients"] += 1
+            if on_progress:
+                on_progress(stats)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    flush()
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+
+def export_patients(patient_ids, lookup, path, chunk_size=CHUNK_SIZE, concurrency=EXPORT_CONCURRENCY,
+                    on_progress=None):
+    """Blocking export to `path` (gzip when it ends in .gz); returns the export stats."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as out:
+        stats = asyncio.run(export_patients_async(patient_ids, lookup, out, chunk_size, concurrency, on_progress))
+    stats["path"] = path
+    stats["file_bytes"] = os.path.getsize(path)
+    return stats
+
+
+def main():
+    from adapters import AdapterRegistry
+    from dedup import dedupe
+    from federation import fan_out_async, merge_records
+    from load_test import simulated_layer
+    from prior_index import PriorStudyIndex
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patients", help="File with one patient ID per line (default: every indexed patient).")
+    parser.add_argument("--out", default=os.path.join(EXPORT_DIR, "priors.ndjson.gz"))
+    parser.add_argument("--modality", default="")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=EXPORT_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=1.5)
+    parser.add_argument("--no-dedupe", action="store_true")
+    args = parser.parse_args()
+
+    registry = AdapterRegistry.load()
+    index = PriorStudyIndex()
+    for adapter in registry:
+        if adapter.source == "simulated":
+            index.sync(adapter.name, adapter.normalize_many(adapter.simulate()))
+    make_queries = simulated_layer(registry, index)
+
+    async def lookup(pid):
+        results, _ = await fan_out_async(make_queries(pid, args.modality, None, None), default_timeout=args.timeout)
+        merged = merge_records(results)
+        return (merged if args.no_dedupe else dedupe(merged)), results
+
+    if args.patients:
+        with open(args.patients, encoding="utf-8") as f:
+            stats = export_patients((line.strip() for line in f), lookup, args.out, args.chunk, args.concurrency)
+    else:
+        stats = export_patients(index.patient_ids(), lookup, args.out, args.chunk, args.concurrency)
+    print(f"exported {stats['studies']} ImagingStudy resources for {stats['patients']} patients "
+          f"({stats['partial']} partial, {stats['failed']} failed) to {stats['path']} in {stats['seconds']}s, "
+          f"{stats['file_bytes']:,} bytes")
+    for vendor, n in sorted(stats["vendor_failures"].items()):
+        print(f"  {vendor}: no answer for {n} patients")
+
+
+if __name__ == "__main__":
+    main()
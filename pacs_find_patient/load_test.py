@@ -0,0 +1,201 @@
+"""
+Load generator for the federated query layer.
+
+N simulated radiologists ("readers") share one event loop, each running patient
+lookups back to back (optionally with exponential think time) through
+fan_out_async, exactly as the Unified view does. Patients are drawn from a
+Zipf distribution over a population, so a few current patients are looked up
+again and again while a long tail is seen once, which is what decides the
+result-cache hit rate. Modalities follow a reading-room mix and look-back
+windows are 1, 2 or 5 years. The report gives throughput, p50/p95/p99 lookup
+latency and per-vendor timeout/error rates for the readers level.
+
+    python pacs_find_patient/load_test.py --readers 1,8,32,128 --duration 10
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from functools import partial
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from federation import fan_out_async
+from result_cache import lookup_key
+
+MODALITY_MIX = {"CT": 0.40, "MR": 0.25, "CR": 0.20, "US": 0.10, "MG": 0.05}
+LOOKBACK_YEARS = (1, 2, 5)
+
+
+def patient_population(known=(), size=5000):
+    """`known` patient IDs first (the hot end of the Zipf ranking), padded with synthetic IDs to `size`."""
+    known = list(dict.fromkeys(known))
+    return known + [f"LT{i:06d}" for i in range(max(0, size - len(known)))]
+
+
+class ReaderWorkload:
+    """Stream of (patient_id, modality, start, end) lookups with a realistic patient and modality mix."""
+
+    def __init__(self, patient_ids, zipf_s=1.1, modality_mix=MODALITY_MIX, seed=None):
+        self.patients = list(patient_ids)
+        self.cum_weights = list(itertools.accumulate(1.0 / rank ** zipf_s for rank in range(1, len(self.patients) + 1)))
+        self.modalities, self.modality_weights = list(modality_mix), list(modality_mix.values())
+        self.rng = random.Random(seed)
+
+    def next(self, today=None):
+        end = today or date.today()
+        return (
+            self.rng.choices(self.patients, cum_weights=self.cum_weights)[0],
+            self.rng.choices(self.modalities, weights=self.modality_weights)[0],
+            end - timedelta(days=365 * self.rng.choice(LOOKBACK_YEARS)),
+            end,
+        )
+
+
+def with_faults(queries, rate, rng):
+    """Wrap vendor queries so each call fails with probability `rate` (injected vendor errors)."""
+    def wrap(vendor, fn):
+        def fault():
+            if rng.random() < rate:
+                raise ConnectionError(f"injected fault at {vendor}")
+
+        async def call_async():
+            fault()
+            return await fn()
+
+        def call():
+            fault()
+            return fn()
+        return call_async if asyncio.iscoroutinefunction(fn) else call
+    return {vendor: wrap(vendor, fn) for vendor, fn in queries.items()}
+
+
+async def run_load_async(make_queries, workload, readers, duration_s, timeout, cache=None, fault_rate=0.0,
+                         think_s=0.0, seed=None, health=None):
+    """
+    `make_queries(patient_id, modality, start, end)` returns the vendor -> query mapping
+    fan_out takes. Runs `readers` concurrent readers for `duration_s` and returns the report.
+    """
+    rng = random.Random(seed)
+    latencies, partial_lookups, vendors = [], [0], {}
+    deadline = time.perf_counter() + duration_s
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            q = workload.next()
+            queries = make_queries(*q)
+            if fault_rate:
+                queries = with_faults(queries, fault_rate, rng)
+            results, wall = await fan_out_async(queries, default_timeout=timeout, cache=cache,
+                                                cache_key=lambda v: lookup_key(v, *q), health=health)
+            latencies.append(wall)
+            partial_lookups[0] += any(r["status"] != "ok" for r in results)
+            for r in results:
+                v = vendors.setdefault(r["vendor"], {"calls": 0, "ok": 0, "timeout": 0, "error": 0, "open": 0,
+                                                     "cached": 0, "latencies": []})
+                v["calls"] += 1
+                v[r["status"]] += 1
+                v["cached"] += r["cached"]
+                if not r["cached"]:
+                    v["latencies"].append(r["latency_s"])
+            if think_s:
+                await asyncio.sleep(rng.expovariate(1.0 / think_s))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(readers)))
+    return load_report(readers, time.perf_counter() - t0, latencies, partial_lookups[0], vendors)
+
+
+def run_load_test(make_queries, workload, readers, duration_s, timeout, cache=None, fault_rate=0.0,
+                  think_s=0.0, seed=None, health=None):
+    """Blocking wrapper: all readers in one event loop."""
+    return asyncio.run(run_load_async(make_queries, workload, readers, duration_s, timeout, cache,
+                                      fault_rate, think_s, seed, health))
+
+
+def load_report(readers, elapsed, latencies, partial_lookups, vendors):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    calls = sum(v["calls"] for v in vendors.values())
+    summary = {
+        "readers": readers,
+        "lookups": len(latencies),
+        "duration_s": round(elapsed, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(p50 * 1000, 1),
+        "p95_ms": round(p95 * 1000, 1),
+        "p99_ms": round(p99 * 1000, 1),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+        "partial_pct": round(100.0 * partial_lookups / len(latencies), 1) if latencies else 0.0,
+        "cache_hit_pct": round(100.0 * sum(v["cached"] for v in vendors.values()) / calls, 1) if calls else 0.0,
+    }
+    per_vendor = [
+        {"vendor": name, "calls": v["calls"], "timeouts": v["timeout"], "errors": v["error"],
+         "short_circuited": v["open"],
+         "error_rate_pct": round(100.0 * (v["timeout"] + v["error"] + v["open"]) / v["calls"], 2),
+         "p95_ms": round(float(np.percentile(v["latencies"], 95)) * 1000, 1) if v["latencies"] else 0.0}
+        for name, v in sorted(vendors.items())
+    ]
+    return {"summary": summary, "vendors": per_vendor}
+
+
+def simulated_layer(registry, index):
+    """make_queries over the registry's simulated vendors, served from `index` with their declared latency."""
+    async def call(adapter, patient_id, modality, start, end):
+        await asyncio.sleep(adapter.sample_latency())
+        return adapter.cap(index.query(adapter.name, patient_id, modality, start, end))
+
+    def make_queries(patient_id, modality, start, end):
+        return {a.name: partial(call, a, patient_id, modality, start, end)
+                for a in registry.for_query(modality) if a.source == "simulated"}
+    return make_queries
+
+
+def main():
+    from adapters import AdapterRegistry
+    from prior_index import PriorStudyIndex
+    from resilience import VendorHealth
+    from result_cache import ResultCache
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", default="1,8,32,128", help="Comma-separated concurrency levels.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level.")
+    parser.add_argument("--timeout", type=float, default=1.5, help="Per-vendor timeout (s).")
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--think", type=float, default=0.0, help="Mean think time between a reader's lookups (s).")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Probability a vendor call fails.")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adaptive timeouts, hedged requests and circuit breakers (VendorHealth).")
+    args = parser.parse_args()
+
+    registry = AdapterRegistry.load()
+    index = PriorStudyIndex()
+    for adapter in registry:
+        if adapter.source == "simulated":
+            index.sync(adapter.name, adapter.normalize_many(adapter.simulate()))
+    make_queries = simulated_layer(registry, index)
+    population = patient_population(("123", "456"), args.patients)
+
+    print(f"{'readers':>7} {'lookups':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'partial%':>8} {'cache%':>7}")
+    for readers in (int(r) for r in args.readers.split(",")):
+        report = run_load_test(make_queries, ReaderWorkload(population, args.zipf, seed=readers), readers,
+                               args.duration, args.timeout, cache=None if args.no_cache else ResultCache(),
+                               fault_rate=args.fault_rate, think_s=args.think, seed=readers,
+                               health=VendorHealth() if args.adaptive else None)
+        s = report["summary"]
+        print(f"{readers:>7} {s['lookups']:>8} {s['throughput_per_s']:>8.1f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+              f"{s['p99_ms']:>8.1f} {s['partial_pct']:>8.1f} {s['cache_hit_pct']:>7.1f}")
+    print("\nper-vendor, last level:")
+    for v in report["vendors"]:
+        print(f"  {v['vendor']:<30} {v['calls']:>7} calls  {v['error_rate_pct']:6.2f}% failed  p95 {v['p95_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
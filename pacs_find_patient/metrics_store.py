@@ -0,0 +1,273 @@
+"""
+Durable SQLite store for federated query metrics.
+
+Every unified query appends one row to `queries` and one row per vendor to
+`vendor_calls`. In the same transaction it folds into minute and hour rollups
+(counts, sums, max and a fixed-bucket latency histogram), so trend charts read
+a few hundred pre-aggregated rows whatever the raw volume, and percentiles
+come from the merged histograms. Raw rows can be pruned after
+PACS_METRICS_RAW_DAYS while the rollups stay. No patient identifiers are
+written, only modality and timing.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+METRICS_PATH = os.environ.get("PACS_METRICS_PATH", os.path.expanduser("~/.pacs_find_patient/metrics.sqlite3"))
+METRICS_RAW_DAYS = float(os.environ.get("PACS_METRICS_RAW_DAYS", "30"))
+
+# latency histogram upper bounds (s); the last bucket is everything slower
+LATENCY_BUCKETS_S = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0, 5.0, 10.0)
+ROLLUPS = {"minute": 60, "hour": 3600}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id              INTEGER PRIMARY KEY,
+    ts              REAL NOT NULL,
+    session         TEXT,
+    modality        TEXT,
+    vendors         INTEGER,
+    vendors_ok      INTEGER,
+    cache_hits      INTEGER,
+    hedged          INTEGER,
+    records         INTEGER,
+    unique_studies  INTEGER,
+    federated_s     REAL,
+    fragmented_s    REAL,
+    first_result_s  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_queries_ts ON queries (ts);
+CREATE TABLE IF NOT EXISTS vendor_calls (
+    query_id   INTEGER NOT NULL,
+    ts         REAL NOT NULL,
+    vendor     TEXT NOT NULL,
+    status     TEXT,
+    cached     INTEGER,
+    hedged     INTEGER,
+    records    INTEGER,
+    latency_s  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_vendor_calls_ts ON vendor_calls (ts);
+CREATE TABLE IF NOT EXISTS query_rollups (
+    kind        TEXT NOT NULL,
+    bucket      INTEGER NOT NULL,
+    queries     INTEGER NOT NULL,
+    partial     INTEGER NOT NULL,
+    cache_hits  INTEGER NOT NULL,
+    vendor_calls INTEGER NOT NULL,
+    hedged      INTEGER NOT NULL,
+    records     INTEGER NOT NULL,
+    sum_s       REAL NOT NULL,
+    max_s       REAL NOT NULL,
+    hist        TEXT NOT NULL,
+    PRIMARY KEY (kind, bucket)
+);
+CREATE TABLE IF NOT EXISTS vendor_rollups (
+    kind        TEXT NOT NULL,
+    bucket      INTEGER NOT NULL,
+    vendor      TEXT NOT NULL,
+    calls       INTEGER NOT NULL,
+    ok          INTEGER NOT NULL,
+    timeouts    INTEGER NOT NULL,
+    errors      INTEGER NOT NULL,
+    short_circuited INTEGER NOT NULL,
+    cached      INTEGER NOT NULL,
+    hedged      INTEGER NOT NULL,
+    records     INTEGER NOT NULL,
+    sum_s       REAL NOT NULL,
+    max_s       REAL NOT NULL,
+    hist        TEXT NOT NULL,
+    PRIMARY KEY (kind, bucket, vendor)
+);
+"""
+
+
+def bucket_index(seconds):
+    for i, bound in enumerate(LATENCY_BUCKETS_S):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS_S)
+
+
+def _hist(latencies):
+    counts = [0] * (len(LATENCY_BUCKETS_S) + 1)
+    for s in latencies:
+        counts[bucket_index(s)] += 1
+    return counts
+
+
+def _merge(stored, counts):
+    return ",".join(str(int(a) + b) for a, b in zip(stored.split(","), counts)) if stored else ",".join(map(str, counts))
+
+
+def hist_percentile(hist, pct, max_s=None):
+    """Upper bound (s) of the bucket holding the pct-th percentile; None for an empty histogram.
+
+    The overflow bucket has no upper bound, so it reports the recorded max (or the last finite
+    bound when no max is known) rather than inf, which charts cannot plot.
+    """
+    counts = [int(c) for c in hist.split(",")] if isinstance(hist, str) else hist
+    total = sum(counts)
+    if not total:
+        return None
+    target, seen = total * pct / 100.0, 0
+    for i, c in enumerate(counts[:len(LATENCY_BUCKETS_S)]):
+        seen += c
+        if seen >= target:
+            return LATENCY_BUCKETS_S[i]
+    return round(max(max_s or 0.0, LATENCY_BUCKETS_S[-1]), 3)
+
+
+class MetricsStore:
+    """One connection shared by all threads of the server process, serialised by a lock."""
+
+    def __init__(self, path=METRICS_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    # ---------- writes ----------
+    def record_query(self, summary, results, ts=None, session=None):
+        """
+        Append one federated query: `summary` carries the run-log fields (modality, federated_s,
+        fragmented_s, first_result_s, records, unique_studies), `results` the per-vendor fan-out results.
+        """
+        ts = ts or time.time()
+        partial = any(r["status"] != "ok" for r in results)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                """INSERT INTO queries (ts, session, modality, vendors, vendors_ok, cache_hits, hedged, records,
+                                        unique_studies, federated_s, fragmented_s, first_result_s)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (ts, session, summary.get("modality") or "", len(results),
+                 sum(r["status"] == "ok" for r in results), sum(r["cached"] for r in results),
+                 sum(r.get("hedged", False) for r in results), summary.get("records", 0),
+                 summary.get("unique_studies"), summary.get("federated_s"), summary.get("fragmented_s"),
+                 summary.get("first_result_s")),
+            )
+            query_id = cur.lastrowid
+            self._conn.executemany(
+                """INSERT INTO vendor_calls (query_id, ts, vendor, status, cached, hedged, records, latency_s)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(query_id, ts, r["vendor"], r["status"], int(r["cached"]), int(r.get("hedged", False)),
+                  len(r["records"]), r["latency_s"]) for r in results],
+            )
+            for kind, width in ROLLUPS.items():
+                bucket = int(ts // width * width)
+                self._fold_query(kind, bucket, summary, results, partial)
+                for r in results:
+                    self._fold_vendor(kind, bucket, r)
+        return query_id
+
+    def _fold_query(self, kind, bucket, summary, results, partial):
+        federated = summary.get("federated_s") or 0.0
+        row = self._conn.execute("SELECT hist FROM query_rollups WHERE kind = ? AND bucket = ?",
+                                 (kind, bucket)).fetchone()
+        self._conn.execute(
+            """INSERT INTO query_rollups (kind, bucket, queries, partial, cache_hits, vendor_calls, hedged, records,
+                                          sum_s, max_s, hist)
+               VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(kind, bucket) DO UPDATE SET
+                   queries = queries + 1, partial = partial + excluded.partial,
+                   cache_hits = cache_hits + excluded.cache_hits, vendor_calls = vendor_calls + excluded.vendor_calls,
+                   hedged = hedged + excluded.hedged, records = records + excluded.records,
+                   sum_s = sum_s + excluded.sum_s, max_s = MAX(max_s, excluded.max_s), hist = excluded.hist""",
+            (kind, bucket, int(partial), sum(r["cached"] for r in results), len(results),
+             sum(r.get("hedged", False) for r in results), summary.get("records", 0), federated, federated,
+             _merge(row["hist"] if row else "", _hist([federated]))),
+        )
+
+    def _fold_vendor(self, kind, bucket, r):
+        row = self._conn.execute("SELECT hist FROM vendor_rollups WHERE kind = ? AND bucket = ? AND vendor = ?",
+                                 (kind, bucket, r["vendor"])).fetchone()
+        latency = None if r["cached"] or r["status"] == "open" else r["latency_s"]   # only real vendor calls
+        self._conn.execute(
+            """INSERT INTO vendor_rollups (kind, bucket, vendor, calls, ok, timeouts, errors, short_circuited, cached,
+                                           hedged, records, sum_s, max_s, hist)
+               VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(kind, bucket, vendor) DO UPDATE SET
+                   calls = calls + 1, ok = ok + excluded.ok, timeouts = timeouts + excluded.timeouts,
+                   errors = errors + excluded.errors, short_circuited = short_circuited + excluded.short_circuited,
+                   cached = cached + excluded.cached, hedged = hedged + excluded.hedged,
+                   records = records + excluded.records, sum_s = sum_s + excluded.sum_s,
+                   max_s = MAX(max_s, excluded.max_s), hist = excluded.hist""",
+            (kind, bucket, r["vendor"], int(r["status"] == "ok"), int(r["status"] == "timeout"),
+             int(r["status"] == "error"), int(r["status"] == "open"), int(r["cached"]),
+             int(r.get("hedged", False)), len(r["records"]), latency or 0.0, latency or 0.0,
+             _merge(row["hist"] if row else "", _hist([latency] if latency is not None else []))),
+        )
+
+    def prune(self, raw_days=METRICS_RAW_DAYS):
+        """Drop raw rows older than `raw_days`; rollups are kept. Returns the number of queries removed."""
+        cutoff = time.time() - raw_days * 86400
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM vendor_calls WHERE ts < ?", (cutoff,))
+            return self._conn.execute("DELETE FROM queries WHERE ts < ?", (cutoff,)).rowcount
+
+    # ---------- reads ----------
+    def query_rollups(self, kind="hour", since=None):
+        """Pre-aggregated query latency per bucket, oldest first, with histogram percentiles."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM query_rollups WHERE kind = ? AND bucket >= ? ORDER BY bucket",
+                (kind, since or 0),
+            ).fetchall()
+        return [{
+            "bucket": r["bucket"], "queries": r["queries"],
+            "avg_s": round(r["sum_s"] / r["queries"], 3), "p50_s": hist_percentile(r["hist"], 50, r["max_s"]),
+            "p95_s": hist_percentile(r["hist"], 95, r["max_s"]), "max_s": round(r["max_s"], 3),
+            "partial_pct": round(100.0 * r["partial"] / r["queries"], 1),
+            "cache_hit_pct": round(100.0 * r["cache_hits"] / r["vendor_calls"], 1) if r["vendor_calls"] else 0.0,
+            "hedged": r["hedged"], "records": r["records"],
+        } for r in rows]
+
+    def vendor_rollups(self, kind="hour", since=None):
+        """Per-vendor totals over the buckets since `since`, merged from the rollups."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM vendor_rollups WHERE kind = ? AND bucket >= ? ORDER BY vendor, bucket",
+                (kind, since or 0),
+            ).fetchall()
+        vendors = {}
+        for r in rows:
+            v = vendors.setdefault(r["vendor"], {"vendor": r["vendor"], "calls": 0, "ok": 0, "timeouts": 0,
+                                                 "errors": 0, "short_circuited": 0, "cached": 0, "hedged": 0,
+                                                 "sum_s": 0.0, "max_s": 0.0, "hist": ""})
+            for k in ("calls", "ok", "timeouts", "errors", "short_circuited", "cached", "hedged", "sum_s"):
+                v[k] += r[k]
+            v["max_s"] = max(v["max_s"], r["max_s"])
+            v["hist"] = _merge(v["hist"], [int(c) for c in r["hist"].split(",")])
+        out = []
+        for v in vendors.values():
+            live = sum(int(c) for c in v["hist"].split(","))
+            out.append({
+                "vendor": v["vendor"], "calls": v["calls"],
+                "error_rate_pct": round(100.0 * (v["timeouts"] + v["errors"] + v["short_circuited"]) / v["calls"], 2),
+                "timeouts": v["timeouts"], "errors": v["errors"], "short_circuited": v["short_circuited"],
+                "cache_hit_pct": round(100.0 * v["cached"] / v["calls"], 1), "hedged": v["hedged"],
+                "avg_s": round(v["sum_s"] / live, 3) if live else None,
+                "p50_s": hist_percentile(v["hist"], 50, v["max_s"]),
+                "p95_s": hist_percentile(v["hist"], 95, v["max_s"]),
+                "max_s": round(v["max_s"], 3),
+            })
+        return out
+
+    def recent(self, limit=500):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute("SELECT * FROM queries ORDER BY ts DESC LIMIT ?", (int(limit),))]
+
+    def stats(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS queries, MIN(ts) AS first_ts, COUNT(DISTINCT session) AS sessions FROM queries"
+            ).fetchone()
+            calls = self._conn.execute("SELECT COUNT(*) FROM vendor_calls").fetchone()[0]
+        return dict(row, vendor_calls=calls)
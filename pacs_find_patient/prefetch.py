@@ -0,0 +1,272 @@
+"""
+Worklist-driven background prefetch of prior studies.
+
+The day's reading worklist (CSV or an HL7 v2 ORM^O01 feed) lists who will be
+read, what modality and when. A background thread wakes every poll_s and, for
+each study whose scheduled time is within lead_s, runs the same federated
+prior lookup the Unified view runs on click, with at most max_concurrency
+studies in flight. Successful vendor answers are written straight into the
+ResultCache under the click's key, so the click is a cache hit. Entries
+are re-warmed before the cache TTL runs out until grace_s after their
+scheduled time; cancelled orders (ORC-1 = CA/DC) are dropped.
+"""
+import asyncio
+import csv
+import io
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from federation import fan_out_async
+from result_cache import lookup_key
+
+PREFETCH_LEAD_S = float(os.environ.get("PACS_PREFETCH_LEAD_S", "1800"))
+PREFETCH_GRACE_S = float(os.environ.get("PACS_PREFETCH_GRACE_S", "3600"))
+PREFETCH_CONCURRENCY = int(os.environ.get("PACS_PREFETCH_CONCURRENCY", "4"))
+PREFETCH_POLL_S = float(os.environ.get("PACS_PREFETCH_POLL_S", "15"))
+
+# unified worklist field -> accepted CSV headers (compared lower-cased, without spaces/underscores)
+CSV_COLUMNS = {
+    "patient_id": ("patientid", "pid", "mrn"),
+    "modality": ("modality",),
+    "scheduled": ("scheduled", "scheduledtime", "scheduledat", "time", "start"),
+    "accession": ("accession", "accessionnumber", "accessionno"),
+    "description": ("description", "procedure", "study", "studydescription"),
+}
+CANCEL_CONTROLS = {"CA", "DC", "OC"}
+
+
+def parse_time(value, today=None):
+    """HL7 TS (YYYYMMDD[HHMM[SS]]), ISO datetime or a bare HH:MM (today) -> datetime; None when unreadable."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    today = today or date.today()
+    digits = value.split(".")[0].split("+")[0].split("-")[0] if value[:8].isdigit() else ""
+    if len(digits) >= 8:
+        return datetime.strptime(digits[:14].ljust(14, "0"), "%Y%m%d%H%M%S")
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.combine(today, datetime.strptime(value, "%H:%M").time())
+    except ValueError:
+        return None
+
+
+def parse_worklist_csv(text, today=None):
+    reader = csv.DictReader(io.StringIO(text))
+    headers = {h: h.lower().replace(" ", "").replace("_", "") for h in reader.fieldnames or []}
+    column = {field: next((h for h, norm in headers.items() if norm in names), None)
+              for field, names in CSV_COLUMNS.items()}
+    if column["patient_id"] is None:
+        raise ValueError("Worklist CSV needs a patient_id (or PatientID / MRN) column")
+    entries = []
+    for i, row in enumerate(reader):
+        get = lambda field: (row.get(column[field]) or "").strip() if column[field] else ""
+        if not get("patient_id"):
+            continue
+        entries.append({
+            "accession": get("accession") or f"row{i + 1}",
+            "patient_id": get("patient_id"),
+            "modality": get("modality").upper(),
+            "scheduled": parse_time(get("scheduled"), today),
+            "description": get("description"),
+        })
+    return entries
+
+
+def _component(field, i=0):
+    parts = field.split("^")
+    return parts[i].strip() if i < len(parts) else ""
+
+
+def parse_hl7_orm(text):
+    """ORM^O01 messages -> worklist entries; later cancel messages remove earlier orders."""
+    entries, order = {}, []
+    for message in _hl7_messages(text):
+        seg = {}
+        for line in message:
+            fields = line.split("|")
+            seg.setdefault(fields[0], fields)
+        pid, orc, obr, tq1 = seg.get("PID"), seg.get("ORC", []), seg.get("OBR"), seg.get("TQ1", [])
+        if not pid or not obr:
+            continue
+        field = lambda s, n: s[n] if len(s) > n else ""
+        accession = field(obr, 18) or _component(field(obr, 3)) or _component(field(orc, 3)) or _component(field(obr, 2))
+        if field(orc, 1).upper() in CANCEL_CONTROLS:
+            entries.pop(accession, None)
+            continue
+        if accession not in entries:
+            order.append(accession)
+        scheduled = (parse_time(_component(field(tq1, 7))) or parse_time(field(obr, 36))
+                     or parse_time(_component(field(obr, 27), 3)) or parse_time(field(obr, 7)))
+        description = _component(field(obr, 4), 1) or _component(field(obr, 4))
+        entries[accession] = {
+            "accession": accession,
+            "patient_id": _component(field(pid, 3)),
+            "modality": (field(obr, 24) or description.split(" ")[0]).upper(),
+            "scheduled": scheduled,
+            "description": description,
+        }
+    return [entries[a] for a in order if a in entries]
+
+
+def _hl7_messages(text):
+    message = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("MSH") and message:
+            yield message
+            message = []
+        message.append(line)
+    if message:
+        yield message
+
+
+def parse_worklist(text, today=None):
+    """Sniff the feed: HL7 when it starts with an MSH segment, CSV otherwise."""
+    return parse_hl7_orm(text) if text.lstrip().startswith("MSH|") else parse_worklist_csv(text, today)
+
+
+class Prefetcher:
+    """
+    `make_queries(patient_id, modality, start, end)` is the app's vendor fan-out;
+    `window` is the (start, end) prior range the click will use.
+    """
+
+    def __init__(self, make_queries, cache, window, timeout, lead_s=PREFETCH_LEAD_S, grace_s=PREFETCH_GRACE_S,
+                 max_concurrency=PREFETCH_CONCURRENCY, poll_s=PREFETCH_POLL_S, clock=datetime.now):
+        self.make_queries = make_queries
+        self.cache = cache
+        self.window = window
+        self.timeout = timeout
+        self.lead_s, self.grace_s = lead_s, grace_s
+        self.max_concurrency = max_concurrency
+        self.poll_s = poll_s
+        self.refresh_s = cache.ttl_s * 0.8   # re-warm before the cached answers expire
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.entries = {}   # accession -> entry with prefetch state
+        self.runs = self.vendor_calls = self.failures = self.poll_errors = 0
+        self.last_error = None   # (time, message) of the last poll that raised, shown in the Worklist tab
+
+    def load(self, entries):
+        """Replace the worklist; state of accessions already known is kept."""
+        with self._lock:
+            self.entries = {
+                e["accession"]: dict(e, **{k: v for k, v in self.entries.get(e["accession"], {}).items()
+                                           if k in ("status", "warmed_at", "vendors_ok", "records", "prefetch_s")})
+                for e in entries
+            }
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="prior-prefetch")
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:   # keep the thread alive; the next poll retries
+                with self._lock:
+                    self.poll_errors += 1
+                    self.last_error = (self._clock(), f"{type(e).__name__}: {e}")
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+
+    def due(self, now=None):
+        """Entries inside their prefetch window whose cached answers are missing or close to expiry."""
+        now = now or self._clock()
+        out = []
+        with self._lock:
+            for e in self.entries.values():
+                scheduled = e.get("scheduled")
+                if scheduled and not (scheduled - timedelta(seconds=self.lead_s) <= now
+                                      <= scheduled + timedelta(seconds=self.grace_s)):
+                    continue
+                warmed = e.get("warmed_at")
+                if warmed and (now - warmed).total_seconds() < self.refresh_s:
+                    continue
+                if warmed and not scheduled:
+                    continue   # unscheduled entries are warmed once
+                out.append(e)
+        return sorted(out, key=lambda e: e.get("scheduled") or datetime.min)
+
+    def run_once(self, force=False):
+        """Warm everything due now (everything on the worklist with force=True); returns the count."""
+        if force:
+            with self._lock:
+                todo = list(self.entries.values())
+        else:
+            todo = self.due()
+        if todo:
+            asyncio.run(self._warm_all(todo))
+        return len(todo)
+
+    async def _warm_all(self, todo):
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def warm(entry):
+            async with sem:
+                await self._warm(entry)
+        await asyncio.gather(*(warm(e) for e in todo))
+
+    async def _warm(self, entry):
+        start, end = self.window
+        pid, modality = entry["patient_id"], entry["modality"]
+        with self._lock:
+            entry["status"] = "warming"
+        try:
+            # No cache on the fan-out itself: a hit would not refresh the TTL. Answers are put explicitly.
+            results, wall = await fan_out_async(self.make_queries(pid, modality, start, end),
+                                                default_timeout=self.timeout)
+        except Exception as e:
+            with self._lock:
+                entry["status"] = f"failed: {e}"
+                self.failures += 1
+            return
+        ok = [r for r in results if r["status"] == "ok"]
+        for r in ok:
+            self.cache.put(lookup_key(r["vendor"], pid, modality, start, end), r["records"])
+        with self._lock:
+            entry.update(status="warm" if len(ok) == len(results) else "partial", warmed_at=self._clock(),
+                         vendors_ok=f"{len(ok)}/{len(results)}", records=sum(len(r["records"]) for r in ok),
+                         prefetch_s=round(wall, 2))
+            self.runs += 1
+            self.vendor_calls += len(results)
+
+    def snapshot(self, now=None):
+        now = now or self._clock()
+        with self._lock:
+            rows = []
+            for e in self.entries.values():
+                scheduled = e.get("scheduled")
+                status = e.get("status")
+                if not status:
+                    status = "scheduled" if scheduled and scheduled - timedelta(seconds=self.lead_s) > now else "queued"
+                rows.append({
+                    "accession": e["accession"], "patient_id": e["patient_id"], "modality": e["modality"],
+                    "description": e.get("description", ""),
+                    "scheduled": scheduled.strftime("%Y-%m-%d %H:%M") if scheduled else "",
+                    "status": status, "vendors_ok": e.get("vendors_ok", ""), "records": e.get("records"),
+                    "prefetch_s": e.get("prefetch_s"),
+                    "warmed_at": e["warmed_at"].strftime("%H:%M:%S") if e.get("warmed_at") else "",
+                })
+        return sorted(rows, key=lambda r: r["scheduled"] or "9999")
+
+    def stats(self):
+        with self._lock:
+            warm = sum(1 for e in self.entries.values() if e.get("status") in ("warm", "partial"))
+            return {"worklist": len(self.entries), "warm": warm, "runs": self.runs,
+                    "vendor_calls": self.vendor_calls, "failures": self.failures,
+                    "poll_errors": self.poll_errors, "last_error": self.last_error,
+                    "running": bool(self._thread and self._thread.is_alive())}
@@ -0,0 +1,158 @@
+"""
+In-memory prior-study index for the federated query.
+
+Each vendor sync normalises its records once and loads them here, partitioned
+by vendor and patient. Inside a patient, studies are kept sorted by date
+(YYYYMMDD integers) with a parallel list of modality bitmasks, and every
+patient carries the OR of its study bitmasks. A patient + modality + date
+range query is one dict lookup, a bitmask reject test, two bisects and a
+scan over the matching slice only — microseconds, whatever the total size.
+"""
+import bisect
+import gc
+import threading
+
+
+def date_key(value):
+    """'2025-09-25' / '20250925' / date -> 20250925; None when it can't be read."""
+    if value is None:
+        return None
+    if hasattr(value, "year"):
+        return value.year * 10000 + value.month * 100 + value.day
+    digits = str(value).replace("-", "")[:8]
+    return int(digits) if len(digits) == 8 and digits.isdigit() else None
+
+
+class _Patient:
+    __slots__ = ("dates", "masks", "records", "undated", "mask")
+
+    def __init__(self):
+        self.dates, self.masks, self.records = [], [], []
+        self.undated = []   # (mask, record) with unreadable dates: never range-filtered out
+        self.mask = 0
+
+
+class PriorStudyIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bits = {}       # modality -> bit
+        self._vendors = {}    # vendor -> {patient_id -> _Patient}
+        self.counts = {}      # vendor -> number of studies loaded
+
+    def _modality_mask(self, modality, create=False):
+        mask = 0
+        for m in str(modality or "").split("\\"):
+            m = m.strip().upper()
+            if not m:
+                continue
+            bit = self._bits.get(m)
+            if bit is None:
+                if not create:
+                    continue
+                bit = self._bits[m] = 1 << len(self._bits)
+            mask |= bit
+        return mask
+
+    def sync(self, vendor, records):
+        """Replace everything held for `vendor` with `records` (unified schema)."""
+        # A bulk load allocates millions of small tuples and lists; cyclic GC passes over
+        # the growing heap would cost more than the load itself.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._sync(vendor, records)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _sync(self, vendor, records):
+        rows = {}
+        masks, keys = {}, {}   # per-sync memos: few distinct modality strings and dates
+        with self._lock:
+            for rec in records:
+                modality, day = rec.get("modality"), rec.get("date")
+                mask = masks.get(modality)
+                if mask is None:
+                    mask = masks[modality] = self._modality_mask(modality, create=True)
+                key = keys.get(day, -1)
+                if key == -1:
+                    key = keys[day] = date_key(day)
+                pid = rec.get("patient_id")
+                items = rows.get(pid)
+                if items is None:
+                    items = rows[pid] = []
+                items.append((key, mask, rec))
+        patients = {}
+        for pid, items in rows.items():
+            p = patients[str(pid or "")] = _Patient()
+            if len(items) > 1:
+                items.sort(key=lambda i: i[0] or 0)
+            for d, m, r in items:
+                if d is None:
+                    p.undated.append((m, r))
+                else:
+                    p.dates.append(d)
+                    p.masks.append(m)
+                    p.records.append(r)
+                p.mask |= m
+        with self._lock:
+            self._vendors[vendor] = patients
+            self.counts[vendor] = len(records)
+
+    def add(self, vendor, record):
+        """Insert one newly arrived study; the patient entry is rebuilt and swapped, never edited in place."""
+        pid = str(record.get("patient_id") or "")
+        key = date_key(record.get("date"))
+        with self._lock:
+            mask = self._modality_mask(record.get("modality"), create=True)
+            patients = self._vendors.setdefault(vendor, {})
+            old = patients.get(pid) or _Patient()
+            new = _Patient()
+            new.dates, new.masks, new.records = list(old.dates), list(old.masks), list(old.records)
+            new.undated = list(old.undated)
+            new.mask = old.mask | mask
+            if key is None:
+                new.undated.append((mask, record))
+            else:
+                i = bisect.bisect_right(new.dates, key)
+                new.dates.insert(i, key)
+                new.masks.insert(i, mask)
+                new.records.insert(i, record)
+            patients[pid] = new
+            self.counts[vendor] = self.counts.get(vendor, 0) + 1
+
+    def _query_patient(self, p, bit, lo, hi):
+        if bit and not p.mask & bit:
+            return []
+        i = bisect.bisect_left(p.dates, lo) if lo is not None else 0
+        j = bisect.bisect_right(p.dates, hi) if hi is not None else len(p.dates)
+        if bit:
+            out = [p.records[k] for k in range(i, j) if p.masks[k] & bit]
+            out += [r for m, r in p.undated if m & bit]
+        else:
+            out = p.records[i:j] + [r for _, r in p.undated]
+        return out
+
+    def query(self, vendor, patient_id=None, modality=None, start=None, end=None):
+        """Copies of the matching unified records, oldest first."""
+        patients = self._vendors.get(vendor, {})
+        bit = self._modality_mask(modality) if modality else 0
+        if modality and not bit:
+            return []   # modality never seen for any vendor
+        lo, hi = date_key(start), date_key(end)
+        if patient_id:
+            p = patients.get(patient_id)
+            found = self._query_patient(p, bit, lo, hi) if p else []
+        else:
+            found = [r for p in patients.values() for r in self._query_patient(p, bit, lo, hi)]
+        return [dict(r) for r in found]
+
+    def patient_ids(self):
+        """Every patient ID held for any vendor."""
+        return sorted({pid for ps in self._vendors.values() for pid in ps if pid})
+
+    def stats(self):
+        return [
+            {"vendor": v, "patients": len(ps), "studies": self.counts.get(v, 0)}
+            for v, ps in self._vendors.items()
+        ]
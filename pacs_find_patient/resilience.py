@@ -0,0 +1,146 @@
+"""
+Per-vendor latency tracking, adaptive timeouts, hedging and circuit breakers.
+
+Every vendor call reports its latency here (timeouts count as a sample at the
+timeout, so a vendor that slows down pushes its own timeout up). From the
+rolling window:
+
+- timeout = p95 * TIMEOUT_P95_FACTOR, between MIN_TIMEOUT_S and the caller's
+  timeout, once MIN_SAMPLES answers have been seen;
+- hedge_after = p90: if the first request hasn't answered by then, a
+  duplicate is sent and whichever answers first wins;
+- after BREAKER_FAILURES consecutive failures the breaker opens and the vendor
+  is skipped for BREAKER_COOLDOWN_S; then one probe call (with the caller's
+  full timeout) decides between closing it again and another cooldown.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+LATENCY_WINDOW = int(os.environ.get("PACS_LATENCY_WINDOW", "200"))
+MIN_SAMPLES = int(os.environ.get("PACS_LATENCY_MIN_SAMPLES", "20"))
+TIMEOUT_P95_FACTOR = float(os.environ.get("PACS_TIMEOUT_P95_FACTOR", "1.5"))
+MIN_TIMEOUT_S = float(os.environ.get("PACS_MIN_TIMEOUT_S", "0.2"))
+BREAKER_FAILURES = int(os.environ.get("PACS_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.environ.get("PACS_BREAKER_COOLDOWN_S", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class _Vendor:
+    __slots__ = ("samples", "failures", "state", "opened_at", "probing", "calls", "errors", "hedges",
+                 "hedges_won", "short_circuited", "_cache")
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.failures = 0           # consecutive
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.calls = self.errors = self.hedges = self.hedges_won = self.short_circuited = 0
+        self._cache = None          # (p50, p90, p95) memo, dropped on every new sample
+
+
+class VendorHealth:
+    def __init__(self, window=LATENCY_WINDOW, min_samples=MIN_SAMPLES, p95_factor=TIMEOUT_P95_FACTOR,
+                 min_timeout=MIN_TIMEOUT_S, failures=BREAKER_FAILURES, cooldown_s=BREAKER_COOLDOWN_S,
+                 clock=time.monotonic):
+        self.window, self.min_samples = window, min_samples
+        self.p95_factor, self.min_timeout = p95_factor, min_timeout
+        self.failure_threshold, self.cooldown_s = failures, cooldown_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._vendors = {}
+
+    def _get(self, vendor):
+        v = self._vendors.get(vendor)
+        if v is None:
+            v = self._vendors[vendor] = _Vendor(self.window)
+        return v
+
+    def _percentiles(self, v):
+        if len(v.samples) < self.min_samples:
+            return None
+        if v._cache is None:
+            v._cache = tuple(np.percentile(v.samples, [50, 90, 95]))
+        return v._cache
+
+    # ---------- circuit breaker ----------
+    def allow(self, vendor):
+        """False while the breaker is open; after the cooldown one probe call at a time is let through."""
+        with self._lock:
+            v = self._get(vendor)
+            if v.state == CLOSED:
+                return True
+            if v.state == OPEN and self._clock() - v.opened_at >= self.cooldown_s:
+                v.state = HALF_OPEN
+            if v.state == HALF_OPEN and not v.probing:
+                v.probing = True
+                return True
+            v.short_circuited += 1
+            return False
+
+    # ---------- adaptive limits ----------
+    def timeout_for(self, vendor, default):
+        """p95-derived timeout, capped by `default`; `default` itself until there is enough history or when probing."""
+        with self._lock:
+            v = self._get(vendor)
+            pct = self._percentiles(v)
+            if pct is None or v.state != CLOSED:
+                return default
+            return min(default, max(self.min_timeout, pct[2] * self.p95_factor))
+
+    def hedge_after(self, vendor):
+        """Seconds after which to send a duplicate request (the vendor's p90), or None."""
+        with self._lock:
+            v = self._get(vendor)
+            pct = self._percentiles(v)
+            return None if pct is None or v.state != CLOSED else pct[1]
+
+    # ---------- outcomes ----------
+    def record(self, vendor, latency_s, status, hedged=False, hedge_won=False):
+        """Outcome of one call: status is ok / timeout / error. Fast errors are not latency samples."""
+        with self._lock:
+            v = self._get(vendor)
+            v.calls += 1
+            if status != "error":
+                v.samples.append(latency_s)
+                v._cache = None
+            v.hedges += hedged
+            v.hedges_won += hedge_won
+            if status == "ok":
+                v.failures = 0
+                v.state, v.probing = CLOSED, False
+                return
+            v.errors += 1
+            v.failures += 1
+            if v.state == HALF_OPEN or v.failures >= self.failure_threshold:
+                v.state, v.opened_at, v.probing = OPEN, self._clock(), False
+
+    def reset(self, vendor=None):
+        with self._lock:
+            for name in [vendor] if vendor else list(self._vendors):
+                self._vendors.pop(name, None)
+
+    def table(self, default_timeout):
+        with self._lock:
+            rows = []
+            for name, v in sorted(self._vendors.items()):
+                pct = self._percentiles(v)
+                timeout = default_timeout if pct is None or v.state != CLOSED else \
+                    min(default_timeout, max(self.min_timeout, pct[2] * self.p95_factor))
+                reopen = max(0.0, self.cooldown_s - (self._clock() - v.opened_at)) if v.state == OPEN else 0.0
+                rows.append({
+                    "vendor": name, "breaker": v.state, "reopens_in_s": round(reopen, 1),
+                    "consecutive_failures": v.failures, "samples": len(v.samples),
+                    "p50_ms": round(pct[0] * 1000, 1) if pct else None,
+                    "p90_ms": round(pct[1] * 1000, 1) if pct else None,
+                    "p95_ms": round(pct[2] * 1000, 1) if pct else None,
+                    "timeout_s": round(timeout, 2),
+                    "calls": v.calls, "failures": v.errors, "hedges": v.hedges, "hedges_won": v.hedges_won,
+                    "short_circuited": v.short_circuited,
+                })
+        return rows
@@ -0,0 +1,90 @@
+"""
+TTL + LRU cache of per-vendor prior lookups.
+
+Keys are (vendor, patient_id, modality, start, end). Entries expire after
+ttl_s and the least recently used entry is evicted beyond max_entries. A
+secondary (vendor, patient_id) -> keys map makes invalidation on a new study
+touch only that patient's entries. Hit/miss counters feed the Metrics tab.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL_S = float(os.environ.get("PACS_CACHE_TTL_S", "300"))
+CACHE_MAX_ENTRIES = int(os.environ.get("PACS_CACHE_MAX_ENTRIES", "2048"))
+
+
+def lookup_key(vendor, patient_id, modality, start, end):
+    return (vendor, patient_id or "", modality or "", str(start or ""), str(end or ""))
+
+
+class ResultCache:
+    def __init__(self, ttl_s=CACHE_TTL_S, max_entries=CACHE_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, records)
+        self._by_patient = {}           # (vendor, patient_id) -> {key}
+        self.hits = self.misses = self.expired = self.evictions = self.invalidations = 0
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_patient.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_patient[key[:2]]
+
+    def get(self, key):
+        """Copies of the cached records, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self._clock():
+                self._drop(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            records = entry[1]
+        return [dict(r) for r in records]
+
+    def put(self, key, records):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_s, [dict(r) for r in records])
+            self._entries.move_to_end(key)
+            self._by_patient.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, vendor=None, patient_id=None):
+        """Drop entries for one vendor and/or patient (everything when both are None). Returns the count."""
+        with self._lock:
+            if vendor is not None and patient_id is not None:
+                keys = list(self._by_patient.get((vendor, patient_id), ()))
+            else:
+                keys = [k for k in self._entries
+                        if (vendor is None or k[0] == vendor) and (patient_id is None or k[1] == patient_id)]
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate_pct": round(100.0 * self.hits / lookups, 1) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
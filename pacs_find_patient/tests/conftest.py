@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The app imports its sibling modules directly and imaging_common from the repo root.
+APP_DIR = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(APP_DIR), str(APP_DIR.parent)]
@@ -0,0 +1,72 @@
+import pytest
+
+from adapters import AdapterRegistry, VendorAdapter, compile_accessor, compile_date, compile_dicom_accessor
+
+REGISTRY = AdapterRegistry.load()
+UNIFIED = {"patient_id": "123", "study": "CT Chest", "modality": "CT", "date": "2025-09-05"}
+
+
+@pytest.mark.parametrize("adapter", list(REGISTRY), ids=lambda a: a.name)
+def test_every_configured_vendor_round_trips_the_unified_schema(adapter):
+    native = adapter.to_native(UNIFIED)
+
+    assert adapter.normalize(native) == dict(UNIFIED, vendor=adapter.name)
+    assert adapter.normalize_many(adapter.simulate(seed=1)) == [
+        adapter.normalize(r) for r in adapter.simulate(seed=1)]
+
+
+def test_dotted_paths_tolerate_missing_levels():
+    get = compile_accessor("study.details.date")
+
+    assert get({"study": {"details": {"date": "2025-01-01"}}}) == "2025-01-01"
+    assert get({"study": {"details": "n/a"}}) is None
+    assert get({"study": {}}) is None
+    assert get({}) is None
+    assert compile_accessor("pid")({"pid": "1"}) == "1"
+
+
+def test_dicom_accessor_reads_values_names_and_lists():
+    record = {"00100010": {"vr": "PN", "Value": [{"Alphabetic": "DOE^JOHN"}]},
+              "00080061": {"vr": "CS", "Value": ["CT", "PT"]},
+              "00081030": {"vr": "LO"}}
+
+    assert compile_dicom_accessor("0010,0010")(record) == "DOE^JOHN"
+    assert compile_dicom_accessor("00080061")(record) == "CT\\PT"
+    assert compile_dicom_accessor("00081030")(record) is None
+    assert compile_dicom_accessor("00080020")(record) is None
+
+
+@pytest.mark.parametrize("fmt, value, iso", [
+    ("%Y-%m-%d", "2025-09-05", "2025-09-05"),
+    ("%Y-%m-%dT%H:%M:%S", "2025-09-05T14:30:00", "2025-09-05"),
+    ("%Y%m%d", "20250905", "2025-09-05"),
+    ("%Y%m%d%H%M%S", "20250905143000", "2025-09-05"),
+    ("%m/%d/%Y", "09/05/2025", "2025-09-05"),
+    ("%d/%m/%Y", "05/09/2025", "2025-09-05"),
+    ("%m/%d/%Y", "unknown", "unknown"),   # unparseable values pass through
+    ("%Y%m%d", "2025", "2025"),
+    ("%d/%m/%Y", None, None),
+])
+def test_compile_date(fmt, value, iso):
+    assert compile_date(fmt)(value) == iso
+
+
+def test_registry_picks_enabled_vendors_that_serve_the_modality():
+    def adapter(name, enabled=True, modalities=None):
+        return VendorAdapter({"name": name, "enabled": enabled, "fields": {f: f for f in UNIFIED},
+                              "capabilities": {"modalities": modalities} if modalities else {}})
+
+    registry = AdapterRegistry([adapter("A", modalities=["CT"]), adapter("B", modalities=["MR"]),
+                                adapter("C"), adapter("D", enabled=False)])
+
+    assert [a.name for a in registry.for_query("CT")] == ["A", "C"]
+    assert [a.name for a in registry.for_query(None)] == ["A", "B", "C"]
+    assert [a.name for a in registry.for_query("MR", names={"A", "B"})] == ["B"]
+    assert registry.names() == ["A", "B", "C"] and len(registry) == 4
+
+
+def test_cap_truncates_to_max_results():
+    adapter = VendorAdapter({"name": "A", "fields": {f: f for f in UNIFIED}, "capabilities": {"max_results": 2}})
+
+    assert adapter.cap([1, 2, 3]) == [1, 2]
+    assert VendorAdapter({"name": "B", "fields": {f: f for f in UNIFIED}}).cap([1, 2, 3]) == [1, 2, 3]
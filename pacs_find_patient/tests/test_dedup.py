@@ -0,0 +1,58 @@
+import pytest
+
+from dedup import canonical_description, dedupe
+
+
+@pytest.mark.parametrize("description, canonical", [
+    ("CT Thorax", "chest"),
+    ("CT Chest", "chest"),
+    ("XR Chest 2 views", "2 chest views"),
+    ("CT Chest w/ contrast", "chest contrast"),
+    ("CT Thorax with contrast", "chest contrast"),
+    ("CT Chest IV", "chest contrast"),
+    ("MRI Brain w/o contrast", "brain noncontrast"),
+    ("MR Head without contrast", "brain noncontrast"),
+    ("MRI Brain w/wo contrast", "brain contrast noncontrast"),
+    ("US Abd", "abdomen"),
+    ("CT Abdomen/Pelvis", "abdomen pelvis"),
+    ("", ""),
+    (None, ""),
+])
+def test_canonical_description(description, canonical):
+    assert canonical_description(description) == canonical
+
+
+def rec(vendor, study, date="2025-09-25", modality="CT", patient_id="123"):
+    return {"vendor": vendor, "patient_id": patient_id, "date": date, "modality": modality, "study": study}
+
+
+def test_dedupe_merges_the_same_exam_across_vendors_and_keeps_order():
+    records = [
+        rec("Philips", "CT Thorax"),
+        rec("GE", "CT Chest"),
+        rec("Agfa", "Chest CT"),
+        rec("GE", "CT Chest w/ contrast"),                   # different protocol
+        rec("GE", "CT Chest", date="2025-03-11"),            # different day
+        rec("GE", "CT Chest", modality="CR"),                # different modality
+        rec("GE", "CT Chest", patient_id="456"),             # different patient
+        rec("Philips", "CT Thorax"),                         # same vendor twice
+    ]
+
+    out = dedupe(records)
+
+    assert [(r["vendor"], r["study"], r["copies"]) for r in out] == [
+        ("Philips", "CT Thorax", 4),
+        ("GE", "CT Chest w/ contrast", 1),
+        ("GE", "CT Chest", 1),
+        ("GE", "CT Chest", 1),
+        ("GE", "CT Chest", 1),
+    ]
+    assert out[0]["also_at"] == "GE, Agfa"
+    assert out[0]["sources"] == [("Philips", "CT Thorax"), ("GE", "CT Chest"), ("Agfa", "Chest CT"),
+                                 ("Philips", "CT Thorax")]
+    assert all(r["also_at"] == "" and r["sources"] == [(r["vendor"], r["study"])] for r in out[1:])
+    assert "copies" not in records[0]   # input records are not modified
+
+
+def test_dedupe_of_nothing():
+    assert dedupe([]) == []
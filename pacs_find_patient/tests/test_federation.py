@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from federation import fan_out, merge_records
+from result_cache import ResultCache
+
+
+def answer(records, delay=0.0):
+    async def query():
+        await asyncio.sleep(delay)
+        return [dict(r) for r in records]
+    return query
+
+
+def blocking(records, delay=0.0):
+    def query():
+        time.sleep(delay)
+        return [dict(r) for r in records]
+    return query
+
+
+def fail(message):
+    async def query():
+        raise RuntimeError(message)
+    return query
+
+
+def test_vendors_run_concurrently_and_slow_ones_only_cost_their_timeout():
+    queries = {
+        "A": answer([{"date": "2025-01-02"}], 0.2),
+        "B": blocking([{"date": "2025-01-01"}], 0.2),
+        "C": answer([], 5.0),
+        "D": fail("archive down"),
+    }
+
+    results, wall = fan_out(queries, timeouts={"C": 0.4}, default_timeout=1.0)
+
+    assert wall < 0.9   # the two 0.2 s answers overlap and C is cut at its own 0.4 s
+    assert [(r["vendor"], r["status"], len(r["records"])) for r in results] == [
+        ("A", "ok", 1), ("B", "ok", 1), ("C", "timeout", 0), ("D", "error", 0)]
+    assert results[2]["error"] == "no answer within 0.4s" and results[2]["timeout_s"] == 0.4
+    assert results[3]["error"] == "archive down"
+
+
+def test_a_hung_blocking_vendor_does_not_hold_back_the_result():
+    t0 = time.perf_counter()
+    results, _ = fan_out({"A": blocking([{}], 2.0), "B": blocking([{}])}, default_timeout=0.2)
+
+    assert time.perf_counter() - t0 < 1.0
+    assert [r["status"] for r in results] == ["timeout", "ok"]
+
+
+def test_cached_answers_skip_the_vendor_and_only_successes_are_cached():
+    cache = ResultCache()
+    calls = []
+
+    def counted(vendor, records):
+        def query():
+            calls.append(vendor)
+            if records is None:
+                raise RuntimeError("down")
+            return records
+        return query
+
+    queries = {"A": counted("A", [{"date": "2025-01-01"}]), "B": counted("B", None)}
+    fan_out(queries, cache=cache, cache_key=lambda v: (v, "123"))
+    results, _ = fan_out(queries, cache=cache, cache_key=lambda v: (v, "123"))
+
+    assert calls == ["A", "B", "B"]
+    assert [(r["vendor"], r["status"], r["cached"]) for r in results] == [("A", "ok", True), ("B", "error", False)]
+    assert results[0]["records"] == [{"date": "2025-01-01"}]
+
+
+def test_results_stream_in_completion_order_with_a_sorted_running_merge():
+    queries = {
+        "slow": answer([{"date": "2025-03-01"}, {"date": "2025-01-01"}], 0.3),   # unsorted answer
+        "fast": answer([{"date": "2025-02-01"}], 0.0),
+        "mid": answer([{"date": "2024-12-01"}, {"date": "2025-04-01"}], 0.15),
+    }
+    seen = []
+
+    results, _ = fan_out(queries, on_result=lambda r, merged: seen.append((r["vendor"], [m["date"] for m in merged])))
+
+    assert seen == [
+        ("fast", ["2025-02-01"]),
+        ("mid", ["2024-12-01", "2025-02-01", "2025-04-01"]),
+        ("slow", ["2024-12-01", "2025-01-01", "2025-02-01", "2025-03-01", "2025-04-01"]),
+    ]
+    assert [r["vendor"] for r in results] == ["slow", "fast", "mid"]   # returned in query order
+    assert results[1]["arrived_s"] < results[2]["arrived_s"] < results[0]["arrived_s"]
+    assert merge_records(results) == [{"date": d} for d in seen[-1][1]]
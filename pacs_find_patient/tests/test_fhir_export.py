@@ -0,0 +1,39 @@
+import gzip
+import json
+
+from fhir_export import export_patients
+
+
+def fake_lookup(answers):
+    """lookup coroutine over {patient_id: {vendor: status}}; every "ok" vendor returns one study."""
+    async def lookup(pid):
+        results = [{"vendor": v, "status": status,
+                    "records": [{"patient_id": pid, "vendor": v, "study": "CT HEAD", "date": "2025-05-01"}]
+                    if status == "ok" else []}
+                   for v, status in answers[pid].items()]
+        return [r for res in results for r in res["records"]], results
+    return lookup
+
+
+def test_patients_with_a_failed_vendor_are_counted_partial(tmp_path):
+    answers = {
+        "P1": {"Sectra": "ok", "Agfa": "ok"},
+        "P2": {"Sectra": "ok", "Agfa": "timeout"},
+        "P3": {"Sectra": "open", "Agfa": "error"},
+    }
+    path = str(tmp_path / "priors.ndjson.gz")
+
+    stats = export_patients(list(answers), fake_lookup(answers), path, chunk_size=1, concurrency=2)
+
+    assert (stats["patients"], stats["studies"], stats["failed"], stats["partial"]) == (3, 3, 0, 2)
+    assert stats["vendor_failures"] == {"Agfa": 2, "Sectra": 1}
+    with gzip.open(path, "rt") as f:
+        assert [json.loads(line)["resourceType"] for line in f] == ["ImagingStudy"] * 3
+
+
+def test_lookup_exceptions_are_counted_failed(tmp_path):
+    async def lookup(pid):
+        raise RuntimeError("boom")
+
+    stats = export_patients(["P1", " ", "P2"], lookup, str(tmp_path / "priors.ndjson"))
+    assert (stats["patients"], stats["failed"], stats["partial"]) == (0, 2, 0)
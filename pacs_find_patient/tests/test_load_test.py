@@ -0,0 +1,73 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import date
+
+from load_test import ReaderWorkload, load_report, patient_population, run_load_test, with_faults
+from result_cache import ResultCache
+
+
+def test_population_puts_known_patients_first():
+    population = patient_population(["123", "456", "123"], size=5)
+
+    assert population == ["123", "456", "LT000000", "LT000001", "LT000002"]
+
+
+def test_workload_is_zipf_skewed_and_reproducible():
+    population = patient_population(size=1000)
+    today = date(2025, 9, 25)
+    lookups = [ReaderWorkload(population, seed=1).next(today) for _ in range(3)]
+    workload = ReaderWorkload(population, seed=1)
+    stream = [workload.next(today) for _ in range(5000)]
+
+    assert lookups == [stream[0]] * 3
+    patients = Counter(pid for pid, _, _, _ in stream)
+    assert patients.most_common(1)[0][0] == population[0]
+    assert patients[population[0]] > 10 * patients.get(population[500], 0)
+    assert {(end - start).days for _, _, start, end in stream} == {365, 730, 1825}
+    assert all(end == today for _, _, _, end in stream)
+
+
+def test_injected_faults_fail_at_the_given_rate():
+    async def fine():
+        return []
+
+    queries = with_faults({"A": fine, "B": lambda: []}, 0.3, random.Random(0))
+    failures = 0
+    for _ in range(1000):
+        for fn in queries.values():
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    asyncio.run(fn())
+                else:
+                    fn()
+            except ConnectionError:
+                failures += 1
+
+    assert 500 < failures < 700
+
+
+def test_readers_share_a_private_cache_and_report_per_vendor():
+    async def fast():
+        return [{"date": "2025-01-01"}]
+
+    async def hung():
+        await asyncio.sleep(5)
+        return []
+
+    make_queries = lambda *q: {"fast": fast, "hung": hung}
+    cache = ResultCache()
+
+    report = run_load_test(make_queries, ReaderWorkload(["123"], seed=0), readers=4, duration_s=0.3, timeout=0.1,
+                           cache=cache)
+
+    summary, vendors = report["summary"], {v["vendor"]: v for v in report["vendors"]}
+    assert summary["readers"] == 4 and summary["lookups"] >= 4
+    assert summary["partial_pct"] == 100.0
+    assert vendors["hung"]["timeouts"] == vendors["hung"]["calls"] == summary["lookups"]
+    assert vendors["fast"]["calls"] == summary["lookups"]
+    assert cache.stats()["hits"] > 0   # one patient: repeat lookups of "fast" come from the cache
+
+
+def test_empty_report():
+    assert load_report(1, 1.0, [], 0, {})["summary"]["lookups"] == 0
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from metrics_store import LATENCY_BUCKETS_S, MetricsStore, hist_percentile
+
+HOUR = 1_760_000_400   # an exact hour boundary
+
+
+def result(vendor, status="ok", latency_s=0.1, cached=False, hedged=False, records=1):
+    return {"vendor": vendor, "status": status, "latency_s": latency_s, "cached": cached, "hedged": hedged,
+            "records": [{}] * records}
+
+
+def query(store, ts, federated_s, results, modality="CT"):
+    return store.record_query({"modality": modality, "federated_s": federated_s, "records": 2}, results, ts=ts)
+
+
+def test_queries_fold_into_minute_and_hour_rollups(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.sqlite3"))
+    query(store, HOUR + 5, 0.08, [result("GE", latency_s=0.08), result("Agfa", cached=True)])
+    query(store, HOUR + 30, 0.4, [result("GE", latency_s=0.4, hedged=True), result("Agfa", "timeout", 2.0)])
+    query(store, HOUR + 65, 1.1, [result("GE", "open", 0.0), result("Agfa", latency_s=1.1)])
+
+    minutes = store.query_rollups("minute")
+    assert [(m["bucket"], m["queries"]) for m in minutes] == [(HOUR, 2), (HOUR + 60, 1)]
+    [hour] = MetricsStore(store.path).query_rollups("hour")   # reopened: the rollups are durable
+    assert hour["queries"] == 3
+    assert hour["avg_s"] == pytest.approx((0.08 + 0.4 + 1.1) / 3, abs=1e-3)
+    assert (hour["p50_s"], hour["p95_s"], hour["max_s"]) == (0.5, 1.25, 1.1)
+    assert hour["partial_pct"] == pytest.approx(66.7)
+    assert hour["cache_hit_pct"] == pytest.approx(16.7)
+    assert hour["hedged"] == 1 and hour["records"] == 6
+
+
+def test_vendor_rollups_time_only_real_calls():
+    store = MetricsStore(":memory:")
+    query(store, HOUR, 0.1, [result("GE", latency_s=0.1), result("Agfa", cached=True, latency_s=0.0)])
+    query(store, HOUR + 3600, 0.3, [result("GE", "open", 0.0), result("Agfa", "error", 0.01)])
+
+    by_vendor = {v["vendor"]: v for v in store.vendor_rollups("hour")}
+
+    assert by_vendor["GE"]["calls"] == 2 and by_vendor["GE"]["short_circuited"] == 1
+    assert by_vendor["GE"]["error_rate_pct"] == 50.0
+    assert by_vendor["GE"]["avg_s"] == 0.1   # the short-circuited call is not a latency sample
+    assert by_vendor["Agfa"]["cache_hit_pct"] == 50.0 and by_vendor["Agfa"]["errors"] == 1
+    assert by_vendor["Agfa"]["avg_s"] == 0.01
+    assert store.vendor_rollups("hour", since=HOUR + 3600)[0]["calls"] == 1
+
+
+def test_prune_drops_raw_rows_and_keeps_rollups():
+    store = MetricsStore(":memory:")
+    now = time.time()
+    query(store, now - 40 * 86400, 0.2, [result("GE")])
+    query(store, now, 0.2, [result("GE")])
+
+    assert store.prune(raw_days=30) == 1
+    assert store.stats()["queries"] == 1 and store.stats()["vendor_calls"] == 1
+    assert sum(r["queries"] for r in store.query_rollups("hour")) == 2
+
+
+def test_hist_percentile():
+    counts = [0] * (len(LATENCY_BUCKETS_S) + 1)
+    assert hist_percentile(counts, 50) is None
+    counts[0], counts[3], counts[-1] = 50, 45, 5
+    assert hist_percentile(counts, 50) == 0.05
+    assert hist_percentile(",".join(map(str, counts)), 95) == 0.3
+    assert hist_percentile(counts, 99, max_s=42.0) == 42.0   # the overflow bucket reports the recorded max
+    assert hist_percentile(counts, 99) == LATENCY_BUCKETS_S[-1]
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from prefetch import Prefetcher, parse_hl7_orm, parse_time, parse_worklist, parse_worklist_csv
+from result_cache import ResultCache
+
+TODAY = date(2025, 9, 25)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("20250925", datetime(2025, 9, 25)),
+    ("202509251430", datetime(2025, 9, 25, 14, 30)),
+    ("20250925143015.123+0200", datetime(2025, 9, 25, 14, 30, 15)),
+    ("20250925143015-0500", datetime(2025, 9, 25, 14, 30, 15)),
+    ("2025-09-25T14:30:00", datetime(2025, 9, 25, 14, 30)),
+    ("2025-09-25 08:05", datetime(2025, 9, 25, 8, 5)),
+    ("14:30", datetime(2025, 9, 25, 14, 30)),
+    (" 9:05 ", datetime(2025, 9, 25, 9, 5)),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_time(value, expected):
+    assert parse_time(value, TODAY) == expected
+
+
+def test_csv_worklist_accepts_header_variants_and_skips_rows_without_a_patient():
+    text = ("MRN,Modality,Scheduled Time,Accession_Number,Procedure\n"
+            "123,ct,14:30,A1,CT Chest\n"
+            ",MR,15:00,A2,MRI Brain\n"
+            "456,mr,,,MRI Knee\n")
+
+    entries = parse_worklist_csv(text, TODAY)
+
+    assert entries == [
+        {"accession": "A1", "patient_id": "123", "modality": "CT",
+         "scheduled": datetime(2025, 9, 25, 14, 30), "description": "CT Chest"},
+        {"accession": "row3", "patient_id": "456", "modality": "MR", "scheduled": None, "description": "MRI Knee"},
+    ]
+
+
+def test_csv_worklist_needs_a_patient_column():
+    with pytest.raises(ValueError, match="patient_id"):
+        parse_worklist_csv("name,modality\nSmith,CT\n")
+
+
+ORM = "\r".join([
+    "MSH|^~\\&|RIS|HOSP|PACS|HOSP|20250925080000||ORM^O01|1|P|2.5",
+    "PID|1||123^^^HOSP^MR||DOE^JOHN",
+    "ORC|NW|P1|F1",
+    "OBR|1|P1|F1|CTCHEST^CT Chest w/ contrast|||20250925143000|||||||||||ACC1||||||CT",
+    "TQ1|1||||||20250925150000",
+]) + "\n" + "\n".join([
+    "MSH|^~\\&|RIS|HOSP|PACS|HOSP|20250925080100||ORM^O01|2|P|2.5",
+    "PID|1||456^^^HOSP^MR||ROE^JANE",
+    "ORC|NW|P2|F2",
+    "OBR|1|P2|F2|MRBRAIN^MRI Brain|||20250925160000",
+    "",
+    "MSH|^~\\&|RIS|HOSP|PACS|HOSP|20250925080200||ORM^O01|3|P|2.5",
+    "PID|1||789^^^HOSP^MR||POE^EDGAR",
+    "ORC|NW|P3|F3",
+    "OBR|1|P3|F3|USABD^US Abdomen|||20250925170000",
+    "MSH|^~\\&|RIS|HOSP|PACS|HOSP|20250925080300||ORM^O01|4|P|2.5",
+    "PID|1||789^^^HOSP^MR||POE^EDGAR",
+    "ORC|CA|P3|F3",
+    "OBR|1|P3|F3|USABD^US Abdomen",
+])
+
+
+def test_hl7_orders_are_parsed_and_cancelled_orders_dropped():
+    entries = parse_hl7_orm(ORM)
+
+    assert entries == [
+        # TQ1-7 wins over OBR-7; OBR-18 is the accession and OBR-24 the modality
+        {"accession": "ACC1", "patient_id": "123", "modality": "CT",
+         "scheduled": datetime(2025, 9, 25, 15), "description": "CT Chest w/ contrast"},
+        # no accession or modality fields: the filler order number and the description's first word
+        {"accession": "F2", "patient_id": "456", "modality": "MRI",
+         "scheduled": datetime(2025, 9, 25, 16), "description": "MRI Brain"},
+    ]
+
+
+def test_parse_worklist_sniffs_the_format():
+    assert [e["accession"] for e in parse_worklist("\n" + ORM)] == ["ACC1", "F2"]
+    assert [e["accession"] for e in parse_worklist("patient_id,accession\n1,X\n", TODAY)] == ["X"]
+
+
+def test_due_entries_are_inside_the_lead_window_and_not_freshly_warmed():
+    now = datetime(2025, 9, 25, 14, 0)
+    prefetcher = Prefetcher(lambda *q: [], ResultCache(ttl_s=300), (None, None), 5.0,
+                            lead_s=1800, grace_s=3600, clock=lambda: now)
+    at = lambda minutes: now + timedelta(minutes=minutes)
+    prefetcher.entries = {e["accession"]: e for e in [
+        {"accession": "soon", "scheduled": at(20)},
+        {"accession": "later", "scheduled": at(45)},
+        {"accession": "running-late", "scheduled": at(-50)},
+        {"accession": "over", "scheduled": at(-70)},
+        {"accession": "fresh", "scheduled": at(10), "warmed_at": at(-1)},
+        {"accession": "stale", "scheduled": at(10), "warmed_at": at(-5)},   # past 80% of the 300 s TTL
+        {"accession": "unscheduled", "scheduled": None},
+        {"accession": "unscheduled-warmed", "scheduled": None, "warmed_at": at(-60)},
+    ]}
+
+    assert [e["accession"] for e in prefetcher.due()] == ["unscheduled", "running-late", "stale", "soon"]
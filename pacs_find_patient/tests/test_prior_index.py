@@ -0,0 +1,100 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from prior_index import PriorStudyIndex, date_key
+
+MODALITIES = ["CT", "MR", "CR", "US"]
+
+
+def filter_records(records, patient_id, modality, start, end):
+    """The linear scan the index replaced: unreadable dates are never filtered out."""
+    out = []
+    for n in records:
+        if patient_id and n["patient_id"] != patient_id:
+            continue
+        if modality and n["modality"] != modality:
+            continue
+        try:
+            d = datetime.strptime(n["date"], "%Y-%m-%d").date()
+            if start and d < start or end and d > end:
+                continue
+        except (TypeError, ValueError):
+            pass
+        out.append(n)
+    return out
+
+
+def random_records(rng, n, patients=30):
+    records = []
+    for i in range(n):
+        day = (date(2020, 1, 1) + timedelta(days=rng.randrange(1500))).isoformat()
+        records.append({"vendor": "GE", "uid": i, "patient_id": str(rng.randrange(patients)),
+                        "modality": rng.choice(MODALITIES), "study": "Prior",
+                        "date": day if rng.random() > 0.05 else rng.choice([None, "", "unknown"])})
+    return records
+
+
+def uids(records):
+    return sorted(r["uid"] for r in records)
+
+
+@pytest.mark.parametrize("date_format", ["iso", "dicom"])
+def test_queries_match_the_linear_scan(date_format):
+    rng = random.Random(38)
+    records = random_records(rng, 2000)
+    index = PriorStudyIndex()
+    if date_format == "dicom":   # the index also takes YYYYMMDD dates as archives send them
+        index.sync("GE", [dict(r, date=r["date"].replace("-", "")) if r["date"] else r for r in records])
+    else:
+        index.sync("GE", records)
+
+    for _ in range(300):
+        start = date(2020, 1, 1) + timedelta(days=rng.randrange(1500)) if rng.random() < 0.7 else None
+        end = start + timedelta(days=rng.randrange(400)) if start and rng.random() < 0.7 else None
+        q = (rng.choice([None, str(rng.randrange(35))]), rng.choice([None] + MODALITIES), start, end)
+
+        found = index.query("GE", *q)
+
+        assert uids(found) == uids(filter_records(records, *q))
+        dated = [date_key(r["date"]) for r in found if date_key(r["date"])]
+        if q[0]:
+            assert dated == sorted(dated)   # one patient's studies come back oldest first
+
+
+def test_added_studies_are_found_and_syncs_replace():
+    rng = random.Random(1)
+    records = random_records(rng, 200, patients=5)
+    index = PriorStudyIndex()
+    index.sync("GE", records[:150])
+    for r in records[150:]:
+        index.add("GE", r)
+
+    for pid in map(str, range(5)):
+        for modality in [None] + MODALITIES:
+            q = (pid, modality, date(2021, 1, 1), date(2022, 6, 30))
+            assert uids(index.query("GE", *q)) == uids(filter_records(records, *q))
+    assert index.counts["GE"] == 200
+
+    index.sync("GE", records[:10])
+    assert uids(index.query("GE")) == list(range(10))
+    assert index.counts["GE"] == 10
+
+
+def test_unknown_vendor_patient_or_modality_find_nothing():
+    index = PriorStudyIndex()
+    index.sync("GE", [{"patient_id": "1", "modality": "CT", "date": "2025-01-01"}])
+
+    assert index.query("Agfa", "1") == []
+    assert index.query("GE", "2") == []
+    assert index.query("GE", "1", "PET") == []
+    assert index.query("GE", "1", "CT") == [{"patient_id": "1", "modality": "CT", "date": "2025-01-01"}]
+
+
+def test_multi_valued_modalities_match_each_value():
+    index = PriorStudyIndex()
+    index.sync("GE", [{"patient_id": "1", "modality": "CT\\PT", "date": "2025-01-01"}])
+
+    assert len(index.query("GE", "1", "CT")) == len(index.query("GE", "1", "PT")) == 1
+    assert index.query("GE", "1", "MR") == []
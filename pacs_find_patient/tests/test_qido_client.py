@@ -0,0 +1,54 @@
+import pytest
+
+from imaging_common.mock_qido import random_studies, serve, study_record
+from imaging_common.qido_client import QidoClient, study_filters
+
+
+@pytest.fixture
+def qido():
+    """serve(**kwargs) -> (server state, client); every stand-in started is shut down afterwards."""
+    servers = []
+
+    def start(**kwargs):
+        server, url = serve(**kwargs)
+        servers.append(server)
+        return server.state, QidoClient(url, retries=0)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def uids(pages):
+    return [s["0020000D"]["Value"][0] for page in pages for s in page]
+
+
+STUDIES = [study_record("P1", f"2025{m:02d}01", "CT", f"CT Chest {m}") for m in range(1, 13)] + random_studies(30)
+
+
+def test_pages_cover_every_match(qido):
+    state, client = qido(studies=STUDIES)
+    pages = list(client.iter_studies(study_filters("P1"), page_size=5))
+    assert [len(p) for p in pages] == [5, 5, 2]
+    assert sorted(uids(pages)) == sorted(uids([STUDIES[:12]]))
+
+
+def test_server_page_cap_below_limit_does_not_stop_paging(qido):
+    state, client = qido(studies=STUDIES, max_page=3)
+    pages = list(client.iter_studies(study_filters("P1"), page_size=10))
+    assert [len(p) for p in pages] == [3, 3, 3, 3]
+    assert len(set(uids(pages))) == 12
+
+
+def test_max_results_stops_early(qido):
+    state, client = qido(studies=STUDIES)
+    pages = list(client.iter_studies(study_filters("P1"), page_size=5, max_results=7))
+    assert [len(p) for p in pages] == [5, 2]
+    assert state.requests == 2
+
+
+def test_no_match_is_no_pages(qido):
+    _, client = qido(studies=STUDIES)
+    assert list(client.iter_studies(study_filters("nobody"))) == []
+    assert client.search_studies(study_filters("nobody")) == []   # 204 No Content
@@ -0,0 +1,88 @@
+import pytest
+
+from resilience import VendorHealth
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def health():
+    clock = Clock()
+    return VendorHealth(failures=3, cooldown_s=30, min_samples=5, clock=clock), clock
+
+
+def breaker(health, vendor="GE"):
+    return next(r for r in health.table(5.0) if r["vendor"] == vendor)
+
+
+def test_breaker_opens_after_consecutive_failures(health):
+    h, _ = health
+    for status in ["timeout", "error", "ok", "error", "timeout"]:   # the ok resets the run
+        assert h.allow("GE")
+        h.record("GE", 0.1, status)
+    assert breaker(h)["breaker"] == "closed"
+    assert breaker(h)["consecutive_failures"] == 2
+
+    h.record("GE", 0.1, "error")
+
+    assert breaker(h)["breaker"] == "open"
+    assert breaker(h)["reopens_in_s"] == 30
+    assert not h.allow("GE") and not h.allow("GE")
+    assert breaker(h)["short_circuited"] == 2
+    assert h.allow("Agfa")   # breakers are per vendor
+
+
+def test_half_open_probe_closes_the_breaker(health):
+    h, clock = health
+    for _ in range(3):
+        h.record("GE", 0.1, "error")
+    clock.now += 29.9
+    assert not h.allow("GE")
+
+    clock.now += 0.1
+    assert h.allow("GE")                    # the one probe
+    assert breaker(h)["breaker"] == "half-open"
+    assert not h.allow("GE")                # nothing else while it is out
+    assert h.timeout_for("GE", 5.0) == 5.0  # the probe gets the caller's full timeout
+    assert h.hedge_after("GE") is None
+
+    h.record("GE", 0.2, "ok")
+
+    assert breaker(h)["breaker"] == "closed"
+    assert breaker(h)["consecutive_failures"] == 0
+    assert h.allow("GE") and h.allow("GE")
+
+
+def test_failed_probe_starts_another_cooldown(health):
+    h, clock = health
+    for _ in range(3):
+        h.record("GE", 0.1, "error")
+    clock.now += 30
+    assert h.allow("GE")
+
+    h.record("GE", 5.0, "timeout")   # one failure is enough when half-open
+
+    assert breaker(h)["breaker"] == "open"
+    assert not h.allow("GE")
+    clock.now += 30
+    assert h.allow("GE")
+    assert breaker(h)["breaker"] == "half-open"
+
+
+def test_timeouts_and_hedging_follow_the_latency_window(health):
+    h, _ = health
+    assert h.timeout_for("GE", 5.0) == 5.0 and h.hedge_after("GE") is None   # not enough history
+    for latency in [0.1, 0.2, 0.3, 0.4, 0.5]:
+        h.record("GE", latency, "ok")
+    h.record("GE", 0.001, "error")   # fast errors are not latency samples
+
+    assert h.hedge_after("GE") == pytest.approx(0.46)
+    assert h.timeout_for("GE", 5.0) == pytest.approx(0.48 * 1.5)
+    assert h.timeout_for("GE", 0.5) == 0.5
+    assert breaker(h)["samples"] == 5
@@ -0,0 +1,72 @@
+from datetime import date
+
+from result_cache import ResultCache, lookup_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(vendor="GE", patient_id="123", modality="CT"):
+    return lookup_key(vendor, patient_id, modality, date(2024, 1, 1), date(2025, 1, 1))
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = ResultCache(ttl_s=60, clock=clock)
+    cache.put(key(), [{"study": "CT Chest"}])
+
+    clock.now = 59.9
+    assert cache.get(key()) == [{"study": "CT Chest"}]
+    clock.now = 60
+    assert cache.get(key()) is None
+
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "hit_rate_pct": 50.0, "expired": 1,
+                             "evictions": 0, "invalidations": 0}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put(key(modality="CT"), [])
+    cache.put(key(modality="MR"), [])
+    cache.get(key(modality="CT"))          # MR is now the oldest
+
+    cache.put(key(modality="US"), [])
+
+    assert cache.get(key(modality="MR")) is None
+    assert cache.get(key(modality="CT")) == [] and cache.get(key(modality="US")) == []
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cached_records_are_copies():
+    cache = ResultCache()
+    records = [{"study": "CT Chest"}]
+    cache.put(key(), records)
+    records[0]["study"] = "changed"
+    cache.get(key())[0]["study"] = "changed too"
+
+    assert cache.get(key()) == [{"study": "CT Chest"}]
+
+
+def test_invalidation_by_patient_vendor_or_everything():
+    cache = ResultCache()
+    for vendor in ("GE", "Agfa"):
+        for pid in ("123", "456"):
+            for modality in ("CT", "MR"):
+                cache.put(key(vendor, pid, modality), [])
+
+    assert cache.invalidate("GE", "123") == 2
+    assert cache.get(key("GE", "123")) is None and cache.get(key("GE", "456")) == []
+    assert cache.invalidate(patient_id="456") == 4
+    assert cache.invalidate("Agfa") == 2
+    assert cache.invalidate() == 0
+    assert cache.stats()["entries"] == 0 and cache.stats()["invalidations"] == 8
+
+
+def test_lookup_key_treats_missing_filters_alike():
+    assert lookup_key("GE", None, None, None, None) == lookup_key("GE", "", "", "", "") == ("GE", "", "", "", "")
+    assert lookup_key("GE", "1", "CT", date(2024, 1, 1), None) == ("GE", "1", "CT", "2024-01-01", "")